@@ -3,10 +3,64 @@
 使用 ikpy 库基于 URDF 进行数值求解
 支持姿态约束和关节限位
 """
+import copy
 import numpy as np
 from ikpy.chain import Chain
 from ikpy.link import OriginLink, URDFLink
 import os
+import re
+from types import MappingProxyType
+import analytical_ik
+import fast_ik
+
+# 机械臂工作空间范围（基于实际机械臂参数估算，导入时计算一次）
+_L1, _L2, _L3, _L4 = 0.166, 0.200, 0.185, 0.125
+_WORKSPACE_LIMITS = MappingProxyType({
+    "max_reach": _L2 + _L3 + _L4,
+    "min_reach": abs(_L2 - _L3),
+    "height_range": MappingProxyType({
+        "min": _L1 - (_L2 + _L3),
+        "max": _L1 + (_L2 + _L3)
+    }),
+    "recommended_zone": MappingProxyType({
+        "x": (-0.2, 0.2),
+        "y": (0.15, 0.40),
+        "z": (0.15, 0.45)
+    })
+})
+# 可达性快速检查（以关节2 为球心）：外径按小臂实际偏移计算，略大于 max_reach 估算值
+_REACH_MAX_SQ = (_L2 + float(np.hypot(0.0476, 0.1845)) + _L4) ** 2
+_REACH_MIN_SQ = (_L2 - _L3) ** 2
+
+# 语音指令关键词，一次正则扫描完成匹配
+# 分组顺序即优先级（与原先 if/elif 链一致），长词放在短词前面；
+# 整体包在零宽前瞻中，每个位置都尝试匹配，重叠的关键词（"pickup" 中的 "up"）也能找到，
+# 与原先逐个子串判断的结果一致
+_VOICE_COMMAND_RE = re.compile(
+    r"(?="
+    r"(?P<left>左|left)"
+    r"|(?P<right>右|right)"
+    r"|(?P<center>中间|中|center)"
+    r"|(?P<high>高|up|high|上)"
+    r"|(?P<low>低|down|low|下)"
+    r"|(?P<forward>前面|前|forward)"
+    r"|(?P<back>后面|后|back)"
+    r"|(?P<home>初始|home|复位|归位)"
+    r"|(?P<pickup>拿|捡|抓|取|pickup)"
+    r")"
+)
+# 分组名 -> (优先级, 预设位置)
+_VOICE_COMMAND_PRESETS = {
+    "left": (0, "left"),
+    "right": (1, "right"),
+    "center": (2, "center"),
+    "high": (3, "high"),
+    "low": (4, "pickup"),
+    "forward": (5, "forward"),
+    "back": (6, "back"),
+    "home": (7, "home"),
+    "pickup": (8, "pickup"),
+}
 
 class AdvancedIKController:
     """
@@ -14,12 +68,25 @@ class AdvancedIKController:
     使用 ikpy 进行数值求解，支持姿态约束
     """
     
-    def __init__(self, urdf_path=None):
+    # 新目标与上次目标距离小于该值（米）时，用上次的解作为初始猜测
+    WARM_START_RADIUS = 0.1
+    
+    # 目标姿态常量（避免每次调用重新构建）
+    _R_DOWN = np.eye(3)  # 末端朝下（抓取姿态）
+    _R_FORWARD = np.array([  # 末端水平向前
+        [0, 0, 1],
+        [0, 1, 0],
+        [-1, 0, 0]
+    ], dtype=np.float64)
+    _I4 = np.eye(4)
+    
+    def __init__(self, urdf_path=None, use_fast=True):
         """
         初始化 IK 控制器
         
         参数:
             urdf_path: URDF 文件路径（可选）
+            use_fast: 使用手动运动链时，优先用 analytical_ik 闭式解 / fast_ik DLS 内核求解
         """
         if urdf_path is None:
             # 默认 URDF 路径
@@ -45,10 +112,15 @@ class AdvancedIKController:
                 # [base, j1, j2, j3, j4, j5, j6, ee] - base 和 ee 不可动
             )
             print(f"[OK] 成功加载 URDF: {os.path.basename(urdf_path)}")
+            self._manual_chain = False
         except Exception as e:
             print(f"[WARN] URDF 加载失败: {e}")
             print("[INFO] 使用手动定义的运动链")
             self.chain = self._create_manual_chain()
+            self._manual_chain = True
+        
+        # analytical_ik / fast_ik 的几何参数只对应手动运动链
+        self.use_fast = use_fast and self._manual_chain
         
         # 关节限位（弧度）
         self.joint_limits = {
@@ -59,17 +131,44 @@ class AdvancedIKController:
             "joint5": (-1.57, 0),
             "joint6": (-3.14, 3.14)
         }
+        self._joint_names = list(self.joint_limits.keys())
+        self._limits_lo = np.array([v[0] for v in self.joint_limits.values()], dtype=np.float64)
+        self._limits_hi = np.array([v[1] for v in self.joint_limits.values()], dtype=np.float64)
+        # DLS 默认初始猜测：限位中点（零位处于奇异位形）
+        self._fast_seed = (self._limits_lo + self._limits_hi) / 2
+        
+        # 预定义位置（毫米，int16 紧凑存储，每行 x, y, z）
+        self._preset_names = ["home", "left", "right", "center", "high", "pickup", "forward", "back"]
+        self._preset_index = {name: i for i, name in enumerate(self._preset_names)}
+        self._preset_xyz_mm = np.array([
+            [0, 250, 300],
+            [-150, 250, 250],
+            [150, 250, 250],
+            [0, 200, 200],
+            [0, 250, 400],
+            [100, 300, 150],
+            [0, 150, 250],
+            [0, 350, 250],
+        ], dtype=np.int16)
+        
+        self._initial_position_zero = np.zeros(len(self.chain.links))
+        
+        # 上一次成功的解（用于热启动求解器）
+        self._last_solution = None
+        self._last_target = None
         
-        # 预定义位置
-        self.presets = {
-            "home": (0.0, 0.25, 0.3),
-            "left": (-0.15, 0.25, 0.25),
-            "right": (0.15, 0.25, 0.25),
-            "center": (0.0, 0.20, 0.20),
-            "high": (0.0, 0.25, 0.40),
-            "pickup": (0.10, 0.30, 0.15),
-            "forward": (0.0, 0.15, 0.25),
-            "back": (0.0, 0.35, 0.25),
+        # 预设位置是固定坐标，启动时一次性求解
+        self._preset_cache = {
+            name: self.calculate_ik(x, y, z)
+            for name, (x, y, z) in zip(self._preset_names, (self._preset_xyz_mm / 1000.0).tolist())
+        }
+    
+    @property
+    def presets(self):
+        """预定义位置 {名称: (x, y, z)}（米），兼容旧接口"""
+        return {
+            name: tuple(xyz)
+            for name, xyz in zip(self._preset_names, (self._preset_xyz_mm / 1000.0).tolist())
         }
     
     def _create_manual_chain(self):
@@ -125,75 +224,106 @@ class AdvancedIKController:
         
         return Chain(name="robot_arm", links=links)
     
-    def calculate_ik(self, x, y, z, orientation="down"):
+    def calculate_ik(self, x, y, z, orientation="down", initial_position=None, clamp=False):
         """
         计算逆运动学
         
         参数:
             x, y, z: 目标位置（米）
             orientation: 末端姿态 ("down", "forward", "custom")
+            initial_position: 求解器初始猜测（可选，长度与运动链一致），
+                不传时若目标靠近上次目标则复用上次的解
+            clamp: 为 True 时先把目标截断到推荐工作区
         
         返回:
             dict: {success, angles, message}
         """
+        # 热路径上的属性查找绑定到局部变量
+        chain = self.chain
+        use_fast = self.use_fast
+        lim_lo = self._limits_lo
+        lim_hi = self._limits_hi
+        np_norm = np.linalg.norm
+        np_degrees = np.degrees
+        
+        if clamp:
+            zone = _WORKSPACE_LIMITS["recommended_zone"]
+            x = min(max(x, zone["x"][0]), zone["x"][1])
+            y = min(max(y, zone["y"][0]), zone["y"][1])
+            z = min(max(z, zone["z"][0]), zone["z"][1])
+        
+        # 明显不可达的目标直接返回，避免数值求解器耗尽迭代
+        # 可达范围由手动运动链的连杆长度算出，URDF 运动链不做此检查
+        if self._manual_chain:
+            dz = z - _L1
+            d2 = x * x + y * y + dz * dz
+            if d2 > _REACH_MAX_SQ or d2 < _REACH_MIN_SQ:
+                return {
+                    "success": False,
+                    "message": "目标超出工作空间",
+                    "shoulder_distance": d2 ** 0.5  # 目标到关节2 的距离
+                }
+        
         try:
             target_position = [x, y, z]
             
             # 设定目标姿态矩阵
             if orientation == "down":
-                # 末端朝下（抓取姿态）
-                target_orientation = [
-                    [1, 0, 0],
-                    [0, 1, 0],
-                    [0, 0, 1]
-                ]
+                target_orientation = self._R_DOWN
             elif orientation == "forward":
-                # 末端水平向前
-                target_orientation = [
-                    [0, 0, 1],
-                    [0, 1, 0],
-                    [-1, 0, 0]
-                ]
+                target_orientation = self._R_FORWARD
             else:
                 target_orientation = None  # 不约束姿态
             
             # 构建目标变换矩阵
-            target_matrix = np.eye(4)
+            target_matrix = self._I4.copy()
             target_matrix[:3, 3] = target_position
-            if target_orientation:
+            if target_orientation is not None:
                 target_matrix[:3, :3] = target_orientation
             
-            # 初始猜测（当前姿态或零位）
-            initial_position = [0] * len(self.chain.links)
+            # 初始猜测（调用方指定 > 上次的解 > 默认）
+            if initial_position is None:
+                last_solution = self._last_solution
+                if last_solution is not None and np_norm(
+                    np.asarray(target_position) - self._last_target
+                ) < self.WARM_START_RADIUS:
+                    initial_position = last_solution
             
-            # 调用 IK 求解器 (ikpy 3.x uses target_position as array)
-            ik_solution = self.chain.inverse_kinematics(
-                target_position=target_position,  # Direct position array
-                initial_position=initial_position
-            )
+            ik_solution = None
+            if use_fast and target_orientation is not None:
+                ik_solution = self._solve_analytical(target_position, initial_position)
+            if use_fast and ik_solution is None:
+                ik_solution = self._solve_fast(target_position, initial_position)
+            
+            if ik_solution is None:
+                if initial_position is None:
+                    initial_position = self._initial_position_zero
+                # 调用 IK 求解器 (ikpy 3.x uses target_position as array)
+                ik_solution = chain.inverse_kinematics(
+                    target_position=target_position,  # Direct position array
+                    initial_position=initial_position
+                )
             
             # 提取关节角度
             # Chain: [Origin(0), J1(1), J2(2), J3(3), J4(4), J5(5), J6(6), EE(7)]
             # We want indices 1-6
             joint_angles_rad = ik_solution[1:7].tolist()
             
-            # 检查关节限位
-            within_limits = True
-            for i, (joint_name, limits) in enumerate(self.joint_limits.items()):
-                if not (limits[0] <= joint_angles_rad[i] <= limits[1]):
-                    within_limits = False
-                    break
+            # 检查关节限位（向量化比较）
+            q = ik_solution[1:7]
+            out_of_bounds = (q < lim_lo) | (q > lim_hi)
             
-            if not within_limits:
+            if out_of_bounds.any():
+                violated = [self._joint_names[i] for i in np.flatnonzero(out_of_bounds)]
                 return {
                     "success": False,
-                    "message": "超出关节限位",
-                    "angles_rad": dict(zip(self.joint_limits.keys(), joint_angles_rad))
+                    "message": f"超出关节限位: {', '.join(violated)}",
+                    "angles_rad": dict(zip(self._joint_names, joint_angles_rad))
                 }
             
             # 转换为角度
             angles_deg = {
-                f"joint{i+1}": np.degrees(angle)
+                f"joint{i+1}": np_degrees(angle)
                 for i, angle in enumerate(joint_angles_rad)
             }
             
@@ -202,10 +332,17 @@ class AdvancedIKController:
                 for i, angle in enumerate(joint_angles_rad)
             }
             
-            # 验证前向运动学
-            fk_result = self.chain.forward_kinematics(ik_solution)
-            actual_position = fk_result[:3, 3]
-            position_error = np.linalg.norm(actual_position - target_position)
+            # 验证前向运动学（手动运动链用 fast_ik 的 FK，避免 ikpy 逐连杆构造矩阵）
+            if self._manual_chain:
+                actual_position = fast_ik.fk_6dof(
+                    ik_solution[1:7], fast_ik.JOINT_ORIGINS, fast_ik.JOINT_AXES
+                )[:3, 3]
+            else:
+                actual_position = chain.forward_kinematics(ik_solution)[:3, 3]
+            position_error = np_norm(actual_position - target_position)
+            
+            self._last_solution = ik_solution.copy()
+            self._last_target = np.array(target_position, dtype=float)
             
             return {
                 "success": True,
@@ -223,46 +360,137 @@ class AdvancedIKController:
                 "message": f"IK 求解失败: {str(e)}"
             }
     
+    def _solve_analytical(self, target_position, initial_position=None):
+        """
+        使用 analytical_ik 的闭式解，取限位内最接近参考姿态的分支
+        
+        返回:
+            与 ikpy 相同布局的关节数组 [Origin, J1..J6, EE]；无可行分支返回 None
+        """
+        candidates = analytical_ik.solve_position(*target_position)
+        within = np.all((candidates >= self._limits_lo) & (candidates <= self._limits_hi), axis=1)
+        candidates = candidates[within]
+        if len(candidates) == 0:
+            return None
+        if initial_position is None:
+            reference = self._fast_seed
+        else:
+            reference = np.asarray(initial_position, dtype=np.float64)[1:7]
+        best = candidates[np.argmin(np.sum((candidates - reference) ** 2, axis=1))]
+        solution = np.zeros(len(self.chain.links))
+        solution[1:7] = best
+        return solution
+    
+    def _solve_fast(self, target_position, initial_position=None):
+        """
+        使用 fast_ik 的 DLS 内核求解
+        
+        返回:
+            与 ikpy 相同布局的关节数组 [Origin, J1..J6, EE]；未收敛返回 None
+        """
+        if initial_position is None:
+            q0 = self._fast_seed
+        else:
+            q0 = np.asarray(initial_position, dtype=np.float64)[1:7]
+        q, error, _ = fast_ik.solve_dls(
+            q0,
+            np.asarray(target_position, dtype=np.float64),
+            fast_ik.JOINT_ORIGINS,
+            fast_ik.JOINT_AXES,
+            self._limits_lo,
+            self._limits_hi,
+            30,
+            1e-4,
+            1e-3,
+        )
+        if error >= 1e-4:
+            return None
+        solution = np.zeros(len(self.chain.links))
+        solution[1:7] = q
+        return solution
+    
+    def calculate_ik_batch(self, xs, ys, zs, orientation="down"):
+        """
+        批量计算逆运动学（轨迹插值等连续目标）
+        
+        每个目标以前一个目标的解作为初始猜测，保证相邻解落在同一分支上
+        
+        参数:
+            xs, ys, zs: 目标位置序列（米），长度相同
+            orientation: 末端姿态，同 calculate_ik
+        
+        返回:
+            dict: {success, solved, angles_rad, message}
+                solved: (N,) 布尔数组，各目标是否求解成功
+                angles_rad: (N, 6) 关节角（弧度），失败的行为 NaN
+        """
+        targets = np.stack([
+            np.asarray(xs, dtype=np.float64),
+            np.asarray(ys, dtype=np.float64),
+            np.asarray(zs, dtype=np.float64),
+        ], axis=1)
+        n = len(targets)
+        angles_rad = np.full((n, 6), np.nan)
+        solved = np.zeros(n, dtype=bool)
+        
+        calculate_ik = self.calculate_ik
+        initial_position = None
+        for i, (x, y, z) in enumerate(targets.tolist()):
+            result = calculate_ik(x, y, z, orientation, initial_position)
+            if not result["success"]:
+                continue
+            angles_rad[i] = list(result["angles_rad"].values())
+            solved[i] = True
+            initial_position = self._last_solution
+        
+        failed = n - int(solved.sum())
+        return {
+            "success": failed == 0,
+            "solved": solved,
+            "angles_rad": angles_rad,
+            "message": f"批量 IK 求解完成（{n - failed}/{n} 成功）"
+        }
+    
+    def get_preset_batch(self, names):
+        """批量获取预定义位置的 IK 解（按 names 顺序）"""
+        unknown = [name for name in names if name not in self._preset_index]
+        if unknown:
+            return {
+                "success": False,
+                "message": f"未知位置: {', '.join(unknown)}",
+                "available": list(self._preset_names)
+            }
+        
+        index = [self._preset_index[name] for name in names]
+        targets = self._preset_xyz_mm[index].reshape(-1, 3) / 1000.0
+        result = self.calculate_ik_batch(targets[:, 0], targets[:, 1], targets[:, 2])
+        result["presets"] = list(names)
+        return result
+    
     def get_preset(self, position_name):
         """获取预定义位置的 IK 解"""
-        if position_name not in self.presets:
+        idx = self._preset_index.get(position_name)
+        if idx is None:
             return {
                 "success": False,
                 "message": f"未知位置: {position_name}",
-                "available": list(self.presets.keys())
+                "available": list(self._preset_names)
             }
         
-        x, y, z = self.presets[position_name]
-        result = self.calculate_ik(x, y, z)
+        cached = self._preset_cache.get(position_name)
+        if cached is not None and cached["success"]:
+            result = copy.deepcopy(cached)
+        else:
+            x, y, z = (self._preset_xyz_mm[idx] / 1000.0).tolist()
+            result = self.calculate_ik(x, y, z)
         result["preset"] = position_name
         return result
     
     def get_workspace_limits(self):
         """
-        获取机械臂工作空间范围
+        获取机械臂工作空间范围（只读，需要修改时请先 dict() 复制）
         """
-        # 基于实际机械臂参数估算
-        L1 = 0.166
-        L2 = 0.200
-        L3 = 0.185
-        L4 = 0.125
-        
-        max_reach = L2 + L3 + L4
-        min_reach = abs(L2 - L3)
-        
-        return {
-            "max_reach": max_reach,
-            "min_reach": min_reach,
-            "height_range": {
-                "min": L1 - (L2 + L3),
-                "max": L1 + (L2 + L3)
-            },
-            "recommended_zone": {
-                "x": (-0.2, 0.2),
-                "y": (0.15, 0.40),
-                "z": (0.15, 0.45)
-            }
-        }
+        return _WORKSPACE_LIMITS
 
     def parse_voice_command(self, command):
         """解析语音指令"""
@@ -270,36 +498,20 @@ class AdvancedIKController:
         
         # 问候语检查已移除，完全交给 LLM 处理
 
-        # 方向指令
-        if any(word in command for word in ["左", "left"]):
-            return self.get_preset("left")
-        elif any(word in command for word in ["右", "right"]):
-            return self.get_preset("right")
-        elif any(word in command for word in ["中", "center", "中间"]):
-            return self.get_preset("center")
-        elif any(word in command for word in ["高", "up", "high", "上"]):
-            return self.get_preset("high")
-        elif any(word in command for word in ["低", "down", "low", "下"]):
-            return self.get_preset("pickup")
-        elif any(word in command for word in ["前", "forward", "前面"]):
-            return self.get_preset("forward")
-        elif any(word in command for word in ["后", "back", "后面"]):
-            return self.get_preset("back")
-        elif any(word in command for word in ["初始", "home", "复位", "归位"]):
-            return self.get_preset("home")
-        elif any(word in command for word in ["拿", "捡", "抓", "取", "pickup"]):
-            return self.get_preset("pickup")
-        else:
-            return {
-                "success": False,
-                "message": f"无法识别的指令: {command}",
-                "available_commands": [
-                    "左/右/中/前/后",
-                    "高/低",
-                    "初始位置/复位",
-                    "拿/捡/抓"
-                ]
-            }
+        # 方向指令：多个关键词同时出现时取优先级最高的
+        matches = [_VOICE_COMMAND_PRESETS[m.lastgroup] for m in _VOICE_COMMAND_RE.finditer(command)]
+        if matches:
+            return self.get_preset(min(matches)[1])
+        return {
+            "success": False,
+            "message": f"无法识别的指令: {command}",
+            "available_commands": [
+                "左/右/中/前/后",
+                "高/低",
+                "初始位置/复位",
+                "拿/捡/抓"
+            ]
+        }
 
 
 # 测试代码
@@ -322,4 +534,9 @@ if __name__ == "__main__":
         else:
             print(f"\n{preset}: {result['message']}")
     
+    # 测试批量求解
+    print("\n测试批量求解:")
+    batch = ik.get_preset_batch(["home", "left", "right", "pickup"])
+    print(f"  {batch['message']}")
+    
     print("\n" + "=" * 60)
@@ -0,0 +1,73 @@
+"""
+解析逆运动学（IK）
+针对手动运动链（见 AdvancedIKController._create_manual_chain）的闭式位置解
+
+几何关系:
+    关节2、关节3 轴线平行（绕 y），小臂偏移和末端偏移都带有沿 y 轴的分量；
+    关节5、关节6 不改变末端位置，关节4 决定小臂在平面内的等效长度。
+    因此固定关节4 后，位置解退化为 关节1（平面外偏移）+ 关节2/3（平面二连杆），
+    可用反三角函数直接求得。关节4 在固定的候选集合上枚举，全部向量化计算。
+"""
+import numpy as np
+
+BASE_HEIGHT = 0.166           # 底座到关节2 的高度
+UPPER_ARM = 0.2               # 关节2 → 关节3
+FOREARM_OFFSET = (0.0476, -0.1845)  # 关节3 → 关节4 (x, y)
+WRIST_OFFSET = 0.125          # 关节5 → 末端（沿 -y）
+
+# 关节4 候选角（位置对关节4 冗余，逐一闭式求解后择优）
+Q4_CANDIDATES = np.linspace(-np.pi, np.pi, 36, endpoint=False)
+
+
+def _wrap(angle):
+    """角度归一化到 [-pi, pi)"""
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def solve_position(x, y, z, q4_candidates=Q4_CANDIDATES):
+    """
+    计算到达 (x, y, z) 的全部闭式解分支
+
+    参数:
+        x, y, z: 目标末端位置（米）
+        q4_candidates: 关节4 候选角（弧度）
+
+    返回:
+        (N, 6) 数组，每行一组关节角（弧度），关节5、关节6 取 0；
+        不可达的分支已剔除，未做关节限位过滤
+    """
+    q4 = np.asarray(q4_candidates, dtype=np.float64)
+    r = np.hypot(x, y)
+    if r < 1e-9:
+        return np.empty((0, 6))
+
+    # 关节4 决定小臂在 x-z 平面内的等效长度和沿 y 的固定偏移
+    forearm = FOREARM_OFFSET[0] + WRIST_OFFSET * np.sin(q4)
+    lateral = FOREARM_OFFSET[1] - WRIST_OFFSET * np.cos(q4)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 关节1: r * sin(phi - q1) = lateral，两个分支
+        alpha = np.arcsin(lateral / r)
+        alpha = np.stack([alpha, np.pi - alpha])            # (2, N)
+        q1 = np.arctan2(y, x) - alpha
+        reach = r * np.cos(alpha)                           # 平面内水平距离
+        height = BASE_HEIGHT - z                            # 平面内竖直距离（关节绕 y 的正方向朝下）
+
+        # 关节2/3: 平面二连杆，余弦定理，两个肘部分支
+        cos_q3 = (reach ** 2 + height ** 2 - UPPER_ARM ** 2 - forearm ** 2) / (2 * UPPER_ARM * forearm)
+        q3 = np.arccos(cos_q3)
+        q3 = np.stack([q3, -q3])                            # (2, 2, N)
+        q2 = np.arctan2(height, reach) - np.arctan2(
+            forearm * np.sin(q3), UPPER_ARM + forearm * np.cos(q3)
+        )
+
+    shape = q3.shape
+    solutions = np.stack([
+        _wrap(np.broadcast_to(q1, shape)),
+        _wrap(q2),
+        q3,
+        np.broadcast_to(q4, shape),
+        np.zeros(shape),
+        np.zeros(shape),
+    ], axis=-1).reshape(-1, 6)
+    return solutions[~np.isnan(solutions).any(axis=1)]
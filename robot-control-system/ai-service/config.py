@@ -1,13 +1,24 @@
 import os
 import json
+from functools import lru_cache
 
+try:  # orjson 为可选依赖，未安装时回退标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+@lru_cache(maxsize=4)
 def _read_json(path):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
+        # 以字节读取，orjson / json 都能直接解析 UTF-8 字节
+        with open(path, "rb") as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError):
         return {}
 
+# 进程内只读取一次；需要重新加载时调用 load_config.cache_clear() 和 _read_json.cache_clear()
+@lru_cache(maxsize=1)
 def load_config():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     json_path = os.path.join(base_dir, "config.json")
@@ -20,7 +31,7 @@ def load_config():
     max_retries = _get("MAX_RETRIES", 3)
     try:
         max_retries = int(max_retries)
-    except:
+    except (TypeError, ValueError):
         max_retries = 3
     proxy = _get("HTTP_PROXY")
     if proxy == "":
@@ -46,8 +57,11 @@ def load_config():
         "SERIAL_TIMEOUT": _get("SERIAL_TIMEOUT", 0.5),
         "SERIAL_HANDSHAKE": _get("SERIAL_HANDSHAKE", "remote_enable"),
         "SERIAL_NEWLINE": _get("SERIAL_NEWLINE", "\n"),
+        # 检测模型路径（可指向 TensorRT 引擎），留空时按默认候选顺序加载
+        "YOLO_MODEL": _get("YOLO_MODEL", ""),
     }
 
+@lru_cache(maxsize=8)
 def build_gemini_generate_url(model, api_key):
     return f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+YOLO TensorRT 引擎导出工具
+在部署机器（目标 GPU）上离线运行一次，生成 main.py 优先加载的引擎文件:
+    yolov8n_int8.engine  INT8 量化，需要校准数据集
+    yolov8n_fp16.engine  FP16，作为 INT8 引擎不可用时的回退
+
+用法:
+    python export_yolo.py --data calib.yaml
+
+calib.yaml 为 ultralytics 数据集格式，指向 200~500 张实际摄像头画面。
+导出与推理都使用 ultralytics 自带的 letterbox/归一化预处理，两者保持一致；
+输入尺寸固定为 640，与服务端预热尺寸相同。
+INT8 引擎导出需要 ultralytics>=8.2 和 TensorRT。
+"""
+import argparse
+import os
+import shutil
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS = os.path.join(BASE_DIR, "yolov8n.pt")
+IMGSZ = 640
+BATCH = 8  # 与 main.DETECT_BATCH_SIZE 一致，动态 batch 上限
+
+
+def export_engine(data, int8, workspace):
+    from ultralytics import YOLO
+
+    model = YOLO(WEIGHTS)
+    kwargs = dict(format="engine", imgsz=IMGSZ, dynamic=True, batch=BATCH,
+                  workspace=workspace, half=not int8, int8=int8)
+    if int8:
+        kwargs["data"] = data
+    exported = model.export(**kwargs)
+    target = os.path.join(BASE_DIR, "yolov8n_int8.engine" if int8 else "yolov8n_fp16.engine")
+    shutil.move(exported, target)
+    print(f"✅ 已导出: {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 YOLO TensorRT 引擎")
+    parser.add_argument("--data", default="calib.yaml", help="INT8 校准数据集配置")
+    parser.add_argument("--workspace", type=float, default=4, help="TensorRT 工作空间 (GB)")
+    parser.add_argument("--skip-int8", action="store_true", help="只导出 FP16 引擎")
+    args = parser.parse_args()
+
+    export_engine(args.data, int8=False, workspace=args.workspace)
+    if not args.skip_int8:
+        export_engine(args.data, int8=True, workspace=args.workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+快速逆运动学（IK）内核
+针对 6 自由度机械臂的阻尼最小二乘（DLS）迭代求解，以及 MuJoCo 控制循环的每步后处理
+安装 numba 时 JIT 编译，否则退化为纯 NumPy 实现
+"""
+import math
+
+import numpy as np
+
+try:  # numba 为可选依赖
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba 不可用时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# 运动链参数（与 AdvancedIKController._create_manual_chain 一致）
+# 每个关节: 相对上一关节的原点平移 + 旋转轴
+JOINT_ORIGINS = np.array([
+    [0.0, 0.0, 0.166],
+    [0.0, 0.0, 0.0],
+    [0.2, 0.0, 0.0],
+    [0.0476, -0.1845, 0.0],
+    [0.0, 0.0, 0.0],
+    [0.0, -0.125, 0.0],
+], dtype=np.float64)
+
+JOINT_AXES = np.array([
+    [0.0, 0.0, 1.0],
+    [0.0, 1.0, 0.0],
+    [0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0],
+    [0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0],
+], dtype=np.float64)
+
+
+@njit(cache=True, fastmath=True)
+def _axis_rotation(axis, angle):
+    """Rodrigues 公式: 绕单位轴旋转 angle 弧度"""
+    c = np.cos(angle)
+    s = np.sin(angle)
+    t = 1.0 - c
+    x, y, z = axis[0], axis[1], axis[2]
+    R = np.empty((3, 3))
+    R[0, 0] = t * x * x + c
+    R[0, 1] = t * x * y - s * z
+    R[0, 2] = t * x * z + s * y
+    R[1, 0] = t * x * y + s * z
+    R[1, 1] = t * y * y + c
+    R[1, 2] = t * y * z - s * x
+    R[2, 0] = t * x * z - s * y
+    R[2, 1] = t * y * z + s * x
+    R[2, 2] = t * z * z + c
+    return R
+
+
+@njit(cache=True, fastmath=True)
+def fk_6dof(q, origins, axes):
+    """
+    正运动学
+
+    返回:
+        T: 末端 4x4 齐次变换矩阵
+    """
+    R = np.eye(3)
+    p = np.zeros(3)
+    for i in range(6):
+        p = p + R @ origins[i]
+        R = R @ _axis_rotation(axes[i], q[i])
+    T = np.eye(4)
+    T[:3, :3] = R
+    T[:3, 3] = p
+    return T
+
+
+@njit(cache=True, fastmath=True)
+def jacobian_6dof(q, origins, axes):
+    """
+    几何雅可比（位置部分）
+
+    返回:
+        (J, p_ee): 3x6 雅可比矩阵和末端位置
+    """
+    R = np.eye(3)
+    p = np.zeros(3)
+    joint_pos = np.empty((6, 3))
+    joint_axis = np.empty((6, 3))
+    for i in range(6):
+        p = p + R @ origins[i]
+        joint_pos[i] = p
+        joint_axis[i] = R @ axes[i]
+        R = R @ _axis_rotation(axes[i], q[i])
+
+    J = np.empty((3, 6))
+    for i in range(6):
+        J[:, i] = np.cross(joint_axis[i], p - joint_pos[i])
+    return J, p
+
+
+@njit(cache=True, fastmath=True)
+def _cholesky_solve(A, b):
+    """对称正定矩阵的 Cholesky 分解求解 A x = b"""
+    n = A.shape[0]
+    L = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1):
+            acc = A[i, j]
+            for k in range(j):
+                acc -= L[i, k] * L[j, k]
+            if i == j:
+                L[i, i] = np.sqrt(acc)
+            else:
+                L[i, j] = acc / L[j, j]
+    y = np.empty(n)
+    for i in range(n):
+        acc = b[i]
+        for k in range(i):
+            acc -= L[i, k] * y[k]
+        y[i] = acc / L[i, i]
+    x = np.empty(n)
+    for i in range(n - 1, -1, -1):
+        acc = y[i]
+        for k in range(i + 1, n):
+            acc -= L[k, i] * x[k]
+        x[i] = acc / L[i, i]
+    return x
+
+
+@njit(cache=True, fastmath=True)
+def solve_dls(q0, target_xyz, origins, axes, lo, hi, max_iter=30, tol=1e-4, lam=1e-2):
+    """
+    阻尼最小二乘 IK 迭代: q += (JᵀJ + λI)⁻¹ Jᵀ e
+
+    参数:
+        q0: 初始关节角（6，弧度）
+        target_xyz: 目标末端位置（米）
+        lo, hi: 关节上下限（弧度），每步迭代后截断
+
+    返回:
+        (q, error, iterations)
+    """
+    q = q0.copy()
+    damping = lam * np.eye(6)
+    err_norm = np.inf
+    iterations = 0
+    while True:
+        J, p = jacobian_6dof(q, origins, axes)
+        err = target_xyz - p
+        err_norm = np.sqrt(err @ err)
+        if err_norm < tol or iterations >= max_iter:
+            break
+        dq = _cholesky_solve(J.T @ J + damping, J.T @ err)
+        q = np.minimum(np.maximum(q + dq, lo), hi)
+        iterations += 1
+    return q, err_norm, iterations
+
+
+RAD2DEG = 180.0 / math.pi
+
+
+@njit(cache=True)
+def step_metrics(qpos, ee_pos, target):
+    """
+    MuJoCo 每步后处理: 前 6 个关节角转为角度，并计算末端到目标的距离
+
+    参数可以直接传 data.qpos / data.site_xpos 的行视图，不产生中间数组
+
+    返回:
+        (angles_deg, distance)
+    """
+    angles_deg = np.empty(6)
+    for i in range(6):
+        angles_deg[i] = qpos[i] * RAD2DEG
+    dx = ee_pos[0] - target[0]
+    dy = ee_pos[1] - target[1]
+    dz = ee_pos[2] - target[2]
+    return angles_deg, math.sqrt(dx * dx + dy * dy + dz * dz)
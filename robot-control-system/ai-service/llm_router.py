@@ -2,13 +2,158 @@
 LLM 多模型路由系统
 实现智能路由，根据任务类型调用不同的模型
 """
+import copy
+import hashlib
 import logging
 import httpx
 import json
-from typing import Dict, Any, Optional
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Any, Hashable, Optional
+
+try:  # orjson 为可选依赖，未安装时回退标准库
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# 意图分类关键词
+WORK_KEYWORDS = ["移动", "复位", "转到", "关节", "控制", "拿", "捡", "抓", "挥手", "点头", "旋转"]
+VISION_KEYWORDS = ["看", "识别", "检测", "摄像头", "视觉", "图像", "拍照"]
+
+
+def _keyword_pattern(keywords: list) -> str:
+    # 长词优先，避免被其前缀截断
+    return "|".join(map(re.escape, sorted(keywords, key=len, reverse=True)))
+
+
+def _command_pattern(keywords: list) -> str:
+    # 英文指令要求整词匹配："microwave"、"node.js"、"preset" 不会命中 wave/nod/reset
+    return "|".join(
+        rf"(?<![a-z]){re.escape(k)}(?![a-z])" if k.isascii() else re.escape(k)
+        for k in sorted(keywords, key=len, reverse=True)
+    )
+
+
+# 疑问句不走工作指令快速通道："你会跳舞吗？" 是在提问，不是让机械臂跳舞
+_QUESTION_RE = re.compile(
+    r"[?？]|吗|什么|怎么|怎样|为什么|如何|能不能|会不会|是不是|(?<![a-z])(?:what|why|how)(?![a-z])",
+    re.IGNORECASE,
+)
+
+
+# 关节别名 → 关节序号（1-based）
+JOINT_ALIASES = {
+    "基座": 1, "底座": 1,
+    "大臂": 2,
+    "小臂": 3,
+    "腕部旋转": 4, "手腕旋转": 4,
+    "腕部俯仰": 5, "手腕俯仰": 5,
+    "末端": 6,
+}
+_NUM = r"-?\d+(?:\.\d+)?"
+
+# LLM 常把 JSON 包在 markdown 代码块中，一次替换去掉所有围栏行
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.MULTILINE)
+
+
+def parse_llm_json(content: str):
+    """去掉 markdown 代码块标记后解析 LLM 返回的 JSON，格式错误时抛出 json.JSONDecodeError"""
+    return _json_loads(_FENCE_RE.sub("", content).strip())
+
+
+# handle_work 的系统提示词：固定部分放在模块级，保证每次请求的前缀逐字节一致，
+# 便于服务端（Volces / DeepSeek）命中前缀缓存
+_WORK_PROMPT_PREFIX = """你是机械臂助手Zero。
+"""
+_WORK_PROMPT_SUFFIX = """
+
+## 任务:
+请根据用户指令选择合适的工具(Skill)来控制机械臂。
+
+## 响应格式 (JSON):
+必须返回标准的 JSON 格式：
+{
+    "mode": "work",
+    "response": "给用户的回复",
+    "skill": "要调用的函数名",
+    "args": { "参数名": 值 }
+}
+
+## 示例:
+- 用户: "基座转到90度"
+  响应: {"mode": "work", "response": "好的，正在调整基座", "skill": "control_joint", "args": {"joint_index": 1, "angle": 90}}
+- 用户: "复位"
+  响应: {"mode": "work", "response": "正在复位", "skill": "apply_preset", "args": {"name": "home"}}
+
+只返回 JSON，不要其他内容。
+"""
+
+# 工作模式要求模型以 JSON 模式输出，保证返回可直接解析的 JSON 对象
+# （决策模型为 DeepSeek，只支持 json_object，字段约束仍由系统提示词给出）
+WORK_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+@lru_cache(maxsize=4)
+def _work_system_prompt(skills_description: str) -> str:
+    """拼接工作模式系统提示词；同一技能描述只拼接一次，各请求共用同一个字符串"""
+    prompt = _WORK_PROMPT_PREFIX + skills_description + _WORK_PROMPT_SUFFIX
+    # 记录前缀指纹，便于核对服务端前缀缓存是否命中同一份提示词
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    logger.info(f"工作模式系统提示词: {len(prompt)} 字符, sha256={digest}")
+    return prompt
+
+
+class ResponseCache:
+    """
+    LLM 结果缓存（LRU + TTL）
+
+    键为 (命名空间, 规范化后的用户文本)：合并空白、去掉句末标点并转小写，
+    "你好！" 与 "你好" 命中同一条；正负号和小数点保留，"-90度" 与 "90度" 是不同的键。
+    值为解析好的结果字典，读写都深拷贝，调用方可安全修改。
+    """
+
+    _TRAILING_PUNCT = "!?.,;~。！？，；、～…"
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        return " ".join(text.split()).rstrip(cls._TRAILING_PUNCT).rstrip().lower()
+
+    def get(self, namespace: Hashable, text: str) -> Optional[Dict[str, Any]]:
+        key = (namespace, self.normalize(text))
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, namespace: Hashable, text: str, value: Dict[str, Any]) -> None:
+        normalized = self.normalize(text)
+        if not normalized:
+            return
+        key = (namespace, normalized)
+        self._data[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
 class LLMRouter:
     """
     多模型路由管理器
@@ -20,6 +165,38 @@ class LLMRouter:
     - MODEL_EMBEDDING: 向量检索/上下文理解
     """
     
+    # 所有意图关键词合并为一个正则，按命名分组区分类别
+    _INTENT_KEYWORD_RE = re.compile(
+        f"(?P<vision>{_keyword_pattern(VISION_KEYWORDS)})|(?P<work>{_keyword_pattern(WORK_KEYWORDS)})"
+    )
+    
+    # 常见工作指令快速通道（键为小写，顺序即优先级）
+    FAST_COMMANDS = {
+        "点头": {"skill": "perform_action", "args": {"action_name": "nod"}, "response": "好的，执行点头动作"},
+        "nod": {"skill": "perform_action", "args": {"action_name": "nod"}, "response": "OK, nodding"},
+        "挥手": {"skill": "perform_action", "args": {"action_name": "wave"}, "response": "好的，向大家挥手"},
+        "wave": {"skill": "perform_action", "args": {"action_name": "wave"}, "response": "OK, waving"},
+        "复位": {"skill": "apply_preset", "args": {"name": "home"}, "response": "正在复位机械臂"},
+        "reset": {"skill": "apply_preset", "args": {"name": "home"}, "response": "Resetting robot"},
+        "回零": {"skill": "apply_preset", "args": {"name": "home"}, "response": "正在回零"},
+        "跳舞": {"skill": "perform_action", "args": {"action_name": "dance"}, "response": "Music! 开始跳舞！"},
+        "转圈": {"skill": "perform_action", "args": {"action_name": "spin"}, "response": "开始旋转"},
+    }
+    _FAST_COMMAND_PRIORITY = {key: i for i, key in enumerate(FAST_COMMANDS)}
+    _FAST_COMMAND_RE = re.compile(_command_pattern(list(FAST_COMMANDS)))
+    
+    # 带参数的确定性指令："基座转到90度"、"关节2 30度"、"移动到 0.2, 0.1, 0.3"
+    _JOINT_RE = re.compile(
+        rf"(?:关节\s*(?P<index>[1-6])|(?P<alias>{_keyword_pattern(list(JOINT_ALIASES))}))"
+        rf"\s*(?P<verb>转到|转动到|旋转到|调整到|调到|到)?\s*(?P<angle>{_NUM})\s*(?:度|°)"
+    )
+    # 不带动词的关节描述只有在整条消息都是关节指令时才执行（"关节2 30度"、"基座90度，大臂30度"），
+    # 句中顺带提到的角度（"小臂30度是什么意思"）不算指令
+    _JOINT_FILLER_RE = re.compile(r"[\s,，、;；和及.。!！]*")
+    _MOVE_RE = re.compile(
+        rf"移动到\s*(?:坐标)?\s*[(（]?\s*(?P<x>{_NUM})\s*[,，]\s*(?P<y>{_NUM})\s*[,，]\s*(?P<z>{_NUM})"
+    )
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.api_key = config.get("GEMINI_API_KEY")
@@ -35,18 +212,53 @@ class LLMRouter:
         # 代理配置
         self.proxy_url = config.get("HTTP_PROXY")
         
+        # 重复提问直接复用上次的 LLM 结果（只缓存成功结果，不缓存降级回复）
+        self._cache = ResponseCache()
+        
+        # 复用同一个客户端，保持连接池（避免每次调用重新握手 TCP/TLS）
+        if self.proxy_url:
+            client_args = {
+                "mounts": {
+                    "http://": httpx.AsyncHTTPTransport(proxy=self.proxy_url),
+                    "https://": httpx.AsyncHTTPTransport(proxy=self.proxy_url)
+                }
+            }
+        else:
+            client_args = {"trust_env": False}
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+            **client_args
+        )
+        
         logger.info(f"🚀 LLM路由器初始化完成")
         logger.info(f"  - 意图分类: {self.model_filter or 'N/A'}")
         logger.info(f"  - 决策大脑: {self.model_decision or 'N/A'}")
         logger.info(f"  - 视觉理解: {self.model_vision or 'N/A'}")
         logger.info(f"  - 向量检索: {self.model_embedding or 'N/A'}")
     
+    async def aclose(self) -> None:
+        """关闭共享的 HTTP 客户端"""
+        await self._client.aclose()
+    
+    async def warmup(self) -> None:
+        """
+        预热连接池：服务启动时先完成 DNS 解析和 TCP/TLS 握手，
+        首个用户请求不再承担建连耗时（响应状态码无关紧要）
+        """
+        try:
+            await self._client.get(self.base_url, timeout=5.0)
+            logger.info("LLM 连接预热完成")
+        except httpx.HTTPError as e:
+            logger.warning(f"LLM 连接预热失败: {e}")
+    
     async def _call_llm(
         self, 
         model: str, 
         messages: list, 
         temperature: float = 0.7,
-        timeout: float = 10.0
+        timeout: float = 10.0,
+        response_format: Optional[Dict[str, Any]] = None
     ) -> Optional[str]:
         """
         调用 LLM API
@@ -56,6 +268,7 @@ class LLMRouter:
             messages: 消息列表
             temperature: 温度参数
             timeout: 超时时间（秒）
+            response_format: 结构化输出设置（OpenAI 兼容的 response_format）
         
         Returns:
             LLM 响应内容，失败返回 None
@@ -70,38 +283,30 @@ class LLMRouter:
             "temperature": temperature,
             "stream": False
         }
+        if response_format is not None:
+            payload["response_format"] = response_format
         
-        # 配置代理
         timeout_obj = httpx.Timeout(timeout, connect=5.0)
-        if self.proxy_url:
-            client_args = {
-                "mounts": {
-                    "http://": httpx.HTTPTransport(proxy=self.proxy_url),
-                    "https://": httpx.HTTPTransport(proxy=self.proxy_url)
-                }
-            }
-        else:
-            client_args = {"trust_env": False}
         
         try:
-            async with httpx.AsyncClient(timeout=timeout_obj, **client_args) as client:
-                resp = await client.post(
-                    self.api_url,
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {self.api_key}"
-                    }
-                )
+            resp = await self._client.post(
+                self.api_url,
+                json=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                },
+                timeout=timeout_obj
+            )
+            
+            if resp.status_code == 200:
+                data = resp.json()
+                content = data["choices"][0]["message"]["content"]
+                return content.strip()
+            else:
+                logger.error(f"LLM API 错误: {resp.status_code} - {resp.text}")
+                return None
                 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    content = data["choices"][0]["message"]["content"]
-                    return content.strip()
-                else:
-                    logger.error(f"LLM API 错误: {resp.status_code} - {resp.text}")
-                    return None
-                    
         except httpx.TimeoutException:
             logger.error(f"LLM 调用超时 (model={model}, timeout={timeout}s)")
             return None
@@ -109,6 +314,72 @@ class LLMRouter:
             logger.error(f"LLM 调用失败: {e}")
             return None
     
+    async def _call_llm_stream(
+        self,
+        model: str,
+        messages: list,
+        temperature: float = 0.7,
+        timeout: float = 10.0
+    ) -> AsyncIterator[str]:
+        """
+        以 SSE 流式调用 LLM API，逐段产出增量内容
+        
+        Args:
+            model: 模型 ID
+            messages: 消息列表
+            temperature: 温度参数
+            timeout: 超时时间（秒）
+        
+        Yields:
+            增量文本；失败时记录日志并提前结束
+        """
+        if not model:
+            logger.error("模型 ID 为空，无法调用")
+            return
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True
+        }
+        
+        try:
+            async with self._client.stream(
+                "POST",
+                self.api_url,
+                json=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {self.api_key}"
+                },
+                timeout=httpx.Timeout(timeout, connect=5.0)
+            ) as resp:
+                if resp.status_code != 200:
+                    body = await resp.aread()
+                    logger.error(f"LLM API 错误: {resp.status_code} - {body.decode('utf-8', errors='ignore')}")
+                    return
+                
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = _json_loads(data)
+                        content = chunk["choices"][0]["delta"].get("content")
+                    except (json.JSONDecodeError, KeyError, IndexError) as e:
+                        logger.warning(f"LLM 流式数据解析失败: {e}")
+                        continue
+                    if content:
+                        yield content
+                        
+        except httpx.TimeoutException:
+            logger.error(f"LLM 流式调用超时 (model={model}, timeout={timeout}s)")
+        except Exception as e:
+            logger.error(f"LLM 流式调用失败: {e}")
+    
     async def classify_intent(self, user_message: str) -> str:
         """
         【Step 1】意图分类
@@ -123,13 +394,12 @@ class LLMRouter:
         """
         # 关键词判断作为 fallback
         def keyword_classify(msg: str) -> str:
-            work_keywords = ["移动", "复位", "转到", "关节", "控制", "拿", "捡", "抓", "挥手", "点头", "旋转"]
-            vision_keywords = ["看", "识别", "检测", "摄像头", "视觉", "图像", "拍照"]
-            
+            # 一次扫描：命中视觉关键词立即返回（视觉优先于工作）
             result_intent = "chat"
-            if any(kw in msg for kw in vision_keywords):
-                result_intent = "vision"
-            elif any(kw in msg for kw in work_keywords):
+            for match in self._INTENT_KEYWORD_RE.finditer(msg):
+                if match.lastgroup == "vision":
+                    result_intent = "vision"
+                    break
                 result_intent = "work"
             
             logger.info(f"🔑 [Keyword] Classification: {result_intent}")
@@ -184,6 +454,35 @@ class LLMRouter:
             logger.warning("意图分类失败，使用关键词判断")
             return keyword_classify(user_message)
     
+    # 预设回复（快速响应）
+    QUICK_RESPONSES = {
+        "你好": "你好呀！我是机械臂助手Zero。有什么可以帮你的吗？",
+        "介绍一下自己": "你好！我是Zero机械臂助手，一个由6个关节组成的智能机械臂。我可以执行各种精确的控制任务，比如移动到指定位置、调整关节角度、执行预设动作等。有什么需要我帮忙的吗？",
+        "你能做什么": "我可以帮你控制机械臂！比如移动到指定位置、调整关节角度、执行预设动作（复位、向左、向右等），还可以执行挥手、点头等表演动作。告诉我你想让我做什么吧！",
+        "谢谢": "不客气！随时为你服务！😊"
+    }
+    
+    # LLM 超时或失败时的降级回复
+    CHAT_FALLBACK_RESPONSE = "我现在有点忙，请稍后再试。或者你可以告诉我具体的控制指令，比如'复位'、'向左移动'等。"
+    
+    def _quick_response(self, user_message: str) -> Optional[str]:
+        """检查预设回复"""
+        for key, response in self.QUICK_RESPONSES.items():
+            if key in user_message:
+                logger.info(f"✅ 使用预设回复")
+                return response
+        return None
+    
+    @staticmethod
+    def _chat_messages(user_message: str) -> list:
+        """构建聊天模式的消息列表"""
+        chat_prompt = f"""你是机械臂助手Zero，请用友好的语气回复用户。保持简洁。
+
+用户: {user_message}
+
+回复:"""
+        return [{"role": "user", "content": chat_prompt}]
+    
     async def handle_chat(self, user_message: str) -> Dict[str, Any]:
         """
         【聊天模式】快速响应
@@ -192,59 +491,170 @@ class LLMRouter:
         """
         logger.info("💬 [Chat Mode] 处理聊天消息...")
         
-        # 预设回复（快速响应）
-        quick_responses = {
-            "你好": "你好呀！我是机械臂助手Zero。有什么可以帮你的吗？",
-            "介绍一下自己": "你好！我是Zero机械臂助手，一个由6个关节组成的智能机械臂。我可以执行各种精确的控制任务，比如移动到指定位置、调整关节角度、执行预设动作等。有什么需要我帮忙的吗？",
-            "你能做什么": "我可以帮你控制机械臂！比如移动到指定位置、调整关节角度、执行预设动作（复位、向左、向右等），还可以执行挥手、点头等表演动作。告诉我你想让我做什么吧！",
-            "谢谢": "不客气！随时为你服务！😊"
-        }
+        quick = self._quick_response(user_message)
+        if quick:
+            return {
+                "success": True,
+                "mode": "chat",
+                "response": quick,
+                "fast": True  # 标记为快速响应
+            }
         
-        # 检查预设回复
-        for key, response in quick_responses.items():
-            if key in user_message:
-                logger.info(f"✅ 使用预设回复")
-                return {
-                    "success": True,
-                    "mode": "chat",
-                    "response": response,
-                    "fast": True  # 标记为快速响应
-                }
+        cached = self._cache.get("chat", user_message)
+        if cached is not None:
+            logger.info("✅ 命中聊天缓存")
+            cached["cached"] = True
+            return cached
         
         # 使用轻量模型（MODEL_FILTER）处理聊天
-        chat_prompt = f"""你是机械臂助手Zero，请用友好的语气回复用户。保持简洁。
-
-用户: {user_message}
-
-回复:"""
-        
-        messages = [{"role": "user", "content": chat_prompt}]
-        
         result = await self._call_llm(
             model=self.model_filter,  # 使用轻量模型
-            messages=messages,
+            messages=self._chat_messages(user_message),
             temperature=0.8,
             timeout=60.0
         )
         
         if result:
             logger.info(f"✅ 聊天回复生成成功")
-            return {
+            reply = {
                 "success": True,
                 "mode": "chat",
                 "response": result
             }
+            self._cache.put("chat", user_message, reply)
+            return reply
         else:
             # LLM 超时或失败，返回降级回复
             logger.warning("聊天 LLM 调用失败，使用降级回复")
-            fallback_response = "我现在有点忙，请稍后再试。或者你可以告诉我具体的控制指令，比如'复位'、'向左移动'等。"
             return {
                 "success": True,  # 改为 True，避免前端显示错误
                 "mode": "chat",
-                "response": fallback_response,
+                "response": self.CHAT_FALLBACK_RESPONSE,
                 "fallback": True  # 标记为降级响应
             }
     
+    async def handle_chat_stream(self, user_message: str) -> AsyncIterator[str]:
+        """
+        【聊天模式】流式响应，逐段产出回复文本
+        
+        预设回复和降级回复整段产出一次
+        """
+        logger.info("💬 [Chat Mode] 流式处理聊天消息...")
+        
+        quick = self._quick_response(user_message)
+        if quick:
+            yield quick
+            return
+        
+        cached = self._cache.get("chat", user_message)
+        if cached is not None:
+            logger.info("✅ 命中聊天缓存")
+            yield cached["response"]
+            return
+        
+        parts = []
+        async for token in self._call_llm_stream(
+            model=self.model_filter,
+            messages=self._chat_messages(user_message),
+            temperature=0.8,
+            timeout=60.0
+        ):
+            parts.append(token)
+            yield token
+        
+        if parts:
+            self._cache.put("chat", user_message, {
+                "success": True,
+                "mode": "chat",
+                "response": "".join(parts)
+            })
+        else:
+            logger.warning("聊天 LLM 流式调用失败，使用降级回复")
+            yield self.CHAT_FALLBACK_RESPONSE
+    
+    def _match_fast_command(self, user_message: str) -> Optional[Dict[str, Any]]:
+        """
+        匹配常见工作指令（不区分大小写，单次正则扫描）
+        
+        Returns:
+            指令字典的副本（可安全修改），未命中返回 None
+        """
+        # 多个指令同时出现时，取表中靠前的
+        keys = [m.group() for m in self._FAST_COMMAND_RE.finditer(user_message.lower())]
+        if not keys:
+            return None
+        key = min(keys, key=self._FAST_COMMAND_PRIORITY.__getitem__)
+        logger.info(f"⚡ [Fast Path] Work command detected: {key}")
+        return copy.deepcopy(self.FAST_COMMANDS[key])
+    
+    def _match_fast_pattern(self, user_message: str) -> Optional[Dict[str, Any]]:
+        """
+        匹配带参数的关节/坐标指令，直接提取参数（不调用 LLM）
+        
+        Returns:
+            指令字典，未命中返回 None
+        """
+        joints = {}
+        matches = list(self._JOINT_RE.finditer(user_message))
+        if not all(m["verb"] for m in matches) and not self._JOINT_FILLER_RE.fullmatch(
+            self._JOINT_RE.sub("", user_message)
+        ):
+            matches = []
+        for m in matches:
+            index = int(m["index"]) if m["index"] else JOINT_ALIASES[m["alias"]]
+            joints[index] = float(m["angle"])
+        if len(joints) == 1:
+            (index, angle), = joints.items()
+            logger.info(f"⚡ [Fast Path] Joint command detected: joint{index}={angle}")
+            return {
+                "skill": "control_joint",
+                "args": {"joint_index": index, "angle": angle},
+                "response": f"好的，正在调整关节{index}"
+            }
+        if joints:
+            logger.info(f"⚡ [Fast Path] Multi-joint command detected: {joints}")
+            return {
+                "skill": "control_multiple_joints",
+                "args": {"target_angles_dict": {str(k): v for k, v in joints.items()}},
+                "response": "好的，正在调整关节"
+            }
+        m = self._MOVE_RE.search(user_message)
+        if m:
+            logger.info(f"⚡ [Fast Path] Move command detected: {m.group()}")
+            return {
+                "skill": "move_to",
+                "args": {"x": float(m["x"]), "y": float(m["y"]), "z": float(m["z"])},
+                "response": "好的，正在移动到目标位置"
+            }
+        return None
+    
+    def try_fast_work(
+        self,
+        user_message: str,
+        current_angles: Optional[list] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        仅查带参数指令和常见指令表的工作模式结果（不调用 LLM）
+        
+        命中时调用方可以跳过意图分类，直接执行技能；疑问句一律不命中，交给意图分类/LLM
+        
+        Returns:
+            与 handle_work 相同结构的结果，未命中返回 None
+        """
+        if _QUESTION_RE.search(user_message):
+            return None
+        cmd = self._match_fast_pattern(user_message) or self._match_fast_command(user_message)
+        if cmd is None:
+            return None
+        # 注入 current_angles 如果需要
+        if current_angles and "args" in cmd:
+            cmd["args"]["current_angles"] = current_angles
+        return {
+            "success": True,
+            "mode": "work",
+            **cmd
+        }
+    
     async def handle_work(
         self, 
         user_message: str, 
@@ -265,53 +675,24 @@ class LLMRouter:
         logger.info("⚙️ [Work Mode] 使用 DeepSeek 处理工作指令...")
 
         # [Fast Path] 常见指令快速通道，避免 LLM 超时
-        fast_commands = {
-            "点头": {"skill": "perform_action", "args": {"action_name": "nod"}, "response": "好的，执行点头动作"},
-            "nod": {"skill": "perform_action", "args": {"action_name": "nod"}, "response": "OK, nodding"},
-            "挥手": {"skill": "perform_action", "args": {"action_name": "wave"}, "response": "好的，向大家挥手"},
-            "wave": {"skill": "perform_action", "args": {"action_name": "wave"}, "response": "OK, waving"},
-            "复位": {"skill": "apply_preset", "args": {"name": "home"}, "response": "正在复位机械臂"},
-            "reset": {"skill": "apply_preset", "args": {"name": "home"}, "response": "Resetting robot"},
-            "回零": {"skill": "apply_preset", "args": {"name": "home"}, "response": "正在回零"},
-            "跳舞": {"skill": "perform_action", "args": {"action_name": "dance"}, "response": "Music! 开始跳舞！"},
-            "转圈": {"skill": "perform_action", "args": {"action_name": "spin"}, "response": "开始旋转"},
-        }
-
-        for key, cmd in fast_commands.items():
-            if key in user_message or (key.lower() in user_message.lower()):
-                logger.info(f"⚡ [Fast Path] Work command detected: {key}")
-                # 注入 current_angles 如果需要
-                if current_angles and "args" in cmd:
-                    cmd["args"]["current_angles"] = current_angles
-                return {
-                    "success": True,
-                    "mode": "work",
-                    **cmd
-                }
+        fast_result = self.try_fast_work(user_message, current_angles)
+        if fast_result is not None:
+            return fast_result
+        
+        # 技能描述不同则提示词不同，作为缓存命名空间的一部分；
+        # 结果会被缓存复用，因此以 temperature=0 请求确定性的决策
+        cache_ns = ("work", skills_description)
+        parsed = self._cache.get(cache_ns, user_message)
+        if parsed is not None:
+            logger.info(f"✅ 命中工作指令缓存: {parsed.get('skill')}")
+            if current_angles and "args" in parsed:
+                parsed["args"]["current_angles"] = current_angles
+            return {
+                "success": True,
+                **parsed
+            }
         
-        system_prompt = f"""你是机械臂助手Zero。
-{skills_description}
-
-## 任务:
-请根据用户指令选择合适的工具(Skill)来控制机械臂。
-
-## 响应格式 (JSON):
-必须返回标准的 JSON 格式：
-{{
-    "mode": "work",
-    "response": "给用户的回复",
-    "skill": "要调用的函数名",
-    "args": {{ "参数名": 值 }}
-}}
-
-## 示例:
-- 用户: "基座转到90度"
-  响应: {{"mode": "work", "response": "好的，正在调整基座", "skill": "control_joint", "args": {{"joint_index": 1, "angle": 90}}}}
-- 用户: "复位"
-  响应: {{"mode": "work", "response": "正在复位", "skill": "apply_preset", "args": {{"name": "home"}}}}
-
-只返回 JSON，不要其他内容。
-"""
+        system_prompt = _work_system_prompt(skills_description)
         
         messages = [
             {"role": "system", "content": system_prompt},
@@ -321,17 +702,17 @@ class LLMRouter:
         result = await self._call_llm(
             model=self.model_decision,  # 使用 DeepSeek
             messages=messages,
-            temperature=0.7,
-            timeout=90.0  # 允许更长时间
+            temperature=0.0,
+            timeout=90.0,  # 允许更长时间
+            response_format=WORK_RESPONSE_FORMAT
         )
         
         if result:
             try:
-                # 清理 JSON
-                clean_result = result.replace("```json", "").replace("```", "").strip()
-                parsed = json.loads(clean_result)
+                parsed = parse_llm_json(result)
                 
                 logger.info(f"✅ 工作指令解析成功: {parsed.get('skill')}")
+                self._cache.put(cache_ns, user_message, parsed)
                 
                 # 注入当前角度
                 if current_angles and "args" in parsed:
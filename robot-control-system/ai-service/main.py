@@ -4,9 +4,9 @@ AI服务主程序
 """
 from fastapi import FastAPI, File, UploadFile, Form, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List, Set, Sequence
+from typing import Optional, Dict, List, Set, Sequence, Iterable
 import uvicorn
 import cv2
 import numpy as np
@@ -22,7 +22,38 @@ import io
 import os
 import time
 import wave
+import struct
+import sys
+import pickle
+import traceback
+from collections import Counter
 import math
+import threading
+from functools import lru_cache, partial
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+try:  # orjson 为可选依赖，未安装时回退标准库
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    class FastJSONResponse(JSONResponse):
+        """用 orjson 序列化的 JSON 响应"""
+        def render(self, content) -> bytes:
+            # 作为默认响应类，兼容返回 int 键字典的接口（如 YOLO 类别表）
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> str:
+        # numpy 标量/数组通过 tolist() 转成 Python 类型
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=lambda o: o.tolist())
+
+    FastJSONResponse = JSONResponse
 from config import load_config, build_gemini_generate_url
 from serial_transport import SerialConfig, SerialTransport, JointLimits
 print("✅✅✅ CODE VERSION CHECK: 2026-01-29 15:25 ✅✅✅")
@@ -33,7 +64,8 @@ from memory import get_memory
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="机械臂AI服务")
+# 所有 HTTP 接口默认用 orjson 序列化响应
+app = FastAPI(title="机械臂AI服务", default_response_class=FastJSONResponse)
 CONFIG = load_config()
 LLM_ENABLED = bool(CONFIG.get("GEMINI_API_KEY"))
 
@@ -70,6 +102,7 @@ app.add_middleware(
 
 # 导入 IK 控制器
 from advanced_ik import AdvancedIKController
+import fast_ik
 from skills import RobotSkills
 
 # 初始化本地 TTS 引擎（Windows SAPI5）
@@ -80,9 +113,11 @@ llm_router = None  # LLM 路由器
 serial_transport: SerialTransport | None = None
 
 # 实体机械臂状态回读（串口）
+# 角度以元组保存：每次更新整体替换，快照可直接共享引用而无需复制
+_EMPTY_ANGLES = (None,) * 6
 telemetry_state: Dict[str, object] = {
-    "angles_deg": [None] * 6,
-    "angles_rad": [None] * 6,
+    "angles_deg": _EMPTY_ANGLES,
+    "angles_rad": _EMPTY_ANGLES,
     "error_code": None,
     "raw": None,
     "timestamp": None,
@@ -96,11 +131,15 @@ telemetry_lock = asyncio.Lock()
 # 控制模式: "simulation" (仅 3D 模型) 或 "physical" (同时发送串口指令)
 control_mode: str = "simulation"
 
+_DEG2RAD = math.pi / 180.0
+_RAD2DEG = 180.0 / math.pi
+_MOCK_IDX = np.arange(6, dtype=np.float64) * 0.5  # Mock 遥测各关节的相位偏移
+
 
 def _snapshot_telemetry() -> Dict[str, object]:
     return {
-        "angles_deg": list(telemetry_state.get("angles_deg") or [None] * 6),
-        "angles_rad": list(telemetry_state.get("angles_rad") or [None] * 6),
+        "angles_deg": telemetry_state.get("angles_deg") or _EMPTY_ANGLES,
+        "angles_rad": telemetry_state.get("angles_rad") or _EMPTY_ANGLES,
         "error_code": telemetry_state.get("error_code"),
         "raw": telemetry_state.get("raw"),
         "timestamp": telemetry_state.get("timestamp"),
@@ -109,6 +148,19 @@ def _snapshot_telemetry() -> Dict[str, object]:
     }
 
 
+def _parse_csv_fast(text: str) -> Optional[Dict[str, object]]:
+    """常见格式 "a1,...,a6[,err]" 的快速解析：一次 split + 一次 try，失败返回 None 交给通用路径"""
+    parts = text.split(',')
+    if not 6 <= len(parts) <= 7:
+        return None
+    try:
+        angles = [float(p) for p in parts[:6]]
+        error_value = int(parts[6]) if len(parts) == 7 else None
+    except ValueError:
+        return None
+    return {"angles_deg": angles, "error_code": error_value}
+
+
 def _parse_serial_line(line: str) -> Optional[Dict[str, object]]:
     payload: Dict[str, object] | None = None
     text = (line or "").strip()
@@ -116,28 +168,34 @@ def _parse_serial_line(line: str) -> Optional[Dict[str, object]]:
         logger.debug("Telemetry parse skipped: empty line")
         return None
 
-    try:
-        obj = json.loads(text)
-        if isinstance(obj, dict):
-            angles: Optional[List[float]] = None
-            if "angles_deg" in obj:
-                angles = obj.get("angles_deg")
-            elif "angles" in obj:
-                angles = obj.get("angles")
-            elif "angles_rad" in obj:
-                try:
-                    angles = [float(a) * 180 / math.pi if a is not None else None for a in obj.get("angles_rad", [])]
-                except Exception:
-                    angles = None
-
-            if angles is not None:
-                payload = {
-                    "angles_deg": angles,
-                    "error_code": obj.get("error_code", obj.get("error")),
-                }
-    except json.JSONDecodeError as exc:
-        logger.debug("Telemetry parse JSON decode failed: %s", exc)
-        payload = None
+    # 非 JSON 行直接走 CSV 快速路径，省去一次必然失败的 JSON 解析
+    if text[0] != '{':
+        payload = _parse_csv_fast(text)
+        if payload is not None:
+            return payload
+    else:
+        try:
+            obj = _json_loads(text)
+            if isinstance(obj, dict):
+                angles: Optional[List[float]] = None
+                if "angles_deg" in obj:
+                    angles = obj.get("angles_deg")
+                elif "angles" in obj:
+                    angles = obj.get("angles")
+                elif "angles_rad" in obj:
+                    try:
+                        angles = [float(a) * 180 / math.pi if a is not None else None for a in obj.get("angles_rad", [])]
+                    except Exception:
+                        angles = None
+
+                if angles is not None:
+                    payload = {
+                        "angles_deg": angles,
+                        "error_code": obj.get("error_code", obj.get("error")),
+                    }
+        except json.JSONDecodeError as exc:
+            logger.debug("Telemetry parse JSON decode failed: %s", exc)
+            payload = None
 
     if payload is None:
         parts = [p.strip() for p in text.split(',') if p.strip() != ""]
@@ -189,18 +247,54 @@ def _parse_serial_line(line: str) -> Optional[Dict[str, object]]:
     return payload
 
 
+TELEMETRY_BROADCAST_BATCH = 50
+# 数据未变化时最多间隔这么久（秒）再广播一次，作为心跳
+TELEMETRY_HEARTBEAT_INTERVAL = 2.0
+_last_broadcast_key: Optional[str] = None
+_last_broadcast_ts: float = 0.0
+
+
 async def _broadcast_telemetry(payload: Dict[str, object]) -> None:
+    global _last_broadcast_key, _last_broadcast_ts
     if not telemetry_clients:
         return
-    stale: List[WebSocket] = []
-    for client in list(telemetry_clients):
+    # 除时间戳外内容与上次相同则跳过（机械臂静止时），定期仍发送一次心跳
+    key = _json_dumps({k: v for k, v in payload.items() if k != "timestamp"})
+    now = time.monotonic()
+    if key == _last_broadcast_key and now - _last_broadcast_ts < TELEMETRY_HEARTBEAT_INTERVAL:
+        return
+    _last_broadcast_key = key
+    _last_broadcast_ts = now
+    # 只序列化一次，所有客户端共用同一份文本
+    message = _json_dumps({"type": "telemetry", "data": payload})
+
+    async def _safe_send(client: WebSocket) -> bool:
         try:
-            await client.send_json({"type": "telemetry", "data": payload})
+            await client.send_text(message)
+            return True
         except Exception as exc:
             logger.warning("Telemetry client send failed: %s", exc)
-            stale.append(client)
-    for client in stale:
-        telemetry_clients.discard(client)
+            return False
+
+    # 发送期间集合可能被修改（连接/断开），先取快照；失败的客户端最后一次性移除
+    clients = tuple(telemetry_clients)
+    stale: List[WebSocket] = []
+    for start in range(0, len(clients), TELEMETRY_BROADCAST_BATCH):
+        batch = clients[start:start + TELEMETRY_BROADCAST_BATCH]
+        # 并发发送，慢客户端不会阻塞其他客户端
+        results = await asyncio.gather(*(_safe_send(client) for client in batch))
+        stale.extend(client for client, ok in zip(batch, results) if not ok)
+        if start + TELEMETRY_BROADCAST_BATCH < len(clients):
+            await asyncio.sleep(0)
+    if stale:
+        telemetry_clients.difference_update(stale)
+
+
+def _float_or_nan(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
 
 
 async def _apply_telemetry_update(
@@ -210,29 +304,26 @@ async def _apply_telemetry_update(
     raw: Optional[str] = None,
     serial_mock: bool = True,
 ) -> None:
-    angles_list = []
-    angles_rad = []
-    for angle in angles_deg:
-        if angle is None:
-            angles_list.append(None)
-            angles_rad.append(None)
-        else:
-            try:
-                numeric = float(angle)
-            except (TypeError, ValueError):
-                numeric = None
-            if numeric is None:
-                angles_list.append(None)
-                angles_rad.append(None)
-            else:
-                angles_list.append(round(numeric, 2))
-                angles_rad.append(numeric * math.pi / 180)
+    try:
+        # 常见情况：全部是数值（None 转为 NaN），一次转换
+        deg = np.asarray(angles_deg, dtype=np.float64)
+    except (TypeError, ValueError):
+        deg = np.array([_float_or_nan(angle) for angle in angles_deg], dtype=np.float64)
+
+    angles_list = np.round(deg, 2).tolist()
+    angles_rad = (deg * _DEG2RAD).tolist()
+    missing = np.isnan(deg)
+    if missing.any():
+        # 无效值统一以 None 输出
+        keep = (~missing).tolist()
+        angles_list = [a if k else None for a, k in zip(angles_list, keep)]
+        angles_rad = [a if k else None for a, k in zip(angles_rad, keep)]
 
     timestamp = time.time()
 
     async with telemetry_lock:
-        telemetry_state["angles_deg"] = angles_list
-        telemetry_state["angles_rad"] = angles_rad
+        telemetry_state["angles_deg"] = tuple(angles_list)
+        telemetry_state["angles_rad"] = tuple(angles_rad)
         telemetry_state["error_code"] = error_code
         telemetry_state["raw"] = raw
         telemetry_state["timestamp"] = timestamp
@@ -243,28 +334,79 @@ async def _apply_telemetry_update(
     await _broadcast_telemetry(payload)
 
 
+# 实体模式下，收到一帧状态后再等待该时长，把期间到达的报文合并为一次广播（取最新）
+TELEMETRY_COALESCE_WINDOW = 0.01
+
+
+def _serial_status_reader(
+    transport: SerialTransport,
+    loop: asyncio.AbstractEventLoop,
+    queue: "asyncio.Queue[dict]",
+    stop: threading.Event,
+) -> None:
+    """后台线程：阻塞读取串口状态报文并推送到事件循环的队列"""
+    while not stop.is_set():
+        try:
+            status = transport.read_status()
+        except Exception as exc:
+            logger.error("Serial status reader error: %s", exc)
+            status = None
+        if status:
+            loop.call_soon_threadsafe(queue.put_nowait, status)
+        else:
+            # readline 超时或端口未打开：短暂等待后重试，避免空转
+            stop.wait(0.1)
+
+
 async def telemetry_loop() -> None:
     phase = 0.0
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[dict]" = asyncio.Queue()
+    reader_transport: SerialTransport | None = None
+    reader_stop: threading.Event | None = None
     logger.info("Telemetry loop started")
     try:
         while True:
-            await asyncio.sleep(0.1)  # Reduced to 100ms for better responsiveness
             current_transport = serial_transport
+            physical = current_transport is not None and not current_transport.mock_mode
+
+            # 实体模式由读串口的后台线程推送数据；传输层变化时重启线程
+            if physical and reader_transport is not current_transport:
+                if reader_stop:
+                    reader_stop.set()
+                reader_stop = threading.Event()
+                reader_transport = current_transport
+                threading.Thread(
+                    target=_serial_status_reader,
+                    args=(current_transport, loop, queue, reader_stop),
+                    name="serial-telemetry",
+                    daemon=True,
+                ).start()
+            elif not physical and reader_stop:
+                reader_stop.set()
+                reader_stop = None
+                reader_transport = None
+
             try:
-                if current_transport and not current_transport.mock_mode:
-                    # 使用新的 read_status() 方法
-                    status = current_transport.read_status()
-                    if status:
-                        await _apply_telemetry_update(
-                            status['angles_deg'],
-                            error_code=status.get('error_code', 0),
-                            raw=None,
-                            serial_mock=False,
-                        )
+                if physical:
+                    try:
+                        status = await asyncio.wait_for(queue.get(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                    await asyncio.sleep(TELEMETRY_COALESCE_WINDOW)
+                    while not queue.empty():
+                        status = queue.get_nowait()
+                    await _apply_telemetry_update(
+                        status['angles_deg'],
+                        error_code=status.get('error_code', 0),
+                        raw=None,
+                        serial_mock=False,
+                    )
                 else:
+                    await asyncio.sleep(0.1)  # Reduced to 100ms for better responsiveness
                     # Mock 模式：生成模拟数据
-                    phase += 0.1
-                    angles = [round(math.sin(phase + idx * 0.5) * 25, 2) for idx in range(6)]
+                    phase = (phase + 0.1) % (2 * math.pi)
+                    angles = np.round(np.sin(phase + _MOCK_IDX) * 25, 2).tolist()
                     await _apply_telemetry_update(
                         angles,
                         error_code=0,
@@ -278,6 +420,8 @@ async def telemetry_loop() -> None:
     except asyncio.CancelledError:
         logger.info("Telemetry loop cancelled")
     finally:
+        if reader_stop:
+            reader_stop.set()
         logger.info("Telemetry loop stopped")
 
 
@@ -286,6 +430,7 @@ def init_services():
     global ik_controller, skills, serial_transport, llm_router
     try:
         ik_controller = AdvancedIKController()
+        _ik_cached.cache_clear()
         logger.info("[OK] Advanced IK Controller initialized")
         
         skills = RobotSkills(ik_controller)
@@ -300,7 +445,6 @@ def init_services():
             logger.info("[OK] LLM Router initialized")
         except Exception as e:
             logger.error(f"[ERROR] Failed to initialize LLM Router: {e}")
-            import traceback
             traceback.print_exc()
             llm_router = None
     else:
@@ -309,6 +453,8 @@ def init_services():
     
     init_local_tts()
     init_asr()
+    init_aruco()
+    _load_calibration_matrix()
 
     # 初始化串口传输层
     try:
@@ -322,6 +468,9 @@ def init_services():
         logger.error("Failed to initialize serial transport: %s", exc)
         serial_transport = None
 
+    # YOLO 模型在后台加载，服务先开始接受请求
+    start_yolo_loading()
+
 def init_local_tts():
     """初始化本地 TTS 引擎"""
     global local_tts_engine
@@ -354,21 +503,140 @@ def init_local_tts():
 
 yolo_model = None
 DETECTION_ENABLED = False
-try:
-    from ultralytics import YOLO as _YOLO
-    YOLO = _YOLO
-    logger.info("正在加载YOLO8模型...")
-    yolo_model = YOLO('yolov8n.pt')
-    DETECTION_ENABLED = True
-    logger.info("YOLO8模型加载完成")
-except Exception as e:
-    logger.error(f"YOLO/torch 初始化失败，检测功能将禁用: {e}")
-
-calibration_points = []
+yolo_ready = threading.Event()  # 模型加载结束（无论成功与否）后置位
+_yolo_thread: threading.Thread | None = None
+# ultralytics 的 predictor 不是线程安全的：所有 yolo_model(...) 调用都经由这个单线程执行器串行执行
+_inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yolo")
+
+async def _run_inference(fn, *args, **kwargs):
+    """在推理线程中执行 fn(*args, **kwargs)，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_inference_executor, partial(fn, *args, **kwargs))
+
+# 检测模型候选，按优先级依次尝试：INT8 引擎 → FP16 引擎 → PyTorch 权重
+# 引擎需在目标 GPU 上用 export_yolo.py 离线导出，不存在时直接跳过
+YOLO_ENGINE_CANDIDATES = ("yolov8n_int8.engine", "yolov8n_fp16.engine")
+YOLO_FALLBACK_WEIGHTS = "yolov8n.pt"
+DETECT_IMGSZ = 640  # 与引擎导出尺寸一致
+LETTERBOX_FILL = 114 / 255.0  # ultralytics letterbox 的填充灰度
+
+# GPU 预处理（torchvision nvJPEG 解码 + letterbox），仅在 CUDA 可用时启用
+_torch = None
+_decode_jpeg_gpu = None
+
+def _yolo_candidates():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    configured = CONFIG.get("YOLO_MODEL")
+    names = ((configured,) if configured else ()) + YOLO_ENGINE_CANDIDATES
+    paths = [os.path.join(base_dir, n) if not os.path.isabs(n) else n for n in names]
+    candidates = [p for p in dict.fromkeys(paths) if os.path.exists(p)]
+    candidates.append(YOLO_FALLBACK_WEIGHTS)
+    return candidates
+
+def _load_yolo():
+    """后台线程加载并预热 YOLO 模型，不阻塞服务启动"""
+    global YOLO, yolo_model, DETECTION_ENABLED
+    try:
+        from ultralytics import YOLO as _YOLO
+        YOLO = _YOLO
+        for path in _yolo_candidates():
+            try:
+                logger.info(f"正在加载YOLO8模型: {path}")
+                # 引擎文件不含任务信息，需显式指定 task
+                model = YOLO(path, task='detect')
+                # 用空白图推理一次完成预热，首个真实请求不再承担初始化开销
+                model(np.zeros((640, 640, 3), np.uint8), verbose=False)
+            except Exception as e:
+                logger.warning(f"YOLO 模型 {path} 加载失败，尝试下一个: {e}")
+                continue
+            yolo_model = model
+            DETECTION_ENABLED = True
+            logger.info(f"YOLO8模型加载完成: {path}")
+            _init_gpu_preprocess()
+            break
+        else:
+            logger.error("所有 YOLO 模型均加载失败，检测功能将禁用")
+    except Exception as e:
+        logger.error(f"YOLO/torch 初始化失败，检测功能将禁用: {e}")
+    finally:
+        yolo_ready.set()
+
+def _init_gpu_preprocess():
+    """torch/torchvision 可用且有 CUDA 时，/api/detect 改在 GPU 上解码和 letterbox"""
+    global _torch, _decode_jpeg_gpu
+    try:
+        import torch
+        from torchvision.io import decode_jpeg
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        _torch, _decode_jpeg_gpu = torch, decode_jpeg
+        logger.info("检测预处理使用 GPU (nvJPEG)")
+
+def _preprocess_gpu(data: np.ndarray):
+    """
+    上传字节 → GPU 上 letterbox 后的 3xSxS RGB float 张量
+    JPEG 直接由 nvJPEG 解码到显存；其他格式在 CPU 解码后上传。
+    返回 (tensor, gain, pad_x, pad_y)，解码失败返回 None
+    """
+    torch = _torch
+    if data[:2].tobytes() == b"\xff\xd8":
+        img = _decode_jpeg_gpu(torch.from_numpy(data), device="cuda")
+    else:
+        bgr = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if bgr is None:
+            return None
+        img = torch.from_numpy(np.ascontiguousarray(bgr[..., ::-1].transpose(2, 0, 1))).cuda()
+    _, h, w = img.shape
+    gain = min(DETECT_IMGSZ / h, DETECT_IMGSZ / w)
+    nh, nw = round(h * gain), round(w * gain)
+    pad_y, pad_x = (DETECT_IMGSZ - nh) // 2, (DETECT_IMGSZ - nw) // 2
+    resized = torch.nn.functional.interpolate(
+        img[None].float().div_(255.0), size=(nh, nw), mode="bilinear", align_corners=False)
+    out = torch.full((3, DETECT_IMGSZ, DETECT_IMGSZ), LETTERBOX_FILL, device=img.device)
+    out[:, pad_y:pad_y + nh, pad_x:pad_x + nw] = resized[0]
+    return out, gain, pad_x, pad_y
+
+def start_yolo_loading():
+    global _yolo_thread
+    if _yolo_thread is None:
+        _yolo_thread = threading.Thread(target=_load_yolo, name="yolo-loader", daemon=True)
+        _yolo_thread.start()
+
+def _detection_unavailable_error() -> str:
+    if not yolo_ready.is_set():
+        return "检测模型加载中，请稍后重试"
+    return "检测功能不可用：YOLO/torch 未正确安装"
+
+# 标定点：每行 (u, v, x, y, z)，容量按需翻倍，有效数据为前 _calib_count 行
+_CALIB_FIELDS = ("u", "v", "x", "y", "z")
+_calib_arr = np.empty((16, 5), dtype=np.float64)
+_calib_count = 0
 calibration_matrix = None
+calibration_matrix_np: Optional[np.ndarray] = None  # calibration_matrix 的 (3, 3) 数组形式
 CALIB_MATRIX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_matrix.json")
 CALIB_POINTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_points.json")
 
+# ArUco 检测器（启动时创建一次，避免每次请求重新构建字典和参数表）
+ARUCO_DICT = None
+ARUCO_DETECTOR = None
+_aruco_marker_png: Optional[bytes] = None  # 可打印标记图片的 PNG 缓存
+
+def init_aruco():
+    """初始化 ArUco 检测器（4x4_50 字典）并预先生成可打印的标记图片"""
+    global ARUCO_DICT, ARUCO_DETECTOR, _aruco_marker_png
+    try:
+        ARUCO_DICT = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+        ARUCO_DETECTOR = cv2.aruco.ArucoDetector(ARUCO_DICT, cv2.aruco.DetectorParameters())
+        # ID 为 0 的 4x4 标记，内容固定
+        marker_img = cv2.aruco.generateImageMarker(ARUCO_DICT, 0, 400)
+        _, buffer = cv2.imencode('.png', marker_img)
+        _aruco_marker_png = buffer.tobytes()
+        return True
+    except Exception as e:
+        logger.error(f"ArUco 检测器初始化失败: {e}")
+        return False
+
 def _validate_point(d):
     try:
         u = float(d.get("u"))
@@ -382,35 +650,68 @@ def _validate_point(d):
         return False, None
     return True, {"u": u, "v": v, "x": x, "y": y, "z": z}
 
-def _compute_affine(points):
-    import numpy as np
-    U = np.array([[p["u"], p["v"], 1.0] for p in points], dtype=np.float64)
-    X = np.array([p["x"] for p in points], dtype=np.float64)
-    Y = np.array([p["y"] for p in points], dtype=np.float64)
-    Z = np.array([p["z"] for p in points], dtype=np.float64)
-    ax, _, _, _ = np.linalg.lstsq(U, X, rcond=None)
-    ay, _, _, _ = np.linalg.lstsq(U, Y, rcond=None)
-    az, _, _, _ = np.linalg.lstsq(U, Z, rcond=None)
-    M = np.vstack([ax, ay, az]).tolist()
-    U_pred = U
-    Xp = U_pred @ ax
-    Yp = U_pred @ ay
-    Zp = U_pred @ az
-    rmse_x = float(np.sqrt(np.mean((Xp - X) ** 2)))
-    rmse_y = float(np.sqrt(np.mean((Yp - Y) ** 2)))
-    rmse_z = float(np.sqrt(np.mean((Zp - Z) ** 2)))
-    rmse = float(np.sqrt(np.mean((Xp - X) ** 2 + (Yp - Y) ** 2 + (Zp - Z) ** 2)))
+def _calib_append(point):
+    """追加一个标定点到数值缓冲区"""
+    global _calib_arr, _calib_count
+    if _calib_count == len(_calib_arr):
+        grown = np.empty((2 * len(_calib_arr), 5), dtype=np.float64)
+        grown[:_calib_count] = _calib_arr
+        _calib_arr = grown
+    _calib_arr[_calib_count] = [point[k] for k in _CALIB_FIELDS]
+    _calib_count += 1
+
+def _calib_points_array():
+    """当前标定点的 (N, 5) 视图"""
+    return _calib_arr[:_calib_count]
+
+def _compute_affine(arr):
+    """arr: (N, 5) 标定点数组，每行 (u, v, x, y, z)"""
+    # 三个坐标轴共用同一个设计矩阵，一次 lstsq 同时求解 (3, 3) 系数
+    UV1 = np.column_stack([arr[:, 0], arr[:, 1], np.ones(len(arr))])
+    XYZ = arr[:, 2:5]
+    A, _, _, _ = np.linalg.lstsq(UV1, XYZ, rcond=None)
+    sq = (UV1 @ A - XYZ) ** 2
+    rmse_x, rmse_y, rmse_z = np.sqrt(sq.mean(axis=0)).tolist()
+    rmse = float(np.sqrt(sq.sum(axis=1).mean()))
     return {
-        "matrix": M,
+        "matrix": A.T.tolist(),
         "rmse": {"x": rmse_x, "y": rmse_y, "z": rmse_z, "overall": rmse}
     }
 
+def _set_calibration_matrix(m):
+    """更新标定矩阵（列表形式用于返回/保存，数组形式用于计算）"""
+    global calibration_matrix, calibration_matrix_np
+    calibration_matrix = m
+    calibration_matrix_np = None if m is None else np.asarray(m, dtype=np.float64)
+
+def _load_calibration_matrix():
+    """启动时从文件加载已保存的标定矩阵，返回数组形式（可能为 None）"""
+    try:
+        if os.path.exists(CALIB_MATRIX_PATH):
+            with open(CALIB_MATRIX_PATH, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+                if "matrix" in obj:
+                    m = obj["matrix"]
+                    if isinstance(m, list) and len(m) == 3 and all(isinstance(row, list) and len(row) == 3 for row in m):
+                        _set_calibration_matrix(m)
+    except Exception as e:
+        logger.warning(f"加载标定矩阵失败: {e}")
+    return calibration_matrix_np
+
+# 标定文件读写放到线程池执行，锁保证同一文件的写入顺序
+_calib_io_lock = asyncio.Lock()
+
+def _write_json_file(path, obj):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
 def _apply_matrix(M, u, v):
-    ax, ay, az = M
-    x = ax[0] * u + ax[1] * v + ax[2]
-    y = ay[0] * u + ay[1] * v + ay[2]
-    z = az[0] * u + az[1] * v + az[2]
-    return {"x": float(x), "y": float(y), "z": float(z)}
+    x, y, z = (M @ np.array([u, v, 1.0])).tolist()
+    return {"x": x, "y": y, "z": z}
 
 @app.post("/api/calibration/add")
 async def calibration_add(request: Request):
@@ -419,13 +720,14 @@ async def calibration_add(request: Request):
         ok, point = _validate_point(data)
         if not ok:
             return {"success": False, "error": "参数无效"}
-        calibration_points.append(point)
+        _calib_append(point)
+        snapshot = {"points": [dict(zip(_CALIB_FIELDS, row)) for row in _calib_points_array().tolist()]}
         try:
-            with open(CALIB_POINTS_PATH, "w", encoding="utf-8") as f:
-                json.dump({"points": calibration_points}, f, ensure_ascii=False, indent=2)
+            async with _calib_io_lock:
+                await asyncio.to_thread(_write_json_file, CALIB_POINTS_PATH, snapshot)
         except Exception as e:
             logger.warning(f"保存标定点失败: {e}")
-        return {"success": True, "count": len(calibration_points), "last": point}
+        return {"success": True, "count": _calib_count, "last": point}
     except Exception as e:
         logger.error(f"标定点添加失败: {e}")
         return {"success": False, "error": str(e)}
@@ -433,20 +735,19 @@ async def calibration_add(request: Request):
 @app.post("/api/calibration/calculate")
 async def calibration_calculate():
     try:
-        if len(calibration_points) < 4:
+        if _calib_count < 4:
             return {"success": False, "error": "标定点不足，至少需要4个"}
-        result = _compute_affine(calibration_points)
-        global calibration_matrix
-        calibration_matrix = result["matrix"]
+        result = _compute_affine(_calib_points_array())
+        _set_calibration_matrix(result["matrix"])
         payload = {
             "matrix": calibration_matrix,
             "rmse": result["rmse"],
             "timestamp": int(time.time()),
-            "count": len(calibration_points)
+            "count": _calib_count
         }
         try:
-            with open(CALIB_MATRIX_PATH, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            async with _calib_io_lock:
+                await asyncio.to_thread(_write_json_file, CALIB_MATRIX_PATH, payload)
         except Exception as e:
             logger.warning(f"保存标定矩阵失败: {e}")
         return {"success": True, **payload}
@@ -457,19 +758,15 @@ async def calibration_calculate():
 @app.post("/api/calibration/clear")
 async def calibration_clear():
     try:
-        calibration_points.clear()
-        global calibration_matrix
-        calibration_matrix = None
-        try:
-            if os.path.exists(CALIB_POINTS_PATH):
-                os.remove(CALIB_POINTS_PATH)
-        except:
-            pass
-        try:
-            if os.path.exists(CALIB_MATRIX_PATH):
-                os.remove(CALIB_MATRIX_PATH)
-        except:
-            pass
+        global _calib_count
+        _calib_count = 0
+        _set_calibration_matrix(None)
+        async with _calib_io_lock:
+            for path in (CALIB_POINTS_PATH, CALIB_MATRIX_PATH):
+                try:
+                    await asyncio.to_thread(_remove_file, path)
+                except OSError:
+                    pass
         return {"success": True}
     except Exception as e:
         logger.error(f"标定清空失败: {e}")
@@ -481,45 +778,116 @@ async def calibration_apply(request: Request):
         data = await request.json()
         u = float(data.get("u"))
         v = float(data.get("v"))
-        if calibration_matrix is None:
-            try:
-                if os.path.exists(CALIB_MATRIX_PATH):
-                    with open(CALIB_MATRIX_PATH, "r", encoding="utf-8") as f:
-                        obj = json.load(f)
-                        if "matrix" in obj:
-                            m = obj["matrix"]
-                            if isinstance(m, list) and len(m) == 3 and all(isinstance(row, list) and len(row) == 3 for row in m):
-                                calibration_matrix = m
-            except Exception as e:
-                logger.warning(f"加载标定矩阵失败: {e}")
-        if calibration_matrix is None:
+        M = calibration_matrix_np
+        if M is None:
             return {"success": False, "error": "未计算标定矩阵"}
-        pos = _apply_matrix(calibration_matrix, u, v)
+        pos = _apply_matrix(M, u, v)
         return {"success": True, "position": pos}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@app.post("/api/calibration/apply_batch")
+async def calibration_apply_batch(request: Request):
+    """批量把像素坐标 [[u, v], ...] 映射为机械臂坐标 [[x, y, z], ...]"""
+    try:
+        data = await request.json()
+        P = np.asarray(data.get("points", []), dtype=np.float64).reshape(-1, 2)
+        M = calibration_matrix_np
+        if M is None:
+            return {"success": False, "error": "未计算标定矩阵"}
+        XYZ = P @ M[:, :2].T + M[:, 2]
+        return {"success": True, "positions": XYZ.tolist()}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 # ============================================================
 # ArUco 自动标定 API
 # ============================================================
 
+# 上传图片长边超过该像素数时降采样解码（u, v 为归一化坐标，不受缩放影响）
+ARUCO_DECODE_MAX_SIDE = 1600
+
+def _image_size(data: bytes):
+    """从 JPEG / PNG 文件头读取 (宽, 高)，无法识别时返回 None"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        # SOF0-SOF15（不含 DHT/JPG/DAC）携带图像尺寸
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h = int.from_bytes(data[i + 5:i + 7], "big")
+            w = int.from_bytes(data[i + 7:i + 9], "big")
+            return w, h
+        if marker == 0xFF:  # 填充字节
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # 无长度字段的标记
+            i += 2
+            continue
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+async def _read_upload(file: UploadFile) -> np.ndarray:
+    """读取上传文件为 uint8 数组；大小已知时直接 readinto 预分配的数组，不产生中间 bytes"""
+    size = file.size
+    if size is None:
+        return np.frombuffer(await file.read(), np.uint8)
+    buf = np.empty(size, dtype=np.uint8)
+
+    def _readinto() -> int:
+        view = memoryview(buf)
+        file.file.seek(0)
+        total = 0
+        while total < size:
+            n = file.file.readinto(view[total:])
+            if not n:
+                break
+            total += n
+        return total
+
+    return buf[:await asyncio.to_thread(_readinto)]
+
+def _decode_for_detection(data: np.ndarray):
+    """
+    解码上传图片（uint8 数组），大图直接用 IMREAD_REDUCED_COLOR_* 在解码阶段降采样
+
+    返回:
+        (img, scale): 图片和相对原图的缩小倍数
+    """
+    size = _image_size(memoryview(data))
+    scale = 1
+    if size is not None:
+        longest = max(size)
+        while scale < 8 and longest / scale > ARUCO_DECODE_MAX_SIDE:
+            scale *= 2
+    flag = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }[scale]
+    return cv2.imdecode(data, flag), scale
+
 @app.post("/api/calibration/auto_detect")
 async def calibration_auto_detect(file: UploadFile = File(...)):
     """从图片中检测 ArUco 码中心点"""
     try:
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        data = await _read_upload(file)
+        img, scale = _decode_for_detection(data)
         if img is None:
             return {"success": False, "error": "图片解码失败"}
             
-        # 初始化 ArUco 检测
-        # 使用 4x4_50 字典作为默认配置
-        aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
-        parameters = cv2.aruco.DetectorParameters()
-        detector = cv2.aruco.ArucoDetector(aruco_dict, parameters)
+        if ARUCO_DETECTOR is None and not init_aruco():
+            return {"success": False, "error": "ArUco 检测器不可用"}
         
-        corners, ids, rejected = detector.detectMarkers(img)
+        corners, ids, rejected = ARUCO_DETECTOR.detectMarkers(img)
         
         if ids is None or len(ids) == 0:
             return {"success": False, "error": "未检测到 ArUco 标记"}
@@ -539,8 +907,9 @@ async def calibration_auto_detect(file: UploadFile = File(...)):
             "id": int(ids[0][0]),
             "u": u, 
             "v": v,
-            "x_px": center_x,
-            "y_px": center_y
+            # 像素坐标换算回原图尺寸
+            "x_px": center_x * scale,
+            "y_px": center_y * scale
         }
     except Exception as e:
         logger.error(f"ArUco 检测错误: {e}")
@@ -548,14 +917,11 @@ async def calibration_auto_detect(file: UploadFile = File(...)):
 
 @app.get("/api/calibration/aruco_marker")
 async def get_aruco_marker():
-    """生成并返回 ArUco 标记图片供用户下载打印"""
+    """返回 ArUco 标记图片供用户下载打印"""
     try:
-        # 生成 ID 为 0 的 4x4 标记
-        aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
-        marker_img = cv2.aruco.generateImageMarker(aruco_dict, 0, 400)
-        
-        _, buffer = cv2.imencode('.png', marker_img)
-        return StreamingResponse(io.BytesIO(buffer), media_type="image/png")
+        if _aruco_marker_png is None and not init_aruco():
+            return {"success": False, "error": "ArUco 检测器不可用"}
+        return Response(content=_aruco_marker_png, media_type="image/png")
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -565,15 +931,17 @@ class MockCamera:
         self.width = 640
         self.height = 480
         self.frame_count = 0
+        # 背景和文字固定，只绘制一次；每帧复制到复用的缓冲区再画小球
+        self._bg = np.full((self.height, self.width, 3), 20, dtype=np.uint8)
+        cv2.putText(self._bg, "MOCK CAMERA", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self._frame = self._bg.copy()
         logger.warning("未检测到真实摄像头，使用模拟信号源")
 
     def read(self):
-        # 生成一个移动的色块
-        img = np.zeros((self.height, self.width, 3), np.uint8)
+        """返回复用的帧缓冲区，下一次 read() 会覆盖其内容"""
         self.frame_count += 1
-        
-        # 绘制背景
-        img[:] = (20, 20, 20)
+        img = self._frame
+        np.copyto(img, self._bg)
         
         # 移动的小球
         x = int(self.width / 2 + 100 * np.sin(self.frame_count * 0.1))
@@ -581,7 +949,6 @@ class MockCamera:
         
         # 画一个球 (模拟 'sports ball' 或类似物体)
         cv2.circle(img, (x, y), 30, (0, 0, 255), -1) 
-        cv2.putText(img, "MOCK CAMERA", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
         
         return True, img
 
@@ -617,6 +984,7 @@ async def system_status():
         "gemini_model": CONFIG.get("GEMINI_MODEL"),
         "proxy_configured": bool(CONFIG.get("HTTP_PROXY")),
         "detection_enabled": bool(DETECTION_ENABLED),
+        "detection_loading": not yolo_ready.is_set(),
         "serial_enabled": bool(CONFIG.get("SERIAL_ENABLED")),
         "serial_mock": serial_transport.mock_mode if serial_transport else True,
     }
@@ -724,6 +1092,7 @@ async def set_control_mode(request: ControlModeRequest):
     if request.mode not in ("simulation", "physical"):
         return {"success": False, "error": "Invalid mode. Must be 'simulation' or 'physical'"}
     control_mode = request.mode
+    _ik_cached.cache_clear()
     logger.info(f"控制模式切换为: {control_mode}")
     return {"success": True, "mode": control_mode}
 
@@ -737,10 +1106,32 @@ async def get_hardware_status():
         "serial_connected": serial_transport is not None and not serial_transport.mock_mode,
         "serial_port": CONFIG.get("SERIAL_PORT"),
         "serial_mock": serial_transport.mock_mode if serial_transport else True,
-        "available_ports": SerialTransport.available_ports() if serial_transport else []
+        "available_ports": SerialTransport.available_ports() if serial_transport else [],
+        "estopped": serial_transport.estopped if serial_transport else False
     }
 
 
+@app.post("/api/control/emergency_stop")
+async def emergency_stop():
+    """紧急停止：立即发送 ESTOP，之后拒绝所有运动指令，直到调用 /api/control/reset"""
+    if not serial_transport:
+        return {"success": False, "error": "串口未初始化"}
+    ok = serial_transport.send_emergency_stop()
+    logger.warning(f"⚠️ 紧急停止 (sent={ok})")
+    return {"success": ok, "estopped": serial_transport.estopped}
+
+
+@app.post("/api/control/reset")
+async def reset_controller():
+    """复位控制器并解除紧急停止锁定"""
+    if not serial_transport:
+        return {"success": False, "error": "串口未初始化"}
+    # 复位要等串口锁（读线程可能正阻塞在 readline），放到线程中执行
+    ok = await asyncio.to_thread(serial_transport.send_reset_controller)
+    logger.info(f"控制器复位 (sent={ok})")
+    return {"success": ok, "estopped": serial_transport.estopped}
+
+
 def dispatch_angles(angles_deg: list, source: str = "unknown") -> dict:
     """
     统一的角度指令分发器
@@ -778,7 +1169,8 @@ def dispatch_angles(angles_deg: list, source: str = "unknown") -> dict:
     }
     
     if control_mode == "physical" and serial_transport:
-        ok = serial_transport.send_joint_angles(angles_deg, validate_limits=True)
+        # 上面已经校验过限位，不再重复校验
+        ok = serial_transport.send_joint_angles(angles_deg, validate_limits=False)
         result["serial_sent"] = ok
         result["serial_mock"] = serial_transport.mock_mode
         if ok:
@@ -806,12 +1198,26 @@ async def api_dispatch_angles(request: DispatchAnglesRequest):
 
 
 
+_warmup_task: asyncio.Task | None = None
+
+async def _prewarm_llm_connections():
+    """启动后在后台建立到 LLM 服务的连接，首次对话不再等待 DNS + TCP/TLS 握手"""
+    jobs = []
+    if llm_router:
+        jobs.append(llm_router.warmup())
+    if LLM_ENABLED:
+        jobs.append(_gemini_client.get(GEMINI_BASE_URL, timeout=5.0))
+    for result in await asyncio.gather(*jobs, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning(f"LLM 连接预热失败: {result}")
+
 @app.on_event("startup")
 async def on_startup():
-    global telemetry_task
+    global telemetry_task, _warmup_task
     init_services()
     if not telemetry_task:
         telemetry_task = asyncio.create_task(telemetry_loop())
+    _warmup_task = asyncio.create_task(_prewarm_llm_connections())
 
 
 @app.on_event("shutdown")
@@ -824,99 +1230,205 @@ async def on_shutdown():
         except Exception:
             pass
         telemetry_task = None
+    if _camera_task and not _camera_task.done():
+        _camera_task.cancel()
+    if _inference_task and not _inference_task.done():
+        _inference_task.cancel()
+    if _td3_task and not _td3_task.done():
+        _td3_task.cancel()
+    if _warmup_task and not _warmup_task.done():
+        _warmup_task.cancel()
+    _local_tts_executor.submit(_close_ps_host)
+    _local_tts_executor.shutdown(wait=False)
+    _cv_executor.shutdown(wait=False)
+    _inference_executor.shutdown(wait=False)
     if serial_transport:
         serial_transport.close()
+    if llm_router:
+        await llm_router.aclose()
+    await _gemini_client.aclose()
 
 IP_CAMERA_BASE = CONFIG.get("IP_CAMERA_URL", "http://192.168.1.100:8080")
 
-def generate_frames():
-    """视频流生成器 -带重试和多路尝试"""
+# 视频流 JPEG 编码：优先用 libjpeg-turbo（PyTurboJPEG，可选依赖），否则回退 OpenCV
+JPEG_QUALITY = 80
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    _tj = TurboJPEG()
+except Exception:  # 未安装 PyTurboJPEG 或找不到 libturbojpeg 动态库
+    _tj = None
+
+def _encode_jpeg(img: np.ndarray) -> bytes:
+    """把 BGR 图像编码为 JPEG 字节"""
+    if _tj is not None:
+        return _tj.encode(img, quality=JPEG_QUALITY, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buffer.tobytes()
+
+# IP 摄像头走 FFmpeg 后端：断流由 FFmpeg 内部自动重连，打开/读帧都有超时，避免 read() 长时间挂起
+# 环境变量在每次打开捕获时读取，已在外部设置时不覆盖
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "reconnect;1|reconnect_streaming;1|reconnect_delay_max;2")
+CAMERA_TIMEOUT_MS = 2000
+CAMERA_MAX_READ_FAILURES = 5  # 连续读帧失败达到该次数才重建 VideoCapture
+
+def _open_capture(source):
+    """source 为本地摄像头编号 (int) 或 IP 摄像头 URL (str)"""
+    if isinstance(source, int):
+        return cv2.VideoCapture(source)
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, CAMERA_TIMEOUT_MS,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, CAMERA_TIMEOUT_MS,
+    ])
+
+def _open_camera():
+    """
+    打开配置的摄像头（阻塞，可能耗时数秒，需在线程中调用）
+
+    返回:
+        (cap, source): 打开失败时 cap 为 None；source 供重连时复用
+    """
     # 尝试不同的 URL 后缀
     paths = ["/video", "/", "/videostream.cgi", "/live"]
     cap = None
-    is_local = False
+    source = 0
     
     # 检查是否配置为本地摄像头 (如 "0" 或 "1")
     if str(IP_CAMERA_BASE).isdigit():
         logger.info(f"使用本地摄像头: Index {IP_CAMERA_BASE}")
-        cap = cv2.VideoCapture(int(IP_CAMERA_BASE))
-        is_local = True
+        source = int(IP_CAMERA_BASE)
+        cap = _open_capture(source)
     else:
         # 尝试 IP 摄像头连接
         for path in paths:
             url = f"{IP_CAMERA_BASE}{path}"
             logger.info(f"尝试连接摄像头: {url}")
-            cap = cv2.VideoCapture(url)
+            cap = _open_capture(url)
             if cap.isOpened():
                 logger.info(f"成功连接摄像头: {url}")
+                source = url
                 break
             cap.release()
     
     # 如果连接失败，尝试本地摄像头 (Fallback)
     if not cap or not cap.isOpened():
         logger.warning(f"无法连接配置的摄像头，尝试本地摄像头(Index 0)...")
-        cap = cv2.VideoCapture(0)
-        is_local = True
+        source = 0
+        cap = _open_capture(source)
     
     if not cap or not cap.isOpened():
-        # 如果都失败了，生成测试画面（红底+时间）
+        return None, source
+    return cap, source
+
+def _reopen_camera(cap, source):
+    """连续读帧失败后重建捕获（阻塞），复用首次连接成功的源"""
+    cap.release()
+    return _open_capture(source)
+
+_disconnected_bg: np.ndarray | None = None
+_disconnected_buf = np.empty((480, 640, 3), dtype=np.uint8)
+_disconnected_cache = ("", b"")  # (时间字符串, JPEG)
+
+def _disconnected_frame() -> bytes:
+    """生成测试画面（红底+时间）；静态部分只画一次，同一秒内复用已编码的 JPEG"""
+    global _disconnected_bg, _disconnected_cache
+    t_str = time.strftime("%H:%M:%S")
+    if _disconnected_cache[0] == t_str:
+        return _disconnected_cache[1]
+    if _disconnected_bg is None:
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        img[:] = (20, 20, 80) # Dark Red background
+        
+        # Draw X
+        cv2.line(img, (0,0), (640,480), (0,0,255), 5)
+        cv2.line(img, (640,0), (0,480), (0,0,255), 5)
+        
+        cv2.putText(img, "CAMERA DISCONNECTED", (150, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.putText(img, f"Check: {IP_CAMERA_BASE}", (100, 290), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 1)
+        _disconnected_bg = img
+    
+    # Show time
+    img = _disconnected_buf
+    np.copyto(img, _disconnected_bg)
+    cv2.putText(img, t_str, (500, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    jpeg = _encode_jpeg(img)
+    _disconnected_cache = (t_str, jpeg)
+    return jpeg
+
+def _annotate_frame(frame: np.ndarray) -> np.ndarray:
+    """YOLO 画框（在 _inference_executor 中调用）"""
+    try:
+        # 执行检测 (stream=True 提高性能)
+        results = yolo_model(frame, stream=True, verbose=False, conf=0.25)
+        for r in results:
+            # 获取带有画框的图像 (numpy array)
+            frame = r.plot()
+    except Exception as e:
+        logger.error(f"直播画框失败: {e}")
+    return frame
+
+def _mjpeg_part(frame: bytes) -> bytes:
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+# 视频流广播：所有 /api/video_feed 客户端共用一个采集任务
+# 每个客户端一个容量为 1 的队列，只保留最新一帧（慢客户端丢弃旧帧）
+_frame_subscribers: Set["asyncio.Queue[bytes]"] = set()
+_camera_task: asyncio.Task | None = None
+
+def _publish_frame(part: bytes) -> None:
+    for queue in _frame_subscribers:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(part)
+
+async def _camera_producer():
+    """采集 + 编码循环，有订阅者时运行，最后一个客户端断开后退出并释放摄像头"""
+    cap, source = await asyncio.to_thread(_open_camera)
+    if cap is None:
         logger.error("无法打开任何摄像头")
-        while True:
-            img = np.zeros((480, 640, 3), dtype=np.uint8)
-            img[:] = (20, 20, 80) # Dark Red background
-            
-            # Draw X
-            cv2.line(img, (0,0), (640,480), (0,0,255), 5)
-            cv2.line(img, (640,0), (0,480), (0,0,255), 5)
-            
-            cv2.putText(img, "CAMERA DISCONNECTED", (150, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(img, f"Check: {IP_CAMERA_BASE}", (100, 290), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 1)
+    failures = 0
+    try:
+        while _frame_subscribers:
+            if cap is None:
+                # 如果都失败了，生成测试画面
+                _publish_frame(_mjpeg_part(await asyncio.to_thread(_disconnected_frame)))
+                await asyncio.sleep(1.0) # Slow update for error screen
+                continue
             
-            # Show time
-            t_str = time.strftime("%H:%M:%S")
-            cv2.putText(img, t_str, (500, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            success, frame = await asyncio.to_thread(cap.read)
+            if not success:
+                failures += 1
+                if failures < CAMERA_MAX_READ_FAILURES:
+                    # 偶发失败交给 FFmpeg 自动重连，不重建捕获
+                    await asyncio.sleep(0.1)
+                    continue
+                logger.warning("连续读取视频帧失败，尝试重连...")
+                await asyncio.sleep(2)
+                cap = await asyncio.to_thread(_reopen_camera, cap, source)
+                failures = 0
+                continue
+            failures = 0
             
-            ret, buffer = cv2.imencode('.jpg', img)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(1.0) # Slow update for error screen
-
-    # 正常流循环
-    while True:
-        success, frame = cap.read()
-        if not success:
-            logger.warning("读取视频帧失败，尝试重连...")
+            # YOLO 实时画框走串行推理线程，只有 JPEG 编码放到默认线程池
+            if DETECTION_ENABLED and yolo_model is not None:
+                frame = await _run_inference(_annotate_frame, frame)
+            _publish_frame(_mjpeg_part(await asyncio.to_thread(_encode_jpeg, frame)))
+    finally:
+        if cap is not None:
             cap.release()
-            time.sleep(2)
-            
-            if is_local:
-                # 本地摄像头重连
-                cap = cv2.VideoCapture(0)
-            else:
-                # IP 摄像头重连
-                cap = cv2.VideoCapture(f"{IP_CAMERA_BASE}/video")
-                if not cap.isOpened():
-                     cap = cv2.VideoCapture(f"{IP_CAMERA_BASE}/")
-                # 如果 IP 摄像头多次失败，可以考虑切换到本地，但这里暂保持尝试配置的源
-            continue
-            
-        # --- 新增: YOLO 实时画框 ---
-        if DETECTION_ENABLED and yolo_model is not None:
-            try:
-                # 执行检测 (stream=True 提高性能)
-                results = yolo_model(frame, stream=True, verbose=False, conf=0.25)
-                for r in results:
-                    # 获取带有画框的图像 (numpy array)
-                    frame = r.plot()
-            except Exception as e:
-                logger.error(f"直播画框失败: {e}")
-        # -------------------------
 
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+async def generate_frames():
+    """视频流生成器：订阅共享采集任务的帧（阻塞的 OpenCV 调用在线程中执行）"""
+    global _camera_task
+    queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=1)
+    _frame_subscribers.add(queue)
+    if _camera_task is None or _camera_task.done():
+        _camera_task = asyncio.create_task(_camera_producer())
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        _frame_subscribers.discard(queue)
 
 @app.get("/api/video_feed")
 async def video_feed():
@@ -924,6 +1436,56 @@ async def video_feed():
     return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
 
 
+# /api/detect 的批量推理：并发请求在短窗口内合并为一次前向计算
+DETECT_BATCH_SIZE = 8
+DETECT_BATCH_WINDOW = 0.01  # 秒
+_inference_queue: "asyncio.Queue[tuple[np.ndarray, asyncio.Future]]" = asyncio.Queue()
+_inference_task: asyncio.Task | None = None
+
+async def _collect_batch(queue: asyncio.Queue, max_size: int, window: float) -> list:
+    """等到第一项后，在 window 秒内继续收集，最多 max_size 项"""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + window
+    while len(batch) < max_size:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+async def _inference_worker():
+    """从队列收集一批图片，在推理线程中一次性送入 YOLO，再把结果分发给各请求"""
+    while True:
+        batch = await _collect_batch(_inference_queue, DETECT_BATCH_SIZE, DETECT_BATCH_WINDOW)
+
+        images = [img for img, _ in batch]
+        try:
+            if not isinstance(images[0], np.ndarray):
+                # GPU 预处理后的张量直接拼成一个 batch，不再经过 CPU
+                images = _torch.stack(images)
+            results = await _run_inference(yolo_model, images, verbose=False)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+async def _detect_image(img):
+    """提交一张图片（BGR 数组或 GPU 张量）到批量推理队列，返回该图片的 YOLO 结果"""
+    global _inference_task
+    if _inference_task is None or _inference_task.done():
+        _inference_task = asyncio.create_task(_inference_worker())
+    fut = asyncio.get_running_loop().create_future()
+    await _inference_queue.put((img, fut))
+    return await fut
+
 @app.post("/api/detect")
 async def detect_objects(file: UploadFile = File(...)):
     """
@@ -934,36 +1496,45 @@ async def detect_objects(file: UploadFile = File(...)):
         if not DETECTION_ENABLED or yolo_model is None:
             return {
                 "success": False,
-                "error": "检测功能不可用：YOLO/torch 未正确安装"
+                "ready": False,
+                "error": _detection_unavailable_error()
             }
         # 读取图片
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # YOLO检测
-        results = yolo_model(img)
-        
-        # 解析结果
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                class_name = result.names[cls]
-                
-                detections.append({
-                    "class": class_name,
-                    "confidence": conf,
-                    "bbox": {
-                        "x1": x1, "y1": y1,
-                        "x2": x2, "y2": y2,
-                        "center_x": (x1 + x2) / 2,
-                        "center_y": (y1 + y2) / 2
-                    }
-                })
+        nparr = await _read_upload(file)
+        letterbox = None
+        if _torch is not None:
+            pre = await asyncio.to_thread(_preprocess_gpu, nparr)
+            if pre is None:
+                return {"success": False, "error": "图片解码失败"}
+            img, *letterbox = pre
+        else:
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if img is None:
+                return {"success": False, "error": "图片解码失败"}
+        
+        # YOLO检测（与其他并发请求合并批量推理）
+        result = await _detect_image(img)
+        
+        # 解析结果：NMS 已在推理设备上完成，只把最终框一次性拷回 CPU
+        boxes = result.boxes.data.cpu().numpy()
+        xyxy = boxes[:, :4]
+        if letterbox is not None:
+            gain, pad_x, pad_y = letterbox
+            xyxy = (xyxy - (pad_x, pad_y, pad_x, pad_y)) / gain
+        # 中心点、类别一次向量化计算，逐行只剩字典构造
+        rows = np.column_stack((xyxy, (xyxy[:, :2] + xyxy[:, 2:]) * 0.5, boxes[:, 4])).tolist()
+        names = result.names
+        class_names = [names[c] for c in boxes[:, 5].astype(np.int32).tolist()]
+        detections = [{
+            "class": class_name,
+            "confidence": conf,
+            "bbox": {
+                "x1": x1, "y1": y1,
+                "x2": x2, "y2": y2,
+                "center_x": cx,
+                "center_y": cy
+            }
+        } for class_name, (x1, y1, x2, y2, cx, cy, conf) in zip(class_names, rows)]
         
         logger.info(f"检测到 {len(detections)} 个物体")
         return {
@@ -980,11 +1551,80 @@ async def detect_objects(file: UploadFile = File(...)):
         }
 
 
+def _pcm_to_int16(frames: bytes, width: int) -> np.ndarray:
+    """任意位宽的 WAV PCM 样本 → 有符号 int16（8 位为无符号，其余为小端有符号）"""
+    if width == 1:
+        return ((np.frombuffer(frames, np.uint8).astype(np.int16) - 128) << 8).astype(np.int16)
+    if width == 2:
+        return np.frombuffer(frames, "<i2")
+    if width == 3:
+        # 24 位取高 16 位：每个样本的后两个字节即小端 int16
+        return np.frombuffer(frames, np.uint8).reshape(-1, 3)[:, 1:].copy().view("<i2").ravel()
+    if width == 4:
+        return (np.frombuffer(frames, "<i4") >> 16).astype(np.int16)
+    raise ValueError(f"不支持的采样宽度: {width}")
+
+def _parse_wav(contents: bytes):
+    """解析 WAV，返回 (单声道 16 位 PCM 帧, 采样率, 2)；不是合法 WAV 时返回 None"""
+    try:
+        with wave.open(io.BytesIO(contents), 'rb') as wav_file:
+            rate = wav_file.getframerate()
+            width = wav_file.getsampwidth()
+            channels = wav_file.getnchannels()
+            frames = wav_file.readframes(wav_file.getnframes())
+        frames = frames[:len(frames) - len(frames) % (width * channels)]
+        pcm = _pcm_to_int16(frames, width)
+    except (wave.Error, EOFError, ValueError):
+        return None
+    if channels > 1:
+        # 多声道一次向量化混成单声道
+        pcm = pcm.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return pcm.tobytes(), rate, 2
+
+async def _recognize_baidu(contents: bytes, wav) -> str:
+    """百度 AppBuilder ASR，失败返回空字符串"""
+    try:
+        frames, rate, _ = wav if wav else (contents, 16000, 2)
+        
+        import appbuilder
+        content_data = {"audio_format": "wav", "raw_audio": frames, "rate": rate}
+        message = appbuilder.Message(content_data)
+        
+        resp = await asyncio.to_thread(asr_client.run, message)
+        if resp and resp.content and 'result' in resp.content:
+            text = resp.content['result'][0]
+            logger.info(f"Baidu ASR: {text}")
+            return text
+    except Exception as e:
+        logger.error(f"Baidu ASR Failed: {e}")
+    return ""
+
+async def _recognize_google(contents: bytes, wav) -> str:
+    """Google Speech Recognition，失败返回空字符串"""
+    try:
+        import speech_recognition as sr
+        
+        r = sr.Recognizer()
+        if wav:
+            audio_data = sr.AudioData(*wav)
+        else:
+            # 非 WAV（AIFF/FLAC）交给 sr 自行解析，直接读内存，不落盘
+            with sr.AudioFile(io.BytesIO(contents)) as source:
+                audio_data = r.record(source)
+        text = await asyncio.to_thread(r.recognize_google, audio_data, language='zh-CN')
+        logger.info(f"Google ASR: {text}")
+        return text
+    except ImportError:
+        logger.warning("speech_recognition module not found")
+    except Exception as e:
+        logger.warning(f"Google ASR Failed: {e}")
+    return ""
+
 @app.post("/api/voice/recognize")
 async def recognize_voice(audio: UploadFile = File(...)):
     """
     语音识别接口
-    集成百度 AppBuilder ASR + Google Speech Fallback
+    百度 AppBuilder ASR 与 Google Speech 并发识别，取先成功的结果
     """
     try:
         # 读取音频文件
@@ -993,58 +1633,22 @@ async def recognize_voice(audio: UploadFile = File(...)):
         
         text = ""
         
-        # 1. 尝试百度 AppBuilder
+        # WAV 只解析一次，百度和 Google 共用内存中的 PCM 数据
+        wav = _parse_wav(contents)
+        
+        # 百度和 Google 并发识别，取先返回的非空结果，另一个取消
+        tasks = {asyncio.create_task(_recognize_google(contents, wav))}
         if ASR_ENABLED and asr_client:
-            try:
-                # 解析 WAV 参数
-                rate = 16000
-                frames = contents
-                try:
-                    with io.BytesIO(contents) as audio_file:
-                        with wave.open(audio_file, 'rb') as wav_file:
-                            rate = wav_file.getframerate()
-                            frames = wav_file.readframes(wav_file.getnframes())
-                except:
-                    pass
-                
-                import appbuilder
-                content_data = {"audio_format": "wav", "raw_audio": frames, "rate": rate}
-                message = appbuilder.Message(content_data)
-                
-                resp = asr_client.run(message)
-                if resp and resp.content and 'result' in resp.content:
-                    text = resp.content['result'][0]
-                    logger.info(f"Baidu ASR: {text}")
-            except Exception as e:
-                logger.error(f"Baidu ASR Failed: {e}")
-
-        # 2. Fallback: Google Speech Recognition (if Baidu failed or disabled)
-        if not text:
-            try:
-                import speech_recognition as sr
-                import tempfile
-                
-                # 需要保存为临时文件供 sr 使用
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                    tmp.write(contents)
-                    tmp_path = tmp.name
-                
-                try:
-                    r = sr.Recognizer()
-                    with sr.AudioFile(tmp_path) as source:
-                        audio_data = r.record(source)
-                        text = r.recognize_google(audio_data, language='zh-CN')
-                        logger.info(f"Google ASR: {text}")
-                finally:
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
-                        
-            except ImportError:
-                logger.warning("speech_recognition module not found")
-            except Exception as e:
-                logger.warning(f"Google ASR Failed: {e}")
+            tasks.add(asyncio.create_task(_recognize_baidu(contents, wav)))
+        try:
+            while tasks and not text:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                text = next((t.result() for t in done if t.result()), "")
+        finally:
+            for task in tasks:
+                task.cancel()
 
-        # 3. Final Result
+        # Final Result
         if text:
             return {
                 "success": True,
@@ -1077,6 +1681,123 @@ class TTSRequest(BaseModel):
     voice: str = "zh-CN-XiaoxiaoNeural"  # 默认女声（温柔）
     engine: str = "local"  # 新增：引擎选择 "local" 或 "edge"
 
+# 本地 TTS：优先用 pywin32（可选依赖）在进程内常驻 SAPI 合成器，避免每次请求启动 PowerShell + CLR
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:  # 非 Windows 或未安装 pywin32
+    win32com = None
+
+_SSFM_CREATE_FOR_WRITE = 3
+# SAPI 的 COM 对象只能在创建它的线程中使用，PowerShell 常驻进程也只能一问一答，
+# 所有本地合成都串行提交到这一个线程（同时起到锁的作用）
+_local_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-tts")
+_sapi_voice = None
+_sapi_stream = None
+
+def _sapi_speak_to_file(text: str, path: str):
+    global _sapi_voice, _sapi_stream
+    if _sapi_voice is None:
+        pythoncom.CoInitialize()
+        _sapi_voice = win32com.client.Dispatch("SAPI.SpVoice")
+        _sapi_stream = win32com.client.Dispatch("SAPI.SpFileStream")
+    _sapi_stream.Open(path, _SSFM_CREATE_FOR_WRITE)
+    try:
+        _sapi_voice.AudioOutputStream = _sapi_stream
+        _sapi_voice.Speak(text)
+    finally:
+        _sapi_stream.Close()
+
+# 未安装 pywin32 时回退到常驻 PowerShell 进程：合成器只创建一次，之后每次请求通过 stdin 发一行命令
+# 文本和路径以 UTF-8 Base64 传入，既不受控制台代码页影响，也不会被当作脚本执行（防注入）
+_PS_TTS_INIT = (
+    "Add-Type -AssemblyName System.Speech; "
+    "$synth = New-Object System.Speech.Synthesis.SpeechSynthesizer; "
+    "$synth.Rate = 0; $synth.Volume = 100\n"
+)
+_PS_TTS_DONE = "__TTS_DONE__"
+_PS_TTS_TIMEOUT = 10
+_ps_host: subprocess.Popen | None = None
+
+def _ps_utf8_literal(value: str) -> str:
+    b64 = base64.b64encode(value.encode("utf-8")).decode("ascii")
+    return f"[Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{b64}'))"
+
+def _powershell_speak_to_file(text: str, path: str):
+    global _ps_host
+    if _ps_host is None or _ps_host.poll() is not None:
+        _ps_host = subprocess.Popen(
+            ['powershell', '-NoLogo', '-NoProfile', '-NonInteractive', '-Command', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            errors='replace'
+        )
+        _ps_host.stdin.write(_PS_TTS_INIT)
+    host = _ps_host
+    # 输出到 Null 以释放 WAV 文件句柄；无论成功与否都输出结束标记
+    command = (
+        f"try {{ $synth.SetOutputToWaveFile({_ps_utf8_literal(path)}); "
+        f"$synth.Speak({_ps_utf8_literal(text)}); '{_PS_TTS_DONE}' }} "
+        f"catch {{ '{_PS_TTS_DONE} ' + $_.Exception.Message }} "
+        f"finally {{ $synth.SetOutputToNull() }}\n"
+    )
+    try:
+        host.stdin.write(command)
+        host.stdin.flush()
+    except OSError as e:
+        _ps_host = None
+        raise RuntimeError(f"PowerShell 进程不可用: {e}")
+
+    timed_out = threading.Event()
+    def _kill():
+        timed_out.set()
+        host.kill()
+    watchdog = threading.Timer(_PS_TTS_TIMEOUT, _kill)
+    watchdog.start()
+    try:
+        for line in host.stdout:
+            if line.startswith(_PS_TTS_DONE):
+                error = line[len(_PS_TTS_DONE):].strip()
+                if error:
+                    raise RuntimeError(error)
+                return
+    finally:
+        watchdog.cancel()
+    # stdout 结束说明进程已退出，下次调用会重新启动
+    _ps_host = None
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired("powershell", _PS_TTS_TIMEOUT)
+    raise RuntimeError("PowerShell 进程意外退出")
+
+def _close_ps_host():
+    global _ps_host
+    if _ps_host is not None and _ps_host.poll() is None:
+        try:
+            _ps_host.stdin.write("$synth.Dispose(); exit\n")
+            _ps_host.stdin.close()
+            _ps_host.wait(timeout=2)
+        except Exception:
+            _ps_host.kill()
+    _ps_host = None
+
+async def _synthesize_local(text: str) -> bytes:
+    """本地 TTS 生成 WAV 字节"""
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    speak = _sapi_speak_to_file if win32com is not None else _powershell_speak_to_file
+    try:
+        await asyncio.get_running_loop().run_in_executor(_local_tts_executor, speak, text, path)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
 @app.post("/api/tts/speak")
 async def text_to_speech(request: TTSRequest):
     """
@@ -1093,72 +1814,29 @@ async def text_to_speech(request: TTSRequest):
         if engine == "local":
             logger.info(f"[本地TTS] 播报: {text[:50]}...")
             
-            # 使用 Windows PowerShell 的 TTS（更可靠）
-            import subprocess
-            import tempfile
-            import os
-            
-            # 创建临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav', mode='w')
-            temp_path = temp_file.name
-            temp_file.close()
-            
             try:
-                # 使用 PowerShell 生成语音
-                ps_script = f'''
-Add-Type -AssemblyName System.Speech
-$synth = New-Object System.Speech.Synthesis.SpeechSynthesizer
-$synth.Rate = 0
-$synth.Volume = 100
-$synth.SetOutputToWaveFile("{temp_path}")
-$synth.Speak("{text}")
-$synth.Dispose()
-'''
-                
-                # 执行 PowerShell 脚本
-                result = subprocess.run(
-                    ['powershell', '-Command', ps_script],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if result.returncode != 0:
-                    logger.error(f"[本地TTS] PowerShell 错误: {result.stderr}")
-                    return {"success": False, "error": "TTS 生成失败"}
-                
-                # 读取生成的音频文件
-                if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-                    logger.error(f"[本地TTS] 音频文件生成失败")
-                    return {"success": False, "error": "音频文件为空"}
-                
-                with open(temp_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                # 删除临时文件
-                os.unlink(temp_path)
-                
-                logger.info(f"[本地TTS] ✅ 生成成功，大小: {len(audio_data)} bytes")
-                
-                return StreamingResponse(
-                    io.BytesIO(audio_data),
-                    media_type="audio/wav",
-                    headers={
-                        "Content-Disposition": "inline; filename=speech.wav",
-                        "Cache-Control": "no-cache"
-                    }
-                )
-                
+                audio_data = await _synthesize_local(text)
             except subprocess.TimeoutExpired:
                 logger.error("[本地TTS] 生成超时")
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
                 return {"success": False, "error": "TTS 生成超时"}
-            except Exception as e:
-                logger.error(f"[本地TTS] 错误: {e}")
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                raise e
+            except RuntimeError as e:
+                logger.error(f"[本地TTS] 合成失败: {e}")
+                return {"success": False, "error": "TTS 生成失败"}
+            
+            if not audio_data:
+                logger.error(f"[本地TTS] 音频文件生成失败")
+                return {"success": False, "error": "音频文件为空"}
+            
+            logger.info(f"[本地TTS] ✅ 生成成功，大小: {len(audio_data)} bytes")
+            
+            return Response(
+                audio_data,
+                media_type="audio/wav",
+                headers={
+                    "Content-Disposition": "inline; filename=speech.wav",
+                    "Cache-Control": "no-cache"
+                }
+            )
         
         # Edge TTS（云端，高音质）
         elif engine == "edge":
@@ -1166,18 +1844,19 @@ $synth.Dispose()
             logger.info(f"[Edge TTS] 请求: {text[:50]}... (voice: {voice})")
             start_time = asyncio.get_event_loop().time()
             
-            # 流式生成器
+            # 流式生成器（异步生成器，Starlette 直接在事件循环中迭代，不占用线程池）
             async def audio_stream():
-                """流式生成音频数据"""
-                communicate = edge_tts.Communicate(text, voice)
-                first_chunk = True
-                
-                async for chunk in communicate.stream():
+                """流式生成音频数据，音频块原样转发"""
+                chunks = edge_tts.Communicate(text, voice).stream()
+                # 首个音频块单独处理并记录延迟，之后的循环里不再做任何判断以外的工作
+                async for chunk in chunks:
+                    if chunk["type"] == "audio":
+                        elapsed = asyncio.get_event_loop().time() - start_time
+                        logger.info(f"[Edge TTS] 首字节延迟: {elapsed:.3f}s")
+                        yield chunk["data"]
+                        break
+                async for chunk in chunks:
                     if chunk["type"] == "audio":
-                        if first_chunk:
-                            elapsed = asyncio.get_event_loop().time() - start_time
-                            logger.info(f"[Edge TTS] 首字节延迟: {elapsed:.3f}s")
-                            first_chunk = False
                         yield chunk["data"]
             
             return StreamingResponse(
@@ -1195,7 +1874,6 @@ $synth.Dispose()
         
     except Exception as e:
         logger.error(f"[TTS] Error: {e}")
-        import traceback
         traceback.print_exc()
         return {"success": False, "error": str(e)}
 
@@ -1211,6 +1889,22 @@ class IKRequest(BaseModel):
 class IKPresetRequest(BaseModel):
     preset: str
 
+# 拖拽/摇杆会连续发送几乎相同的目标点：按 1mm 网格量化后缓存 IK 结果
+# 结果字典被多个请求共享，调用方只读不改；更换控制器或切换模式时 cache_clear()
+@lru_cache(maxsize=4096)
+def _ik_cached(xi: int, yi: int, zi: int) -> dict:
+    return ik_controller.calculate_ik(xi / 1000, yi / 1000, zi / 1000)
+
+def _is_finite_number(value) -> bool:
+    """JSON 中的有限实数（排除 bool、字符串、NaN、inf）"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def _solve_ik_quantized(x: float, y: float, z: float) -> dict:
+    if not all(map(_is_finite_number, (x, y, z))):
+        # NaN/inf 无法量化，按 IK 失败返回
+        return {"success": False, "message": "目标坐标必须是有限实数"}
+    return _ik_cached(round(x * 1000), round(y * 1000), round(z * 1000))
+
 @app.post("/api/ik/calculate")
 async def calculate_ik(request: IKRequest):
     """
@@ -1220,7 +1914,7 @@ async def calculate_ik(request: IKRequest):
         if ik_controller is None:
             return {"success": False, "error": "IK控制器未初始化"}
         
-        result = ik_controller.calculate_ik(request.x, request.y, request.z)
+        result = _solve_ik_quantized(request.x, request.y, request.z)
         logger.info(f"IK计算: ({request.x}, {request.y}, {request.z}) → {result.get('success')}")
         return result
     except Exception as e:
@@ -1268,6 +1962,12 @@ async def ik_voice_command(request: Request):
 # WebSocket 实时通信端点
 # ============================================================
 
+_PONG_MESSAGE = _json_dumps({"type": "pong"})
+
+async def _send_json(websocket: WebSocket, obj) -> None:
+    """orjson 序列化后以文本帧发送（前端 JSON.parse 需要文本帧）"""
+    await websocket.send_text(_json_dumps(obj))
+
 @app.websocket("/ws/mujoco")
 async def websocket_mujoco(websocket: WebSocket):
     """WebSocket端点 - 保持连接用于未来实时控制"""
@@ -1276,7 +1976,7 @@ async def websocket_mujoco(websocket: WebSocket):
     
     try:
         # 1. 发送连接成功消息（包含当前控制模式）
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "connected",
             "message": "后端已连接",
             "control_mode": control_mode
@@ -1290,23 +1990,22 @@ async def websocket_mujoco(websocket: WebSocket):
             # 处理指令
             action = data.get("action")
             if action == "ping":
-                await websocket.send_json({"type": "pong"})
+                await websocket.send_text(_PONG_MESSAGE)
             elif action == "start":
                 logger.info("WS: 收到Start指令")
             elif action == "move_to_angles":
                 # 处理关节角度指令
                 angles = data.get("angles", [])
                 if len(angles) == 6:
-                    # 弧度转角度
-                    import math
-                    angles_deg = [a * 180 / math.pi for a in angles]
+                    # 弧度转角度（一次向量化乘法）
+                    angles_deg = (np.asarray(angles, dtype=np.float64) * _RAD2DEG).tolist()
                     result = dispatch_angles(angles_deg, "websocket")
-                    await websocket.send_json({
+                    await _send_json(websocket, {
                         "type": "dispatch_result",
                         **result
                     })
                 else:
-                    await websocket.send_json({
+                    await _send_json(websocket, {
                         "type": "error",
                         "message": "angles must contain exactly 6 values"
                     })
@@ -1314,8 +2013,14 @@ async def websocket_mujoco(websocket: WebSocket):
                 # 处理笛卡尔目标位置（需要 IK 计算）
                 target = data.get("target", [])
                 if len(target) == 3 and ik_controller:
+                    if not all(map(_is_finite_number, target)):
+                        await _send_json(websocket, {
+                            "type": "error",
+                            "message": "target must contain 3 finite numbers"
+                        })
+                        continue
                     x, y, z = target
-                    ik_result = ik_controller.calculate_ik(x, y, z)
+                    ik_result = _solve_ik_quantized(x, y, z)
                     if ik_result.get("success"):
                         angles_deg = [
                             ik_result["angles"].get("joint1", 0),
@@ -1326,19 +2031,19 @@ async def websocket_mujoco(websocket: WebSocket):
                             ik_result["angles"].get("joint6", 0),
                         ]
                         result = dispatch_angles(angles_deg, "websocket_ik")
-                        await websocket.send_json({
+                        await _send_json(websocket, {
                             "type": "dispatch_result",
                             "ik_success": True,
                             **result
                         })
                     else:
-                        await websocket.send_json({
+                        await _send_json(websocket, {
                             "type": "ik_error",
                             "message": ik_result.get("error", "IK calculation failed")
                         })
             elif action == "get_mode":
                 # 返回当前控制模式
-                await websocket.send_json({
+                await _send_json(websocket, {
                     "type": "mode_info",
                     "mode": control_mode,
                     "serial_available": serial_transport is not None and not serial_transport.mock_mode
@@ -1352,7 +2057,6 @@ async def websocket_mujoco(websocket: WebSocket):
     except Exception as e:
         # 捕获所有其他错误并打印，防止静默失败
         logger.error(f"❌ WebSocket异常: {e}")
-        import traceback
         traceback.print_exc()
 
 
@@ -1363,7 +2067,7 @@ async def websocket_telemetry(websocket: WebSocket):
     logger.info("Telemetry client connected (%d total)", len(telemetry_clients))
 
     try:
-        await websocket.send_json({"type": "telemetry_snapshot", "data": _snapshot_telemetry()})
+        await websocket.send_text(_json_dumps({"type": "telemetry_snapshot", "data": _snapshot_telemetry()}))
         while True:
             try:
                 message = await websocket.receive_json()
@@ -1375,7 +2079,7 @@ async def websocket_telemetry(websocket: WebSocket):
 
             action = message.get("action") if isinstance(message, dict) else None
             if action == "ping":
-                await websocket.send_json({"type": "pong"})
+                await websocket.send_text(_PONG_MESSAGE)
     except WebSocketDisconnect:
         logger.info("Telemetry client disconnected")
     finally:
@@ -1387,6 +2091,103 @@ async def websocket_telemetry(websocket: WebSocket):
 # LLM 对话接口
 # ============================================================
 
+def _execute_work_result(result: Dict) -> Dict:
+    """如果工作模式结果包含 skill，执行技能并合并回复"""
+    if result.get("success") and result.get("skill"):
+        skill_name = result["skill"]
+        args = result.get("args", {})
+        
+        # 调用 RobotSkills 执行技能
+        skill_result = skills.execute(skill_name, **args)
+        
+        # 合并 LLM 的回复和技能执行结果
+        if "response" in result and "response" not in skill_result:
+            skill_result["response"] = result["response"]
+        
+        result = skill_result
+    return result
+
+
+async def _route_intent(intent: str, user_text: str, request: ChatRequest) -> Optional[Dict]:
+    """根据意图路由到对应的处理模式（Step 2）"""
+    result = None
+    
+    if intent == "chat":
+        # 聊天模式 - 使用轻量模型或预设回复
+        result = await llm_router.handle_chat(user_text)
+        
+    elif intent == "work":
+        # 工作模式 - 使用 DeepSeek 处理
+        skills_desc = skills.get_skill_descriptions()
+        result = await llm_router.handle_work(
+            user_message=user_text,
+            skills_description=skills_desc,
+            current_angles=request.current_angles
+        )
+        
+        result = _execute_work_result(result)
+        
+    elif intent == "vision":
+        # 视觉模式 - 使用视觉模型
+        vision_context = ""
+        
+        # 如果启用了检测功能且 YOLO 模型已加载
+        if DETECTION_ENABLED and yolo_model:
+            try:
+                # 尝试从 IP Camera 获取图像
+                ip_camera_url = CONFIG.get("IP_CAMERA_URL")
+                if ip_camera_url:
+                    logger.info(f"正在读取摄像头: {ip_camera_url.split('@')[-1]}") # 隐藏密码
+                    # 智能判断: 如果是数字则作为本地摄像头索引
+                    if str(ip_camera_url).isdigit():
+                        cap = cv2.VideoCapture(int(ip_camera_url))
+                    else:
+                        cap = cv2.VideoCapture(ip_camera_url)
+                        
+                    if cap.isOpened():
+                        ret, frame = cap.read()
+                        if ret:
+                            # YOLO 检测（在串行推理线程中执行）
+                            results = await _run_inference(yolo_model, frame, verbose=False, conf=0.3)
+                            
+                            # 提取检测到的物体
+                            detected_objects = []
+                            for result_item in results:
+                                for box in result_item.boxes:
+                                    cls = int(box.cls[0])
+                                    class_name = result_item.names[cls]
+                                    detected_objects.append(class_name)
+                            
+                            if detected_objects:
+                                # 统计物体数量
+                                counts = Counter(detected_objects)
+                                desc_list = [f"{count}个{name}" for name, count in counts.items()]
+                                vision_context = ", ".join(desc_list)
+                                logger.info(f"视觉检测结果: {vision_context}")
+                            else:
+                                vision_context = "画面清晰，但未识别到已知物体"
+                        else:
+                            vision_context = "无法读取摄像头画面"
+                        cap.release()
+                    else:
+                        vision_context = "无法连接到摄像头，请检查网络"
+                else:
+                    vision_context = "系统中未配置 IP Camera 地址"
+            except Exception as e:
+                logger.error(f"视觉处理异常: {e}")
+                vision_context = f"视觉系统出错: {str(e)}"
+        else:
+            vision_context = "YOLO模型未加载，无法识别物体"
+
+        result = await llm_router.handle_vision(user_text, vision_context=vision_context)
+        
+    else:
+        # 未知意图，默认聊天
+        result = await llm_router.handle_chat(user_text)
+    
+    return result
+
+
 @app.post("/api/llm/chat")
 async def chat_with_llm(request: ChatRequest):
     """
@@ -1416,98 +2217,18 @@ async def chat_with_llm(request: ChatRequest):
         if not LLM_ENABLED or not llm_router:
             return {"success": False, "error": "LLM已禁用：未配置 API Key 或路由器未初始化"}
         
-        # ========== Step 1: 意图分类 ==========
-        intent = await llm_router.classify_intent(user_text)
-        logger.info(f"📊 意图分类结果: {intent}")
-        
-        # ========== Step 2: 根据意图路由 ==========
-        result = None
-        
-        if intent == "chat":
-            # 聊天模式 - 使用轻量模型或预设回复
-            result = await llm_router.handle_chat(user_text)
-            
-        elif intent == "work":
-            # 工作模式 - 使用 DeepSeek 处理
-            skills_desc = skills.get_skill_descriptions()
-            result = await llm_router.handle_work(
-                user_message=user_text,
-                skills_description=skills_desc,
-                current_angles=request.current_angles
-            )
-            
-            # 如果成功返回了 skill，执行技能
-            if result.get("success") and result.get("skill"):
-                skill_name = result["skill"]
-                args = result.get("args", {})
-                
-                # 调用 RobotSkills 执行技能
-                skill_result = skills.execute(skill_name, **args)
-                
-                # 合并 LLM 的回复和技能执行结果
-                if "response" in result and "response" not in skill_result:
-                    skill_result["response"] = result["response"]
-                
-                result = skill_result
-            
-        elif intent == "vision":
-            # 视觉模式 - 使用视觉模型
-            vision_context = ""
-            
-            # 如果启用了检测功能且 YOLO 模型已加载
-            if DETECTION_ENABLED and yolo_model:
-                try:
-                    # 尝试从 IP Camera 获取图像
-                    ip_camera_url = CONFIG.get("IP_CAMERA_URL")
-                    if ip_camera_url:
-                        logger.info(f"正在读取摄像头: {ip_camera_url.split('@')[-1]}") # 隐藏密码
-                        # 智能判断: 如果是数字则作为本地摄像头索引
-                        if str(ip_camera_url).isdigit():
-                            cap = cv2.VideoCapture(int(ip_camera_url))
-                        else:
-                            cap = cv2.VideoCapture(ip_camera_url)
-                            
-                        if cap.isOpened():
-                            ret, frame = cap.read()
-                            if ret:
-                                # YOLO 检测
-                                results = yolo_model(frame, verbose=False, conf=0.3)
-                                
-                                # 提取检测到的物体
-                                detected_objects = []
-                                for result_item in results:
-                                    for box in result_item.boxes:
-                                        cls = int(box.cls[0])
-                                        class_name = result_item.names[cls]
-                                        detected_objects.append(class_name)
-                                
-                                if detected_objects:
-                                    # 统计物体数量
-                                    from collections import Counter
-                                    counts = Counter(detected_objects)
-                                    desc_list = [f"{count}个{name}" for name, count in counts.items()]
-                                    vision_context = ", ".join(desc_list)
-                                    logger.info(f"视觉检测结果: {vision_context}")
-                                else:
-                                    vision_context = "画面清晰，但未识别到已知物体"
-                            else:
-                                vision_context = "无法读取摄像头画面"
-                            cap.release()
-                        else:
-                            vision_context = "无法连接到摄像头，请检查网络"
-                    else:
-                        vision_context = "系统中未配置 IP Camera 地址"
-                except Exception as e:
-                    logger.error(f"视觉处理异常: {e}")
-                    vision_context = f"视觉系统出错: {str(e)}"
-            else:
-                vision_context = "YOLO模型未加载，无法识别物体"
-
-            result = await llm_router.handle_vision(user_text, vision_context=vision_context)
-            
+        # 常见工作指令命中快速通道时，无需等待意图分类
+        fast_result = llm_router.try_fast_work(user_text, request.current_angles)
+        if fast_result is not None:
+            logger.info("⚡ 快速通道命中，跳过意图分类")
+            result = _execute_work_result(fast_result)
         else:
-            # 未知意图，默认聊天
-            result = await llm_router.handle_chat(user_text)
+            # ========== Step 1: 意图分类 ==========
+            intent = await llm_router.classify_intent(user_text)
+            logger.info(f"📊 意图分类结果: {intent}")
+            
+            # ========== Step 2: 根据意图路由 ==========
+            result = await _route_intent(intent, user_text, request)
         
         # ========== 🧠 Step 3: 保存AI回复到记忆 ==========
         if result and result.get("response"):
@@ -1519,22 +2240,142 @@ async def chat_with_llm(request: ChatRequest):
 
     except Exception as e:
         logger.error(f"LLM Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return {"success": False, "error": str(e)}
 
+@app.post("/api/llm/chat/stream")
+async def chat_with_llm_stream(request: ChatRequest):
+    """
+    智能对话接口（流式）- 与 /api/llm/chat 流程相同，以 SSE 返回
+    
+    事件：
+    - {"type": "token", "content": "..."}  聊天模式的增量文本
+    - {"type": "done", ...}                 最终结果（与 /api/llm/chat 返回一致）
+    """
+    def sse(event: Dict) -> str:
+        return f"data: {_json_dumps(event)}\n\n"
+    
+    async def event_stream():
+        try:
+            user_text = request.message
+            if not user_text:
+                yield sse({"type": "done", "success": False, "error": "Empty message"})
+                return
+            
+            logger.info(f"收到用户消息(流式): {user_text}")
+            memory = get_memory()
+            memory.add_message("user", user_text)
+            
+            if not LLM_ENABLED or not llm_router:
+                yield sse({"type": "done", "success": False, "error": "LLM已禁用：未配置 API Key 或路由器未初始化"})
+                return
+            
+            fast_result = llm_router.try_fast_work(user_text, request.current_angles)
+            intent = "work" if fast_result is not None else await llm_router.classify_intent(user_text)
+            logger.info(f"📊 意图分类结果: {intent}")
+            
+            if fast_result is not None:
+                result = _execute_work_result(fast_result)
+            elif intent == "chat":
+                # 聊天模式边生成边推送，首字延迟取决于首个 token
+                parts = []
+                async for token in llm_router.handle_chat_stream(user_text):
+                    parts.append(token)
+                    yield sse({"type": "token", "content": token})
+                result = {"success": True, "mode": "chat", "response": "".join(parts)}
+            else:
+                result = await _route_intent(intent, user_text, request)
+            
+            if result and result.get("response"):
+                memory.add_message("assistant", result["response"])
+            
+            yield sse({"type": "done", **(result or {})})
+        except Exception as e:
+            logger.error(f"LLM Stream Error: {str(e)}")
+            yield sse({"type": "done", "success": False, "error": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 # ========== TD3 模型全局加载 ==========
+# torch / stable-baselines3 / onnxruntime 只在首次加载模型时导入，不拖慢服务启动
+
 td3_model = None
+td3_policy = None  # obs (B, 24) float32 → action (B, 6)
 td3_vec_normalize = None
 
+def _make_td3_policy(model, vec_normalize, onnx_path: str, sources: Sequence[str]):
+    """
+    构建 TD3 推理函数：原始 obs (B, 24) → action (B, 6)
+    VecNormalize 的归一化（减均值、乘 1/std、截断）包含在推理函数内，调用方直接传原始观测。
+    onnxruntime（可选依赖）可用时把归一化 + actor 网络一起导出为 ONNX 图直接推理，
+    Python 侧不再做任何算术；输出按动作空间手动反缩放（等价于 SB3 的 unscale_action）。
+    否则回退 NumPy 归一化 + model.predict。
+    sources 中任一文件比 ONNX 文件新时重新导出。
+    """
+    if vec_normalize is not None:
+        # 推理时 obs_rms 不再变化：均值和 1/std 只算一次
+        obs_mean = np.asarray(vec_normalize.obs_rms.mean, dtype=np.float32)
+        obs_inv_std = (1.0 / np.sqrt(vec_normalize.obs_rms.var + vec_normalize.epsilon)).astype(np.float32)
+        clip_obs = float(vec_normalize.clip_obs)
+    else:
+        obs_mean, obs_inv_std, clip_obs = np.zeros(TD3_OBS_DIM, np.float32), np.ones(TD3_OBS_DIM, np.float32), np.inf
+
+    def sb3_policy(obs):
+        if vec_normalize is not None:
+            obs = np.clip((obs - obs_mean) * obs_inv_std, -clip_obs, clip_obs)
+        return model.predict(obs, deterministic=True)[0]
+
+    try:  # onnxruntime 为可选依赖，未安装时回退 stable-baselines3 predict
+        import onnxruntime as ort
+    except ImportError:
+        return sb3_policy
+    try:
+        if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < max(map(os.path.getmtime, sources)):
+            import torch  # stable-baselines3 已依赖 torch
+
+            class NormalizedActor(torch.nn.Module):
+                """把观测归一化作为常量节点折叠进 actor 图"""
+                def __init__(self):
+                    super().__init__()
+                    self.mu = model.actor.mu
+                    self.register_buffer("mean", torch.from_numpy(obs_mean))
+                    self.register_buffer("inv_std", torch.from_numpy(obs_inv_std))
+
+                def forward(self, obs):
+                    return self.mu(torch.clamp((obs - self.mean) * self.inv_std, -clip_obs, clip_obs))
+
+            torch.onnx.export(
+                NormalizedActor().eval(), torch.zeros(1, TD3_OBS_DIM), onnx_path,
+                input_names=["obs"], output_names=["action"], opset_version=17,
+                dynamic_axes={"obs": {0: "batch"}, "action": {0: "batch"}}
+            )
+        session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    except Exception as e:
+        logger.warning(f"TD3 ONNX 导出/加载失败，使用 SB3 推理: {e}")
+        return sb3_policy
+
+    low = model.action_space.low.astype(np.float32)
+    high = model.action_space.high.astype(np.float32)
+    mid, half = (high + low) / 2, (high - low) / 2
+
+    def onnx_policy(obs):
+        action = session.run(None, {"obs": np.asarray(obs, dtype=np.float32).reshape(-1, TD3_OBS_DIM)})[0]
+        return action * half + mid
+
+    logger.info(f"TD3 使用 ONNX Runtime 推理: {onnx_path}")
+    return onnx_policy
+
 def load_td3_model():
     """
     在服务启动时加载 TD3 模型 (延迟加载以避免启动失败)
     """
-    global td3_model, td3_vec_normalize
+    global td3_model, td3_policy, td3_vec_normalize
     
     # 使用绝对路径 (ai-service -> robot-control-system -> zero-robotic-arm)
-    import os
     CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))  # ai-service
     ROBOT_CONTROL = os.path.dirname(CURRENT_DIR)  # robot-control-system
     PROJECT_ROOT = os.path.dirname(ROBOT_CONTROL)  # zero-robotic-arm
@@ -1543,35 +2384,76 @@ def load_td3_model():
     NORMALIZE_PATH = os.path.join(PROJECT_ROOT, "5. Deep_LR", "logs", "best_model", "vec_normalize.pkl")
     
     logger.info(f"模型路径: {MODEL_PATH}")
+    try:  # stable-baselines3 为可选依赖，未安装时 TD3 接口返回模型未加载
+        from stable_baselines3 import TD3
+    except ImportError:
+        logger.error("TD3 模型加载失败: 未安装 stable-baselines3")
+        return False
     
     try:
-        from stable_baselines3 import TD3
-        from stable_baselines3.common.vec_env import VecNormalize
-        import pickle
-        
         logger.info("正在加载 TD3 模型...")
         
         # 加载模型 (不需要环境，仅用于推理)
         td3_model = TD3.load(MODEL_PATH, device="cpu")
-        logger.info("TD3 模型加载成功")
         
         # 尝试加载归一化参数
+        sources = [MODEL_PATH + ".zip"]
         try:
             with open(NORMALIZE_PATH, 'rb') as f:
                 td3_vec_normalize = pickle.load(f)
+            sources.append(NORMALIZE_PATH)
             logger.info("VecNormalize 参数加载成功")
         except Exception as e:
             logger.warning(f"VecNormalize 加载失败: {e}, 将使用原始观测值")
             td3_vec_normalize = None
-            
+        
+        # 含归一化的图与裸 actor 图分开存放，避免归一化参数增删后误用旧图
+        onnx_name = "policy.onnx" if td3_vec_normalize is not None else "actor.onnx"
+        td3_policy = _make_td3_policy(
+            td3_model, td3_vec_normalize,
+            os.path.join(os.path.dirname(MODEL_PATH), onnx_name), sources
+        )
+        logger.info("TD3 模型加载成功")
         return True
     except Exception as e:
         logger.error(f"TD3 模型加载失败: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
 
+TD3_OBS_DIM = 24
+
+# TD3 动态批处理：并发请求在短窗口内合并为一次 (B, 24) 前向计算
+TD3_BATCH_SIZE = 32
+TD3_BATCH_WINDOW = 0.003  # 秒
+_td3_queue: "asyncio.Queue[tuple[np.ndarray, asyncio.Future]]" = asyncio.Queue()
+_td3_task: asyncio.Task | None = None
+
+async def _td3_worker():
+    """收集一批观测，一次推理后把每行动作分发给对应请求"""
+    while True:
+        batch = await _collect_batch(_td3_queue, TD3_BATCH_SIZE, TD3_BATCH_WINDOW)
+        try:
+            actions = td3_policy(np.stack([obs for obs, _ in batch]))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        for (_, fut), action in zip(batch, actions):
+            if not fut.done():
+                fut.set_result(action)
+
+async def predict_batched(obs: np.ndarray) -> np.ndarray:
+    """提交一条 24 维观测到批处理队列，返回对应的 6 维动作"""
+    global _td3_task
+    if _td3_task is None or _td3_task.done():
+        _td3_task = asyncio.create_task(_td3_worker())
+    fut = asyncio.get_running_loop().create_future()
+    await _td3_queue.put((np.asarray(obs, dtype=np.float32).reshape(TD3_OBS_DIM), fut))
+    return await fut
+
+
 class TD3PredictRequest(BaseModel):
     """TD3 推理请求"""
     target_pos: list  # 目标位置 [x, y, z]
@@ -1607,34 +2489,18 @@ async def td3_predict(request: TD3PredictRequest):
             }
     
     try:
-        import numpy as np
-        
-        # 构建观测向量 (24维)
-        target_pos = np.array(request.target_pos)
-        ee_pos = np.array(request.ee_pos)
-        relative_pos = target_pos - ee_pos
-        
-        observation = np.concatenate([
-            relative_pos,                           # 3
-            np.array(request.joint_angles),         # 6
-            np.array(request.joint_velocities),     # 6
-            np.array(request.prev_torque),          # 6
-            np.array(request.ee_vel)                # 3
-        ]).astype(np.float32)
-        
-        # 如果有归一化参数，应用归一化
-        if td3_vec_normalize is not None:
-            try:
-                obs_mean = td3_vec_normalize.obs_rms.mean
-                obs_var = td3_vec_normalize.obs_rms.var
-                observation = (observation - obs_mean) / np.sqrt(obs_var + 1e-8)
-                observation = np.clip(observation, -10, 10)
-            except:
-                pass  # 归一化失败则使用原始值
+        # 构建观测向量 (24维)：按切片写入一个 float32 数组，不再拼接临时数组
+        # 每个请求独立一份，进入批处理队列后等待期间不会被其他请求覆盖
+        observation = np.empty(TD3_OBS_DIM, dtype=np.float32)
+        observation[0:3] = request.target_pos       # 3: relative_pos = target - ee
+        observation[0:3] -= request.ee_pos
+        observation[3:9] = request.joint_angles     # 6
+        observation[9:15] = request.joint_velocities  # 6
+        observation[15:21] = request.prev_torque    # 6
+        observation[21:24] = request.ee_vel         # 3
         
-        # 推理
-        action, _ = td3_model.predict(observation.reshape(1, -1), deterministic=True)
-        action = action.flatten().tolist()
+        # 推理（归一化已包含在推理函数内；与其他并发请求合并批量推理）
+        action = (await predict_batched(observation)).tolist()
         
         return {
             "success": True,
@@ -1644,7 +2510,6 @@ async def td3_predict(request: TD3PredictRequest):
         
     except Exception as e:
         logger.error(f"TD3 推理失败: {e}")
-        import traceback
         traceback.print_exc()
         return {
             "success": False,
@@ -1654,79 +2519,141 @@ async def td3_predict(request: TD3PredictRequest):
 
 
 
+# /ws/camera 的解码在独立线程池中执行，检测走串行推理线程，均不阻塞事件循环
+_cv_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cv")
+CAMERA_DROP_LOG_INTERVAL = 5.0  # 秒，丢帧统计的日志间隔
+# 二进制帧格式: 8 字节小端 float64 时间戳 (ts) + 原始 JPEG 字节
+_CAMERA_TS_HEADER = struct.Struct("<d")
+
+def _decode_camera_frame(image):
+    """image 为原始 JPEG 字节（二进制帧）或 Base64 字符串（旧的 JSON 文本帧）"""
+    if isinstance(image, str):
+        # Remove header if present (e.g., "data:image/jpeg;base64,")
+        if "," in image:
+            image = image.split(",")[1]
+        image = base64.b64decode(image)
+    return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+
+def _detect_camera_frame(frame) -> list:
+    """YOLO 检测一帧并转换为可序列化的检测结果（在 _inference_executor 中调用）"""
+    detections = []
+    for result in yolo_model(frame, verbose=False, conf=0.3):
+        for box in result.boxes:
+            cls = int(box.cls[0])
+            detections.append({
+                "class": result.names[cls],
+                "confidence": float(box.conf[0]),
+                "bbox": box.xyxy[0].tolist()
+            })
+    return detections
+
+async def _receive_camera_frames(websocket: WebSocket, frames: asyncio.Queue):
+    """接收客户端帧放入容量为 1 的队列：处理跟不上时丢弃旧帧，只保留最新一帧"""
+    dropped = 0
+    last_log = time.monotonic()
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        raw_bytes = message.get("bytes")
+        if raw_bytes is not None:
+            # 二进制帧：时间戳头 + JPEG，不经过 JSON/Base64
+            if len(raw_bytes) <= _CAMERA_TS_HEADER.size:
+                continue
+            (ts,) = _CAMERA_TS_HEADER.unpack_from(raw_bytes)
+            item = (raw_bytes[_CAMERA_TS_HEADER.size:], ts)
+        else:
+            # 兼容文本帧 (JSON format: {"image": "base64...", "ts": ...})
+            try:
+                data = _json_loads(message.get("text") or "")
+            except json.JSONDecodeError:
+                logger.error("无效的 JSON 数据")
+                continue
+            # 检查是否包含图像数据
+            if "image" not in data:
+                continue
+            item = (data["image"], data.get("ts", 0))
+        if frames.full():
+            frames.get_nowait()
+            dropped += 1
+        frames.put_nowait(item)
+
+        now = time.monotonic()
+        if dropped and now - last_log >= CAMERA_DROP_LOG_INTERVAL:
+            logger.info(f"视觉处理跟不上输入，{now - last_log:.0f} 秒内丢弃 {dropped} 帧")
+            dropped = 0
+            last_log = now
+
+async def _process_camera_frames(websocket: WebSocket, frames: asyncio.Queue):
+    """逐帧取最新数据：解码 -> YOLO 检测 -> 返回检测结果"""
+    loop = asyncio.get_running_loop()
+    while True:
+        image, ts = await frames.get()
+        try:
+            frame = await loop.run_in_executor(_cv_executor, _decode_camera_frame, image)
+            if frame is None:
+                logger.warning("无法解码图像数据")
+                continue
+
+            # YOLO 检测（模型仍在加载或不可用时返回空结果）
+            if not DETECTION_ENABLED or yolo_model is None:
+                await _send_json(websocket, {
+                    "detections": [],
+                    "ready": False,
+                    "processed_ts": ts
+                })
+                continue
+            detections = await _run_inference(_detect_camera_frame, frame)
+        except Exception as e:
+            logger.error(f"处理帧失败: {str(e)}")
+            continue
+
+        if len(detections) > 0:
+            logger.info(f"检测到: {[d['class'] for d in detections]}")
+
+        # 发送回客户端
+        await _send_json(websocket, {
+            "detections": detections,
+            "processed_ts": ts
+        })
+
 @app.websocket("/ws/camera")
 async def websocket_endpoint(websocket: WebSocket):
     """
     实时视觉处理接口 (Sim2Real模式)
-    接收客户端发送的 Base64 图片 -> YOLO 检测 -> 返回检测结果
+    接收客户端发送的图片 -> YOLO 检测 -> 返回检测结果
+    图片推荐以二进制帧发送（8 字节小端 float64 ts + JPEG 字节），
+    也兼容 {"image": "base64...", "ts": ...} 文本帧；结果以 JSON 文本帧返回
+    接收与处理分为两个任务，处理较慢时只检测最新一帧，延迟不会随积压增长
     """
     await websocket.accept()
     logger.info("WebSocket 连接建立 (客户端视觉源)")
+    frames: "asyncio.Queue[tuple]" = asyncio.Queue(maxsize=1)
+    tasks = {
+        asyncio.create_task(_receive_camera_frames(websocket, frames)),
+        asyncio.create_task(_process_camera_frames(websocket, frames)),
+    }
     
     try:
-        while True:
-            # 1. 接收客户端发送的数据 (JSON format: {"image": "base64..."})
-            raw_data = await websocket.receive_text()
-            try:
-                data = json.loads(raw_data)
-                
-                # 检查是否包含图像数据
-                if "image" not in data:
-                    continue
-                    
-                image_data = data["image"]
-                
-                # 2. 解码图片
-                # Remove header if present (e.g., "data:image/jpeg;base64,")
-                if "," in image_data:
-                    image_data = image_data.split(",")[1]
-                    
-                image_bytes = base64.b64decode(image_data)
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if frame is None:
-                    logger.warning("无法解码图像数据")
-                    continue
-
-                # 3. YOLO 检测
-                results = yolo_model(frame, verbose=False, conf=0.3)
-                
-                # 4. 提取检测结果
-                detections = []
-                for result in results:
-                    for box in result.boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        class_name = result.names[cls]
-                        detections.append({
-                            "class": class_name,
-                            "confidence": conf,
-                            "bbox": box.xyxy[0].tolist()
-                        })
-                
-                if len(detections) > 0:
-                    logger.info(f"检测到: {[d['class'] for d in detections]}")
-
-                # 5. 发送回客户端
-                await websocket.send_json({
-                    "detections": detections,
-                    "processed_ts": data.get("ts", 0)
-                })
-                
-            except json.JSONDecodeError:
-                logger.error("无效的 JSON 数据")
-            except Exception as e:
-                logger.error(f"处理帧失败: {str(e)}")
-            
+        # 任一任务结束（通常是客户端断开）即关闭整个连接
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         logger.info("WebSocket 连接断开")
     except Exception as e:
         logger.error(f"WebSocket 异常: {str(e)}")
-
+    finally:
+        for task in tasks:
+            task.cancel()
 
 # ========== MuJoCo 后端控制器 ==========
 
+try:  # mujoco 为可选依赖，未安装时 /ws/mujoco 使用模拟模式
+    import mujoco
+except ImportError:
+    mujoco = None
+
 class MuJoCoController:
     """
     MuJoCo 仿真控制器，运行 TD3 策略
@@ -1734,9 +2661,6 @@ class MuJoCoController:
     """
     
     def __init__(self):
-        import os
-        import sys
-        
         # 添加 Deep_LR 路径
         CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
         ROBOT_CONTROL = os.path.dirname(CURRENT_DIR)
@@ -1752,16 +2676,17 @@ class MuJoCoController:
         
         try:
             from robot_arm_env import RobotArmEnv
-            from stable_baselines3 import TD3
             
             # 创建无渲染模式的环境
             self.env = RobotArmEnv(render_mode=None)
             logger.info("MuJoCo 环境初始化成功")
+            # 模型加载后 site ID 不再变化，只解析一次
+            self._ee_site_id = mujoco.mj_name2id(self.env.model, mujoco.mjtObj.mjOBJ_SITE, "ee_site")
             
-            # 加载 TD3 模型
-            MODEL_PATH = os.path.join(DEEP_LR_PATH, "logs", "best_model", "best_model")
-            self.td3_model = TD3.load(MODEL_PATH, device="cpu")
-            logger.info("TD3 模型加载成功")
+            # 与 /api/td3/predict 共用同一份 TD3 模型和批处理队列
+            if td3_model is None and not load_td3_model():
+                raise RuntimeError("TD3 模型加载失败")
+            self.td3_model = td3_model
             
             self.target_pos = np.array([0.1, -0.25, 0.3])
             self.is_running = False
@@ -1782,19 +2707,16 @@ class MuJoCoController:
         self.env.reset()
         self.step_count = 0
     
-    def step(self):
+    async def step(self):
         """
         执行一步仿真
         返回: (关节角度列表, 是否完成, 末端位置)
         """
-        import mujoco
-        
         # 获取观测
         obs = self.env._get_state()
         
-        # TD3 推理
-        action, _ = self.td3_model.predict(obs.reshape(1, -1), deterministic=True)
-        action = action.flatten()
+        # TD3 推理（与其他并发请求合并批量推理）
+        action = await predict_batched(obs)
         
         # 执行动作
         _, reward, done, truncated, _ = self.env.step(action)
@@ -1803,20 +2725,18 @@ class MuJoCoController:
         # 最大步数限制
         MAX_STEPS = 500
         
-        # 获取关节角度 (弧度)
-        joint_angles_rad = self.env.data.qpos[:6].tolist()
-        
-        # 获取末端位置
-        ee_site_id = mujoco.mj_name2id(self.env.model, mujoco.mjtObj.mjOBJ_SITE, "ee_site")
-        ee_pos = self.env.data.site_xpos[ee_site_id].tolist()
-        distance = float(np.linalg.norm(np.array(ee_pos) - self.target_pos))
+        # 获取关节角度 (弧度) 和末端位置，复制一份避免发送前被下一步覆盖
+        joint_angles_rad = self.env.data.qpos[:6].copy()
+        ee_pos = self.env.data.site_xpos[self._ee_site_id].copy()
+        # 角度换算与距离计算合并在一个 JIT 内核中
+        angles_deg, distance = fast_ik.step_metrics(joint_angles_rad, ee_pos, self.target_pos)
         
         # 判断是否完成 (达到目标、超时、或步数限制)
         is_done = done or truncated or self.step_count >= MAX_STEPS
         
         return {
             "angles_rad": joint_angles_rad,
-            "angles_deg": [a * 180 / 3.14159 for a in joint_angles_rad],
+            "angles_deg": angles_deg,
             "ee_pos": ee_pos,
             "target_pos": self.target_pos.tolist(),
             "distance": distance,
@@ -1829,11 +2749,36 @@ class MuJoCoController:
 # 全局 MuJoCo 控制器实例 (延迟初始化)
 mujoco_controller = None
 
+MUJOCO_STEP_INTERVAL = 0.03  # 秒，每个仿真步对应的推送间隔 (~30 FPS)
+MUJOCO_BATCH_STEPS = 3  # 每条 WebSocket 消息合并的仿真步数
 
-@app.websocket("/ws/mujoco")
+def _mock_joint_frame(step: int, target) -> dict:
+    """模拟模式：按正弦波生成假的关节角度"""
+    t = step * 0.05
+    return {
+        "angles_deg": [
+            math.sin(t) * 30,  # 关节1
+            math.sin(t * 0.8) * 45,  # 关节2
+            math.cos(t * 0.6) * 30,  # 关节3
+            math.sin(t * 0.4) * 20,  # 关节4
+            math.cos(t * 0.3) * 25,  # 关节5
+            math.sin(t * 0.2) * 15   # 关节6
+        ],
+        "angles_rad": [0, 0, 0, 0, 0, 0],
+        "ee_pos": [0, 0, 0],
+        "target_pos": target,
+        "distance": 0.1,
+        "step": step,
+        "done": step >= 500,
+        "reason": "mock"
+    }
+
+
+# 与 App.vue 使用的 /ws/mujoco 指令通道分开注册：同一路径只有先注册的路由会生效
+@app.websocket("/ws/mujoco/sim")
 async def mujoco_control_ws(websocket: WebSocket):
     """
-    MuJoCo 实时控制 WebSocket
+    MuJoCo 实时控制 WebSocket（SimulationPanel 使用）
     
     客户端发送:
     - {"action": "set_target", "target": [x, y, z]}  设置目标
@@ -1842,7 +2787,8 @@ async def mujoco_control_ws(websocket: WebSocket):
     - {"action": "reset"}  重置环境
     
     服务端推送:
-    - {"type": "joint_update", "angles_deg": [...], "ee_pos": [...], ...}
+    - {"type": "joint_batch", "frames": [{"angles_deg": [...], "ee_pos": [...], ...}, ...]}
+      每条消息包含最多 MUJOCO_BATCH_STEPS 个连续仿真步
     """
     global mujoco_controller
     
@@ -1850,7 +2796,7 @@ async def mujoco_control_ws(websocket: WebSocket):
     logger.info("MuJoCo WebSocket 连接建立")
     
     # 发送连接确认
-    await websocket.send_json({"type": "connected"})
+    await _send_json(websocket, {"type": "connected"})
     
     # 延迟初始化控制器
     use_mock = False
@@ -1861,120 +2807,108 @@ async def mujoco_control_ws(websocket: WebSocket):
             logger.info("MuJoCo 控制器初始化成功")
         except Exception as e:
             logger.error(f"MuJoCo 控制器初始化失败: {e}")
-            import traceback
             traceback.print_exc()
             logger.warning("使用模拟模式代替真实 MuJoCo 控制器")
             use_mock = True
-            await websocket.send_json({"type": "warning", "message": f"MuJoCo 初始化失败，使用模拟模式: {str(e)}"})
+            await _send_json(websocket, {"type": "warning", "message": f"MuJoCo 初始化失败，使用模拟模式: {str(e)}"})
     
-    is_running = False
+    # 仿真在独立任务中按固定节拍运行，主协程只等待客户端指令，
+    # 不再用接收超时驱动仿真；锁保证指令不会在一批仿真步中途修改环境
+    running = asyncio.Event()
+    sim_lock = asyncio.Lock()
     
-    try:
+    async def simulate():
+        loop = asyncio.get_running_loop()
+        period = MUJOCO_STEP_INTERVAL * MUJOCO_BATCH_STEPS  # ~30 FPS
+        next_tick = loop.time()
         while True:
-            # 使用超时接收，以便可以在运行时继续推送
+            if not running.is_set():
+                await running.wait()
+                next_tick = loop.time()
+            # 运行仿真：连续执行 MUJOCO_BATCH_STEPS 步后合并为一条消息发送
             try:
-                raw_data = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=0.03 if is_running else None  # 运行时 30ms 超时
-                )
-                data = json.loads(raw_data)
-                
-                action = data.get("action", "")
+                async with sim_lock:
+                    if use_mock:
+                        mock_step_count = getattr(mujoco_control_ws, '_mock_step', 0)
+                        frames = []
+                        while len(frames) < MUJOCO_BATCH_STEPS and mock_step_count < 500:
+                            mock_step_count += 1
+                            frames.append(_mock_joint_frame(mock_step_count, mock_target))
+                        mujoco_control_ws._mock_step = mock_step_count
+                        done, steps, final_distance = mock_step_count >= 500, mock_step_count, 0.1
+                    else:
+                        frames = []
+                        while len(frames) < MUJOCO_BATCH_STEPS:
+                            result = await mujoco_controller.step()
+                            frames.append(result)
+                            if result["done"]:
+                                break
+                        done, steps, final_distance = result["done"], result["step"], result["distance"]
+                await _send_json(websocket, {"type": "joint_batch", "frames": frames})
                 
-                if action == "set_target":
-                    target = data.get("target", [0.1, -0.25, 0.3])
+                # 检查是否完成
+                if done:
+                    running.clear()
+                    await _send_json(websocket, {
+                        "type": "completed",
+                        "steps": steps,
+                        "final_distance": final_distance
+                    })
+                    if not use_mock:
+                        logger.info(f"目标达成! 步数: {steps}, 距离: {final_distance:.4f}")
+                    
+            except Exception as e:
+                logger.error(f"仿真步骤失败: {e}")
+                running.clear()
+                await _send_json(websocket, {"type": "error", "message": str(e)})
+            
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    
+    sim_task = asyncio.create_task(simulate())
+    
+    try:
+        while True:
+            raw_data = await websocket.receive_text()
+            data = _json_loads(raw_data)
+            
+            action = data.get("action", "")
+            
+            if action == "set_target":
+                target = data.get("target", [0.1, -0.25, 0.3])
+                async with sim_lock:
                     if use_mock or mujoco_controller is None:
                         mock_target = target
                         setattr(mujoco_control_ws, '_mock_step', 0)
                     else:
                         mujoco_controller.set_target(*target)
                         mujoco_controller.reset()
-                    await websocket.send_json({"type": "target_set", "target": target})
-                    
-                elif action == "start":
-                    is_running = True
-                    logger.info("MuJoCo 控制启动")
-                    await websocket.send_json({"type": "started"})
-                    
-                elif action == "stop":
-                    is_running = False
-                    logger.info("MuJoCo 控制停止")
-                    await websocket.send_json({"type": "stopped"})
-                    
-                elif action == "reset":
+                await _send_json(websocket, {"type": "target_set", "target": target})
+                
+            elif action == "start":
+                running.set()
+                logger.info("MuJoCo 控制启动")
+                await _send_json(websocket, {"type": "started"})
+                
+            elif action == "stop":
+                running.clear()
+                logger.info("MuJoCo 控制停止")
+                await _send_json(websocket, {"type": "stopped"})
+                
+            elif action == "reset":
+                async with sim_lock:
                     if use_mock or mujoco_controller is None:
                         setattr(mujoco_control_ws, '_mock_step', 0)
                     else:
                         mujoco_controller.reset()
-                    await websocket.send_json({"type": "reset"})
-                    
-            except asyncio.TimeoutError:
-                pass  # 超时继续执行仿真步骤
-            
-            # 运行仿真
-            if is_running:
-                try:
-                    if use_mock:
-                        # 模拟模式：生成假的关节角度
-                        import math
-                        mock_step_count = getattr(mujoco_control_ws, '_mock_step', 0) + 1
-                        mujoco_control_ws._mock_step = mock_step_count
-                        
-                        # 模拟正弦波运动
-                        t = mock_step_count * 0.05
-                        result = {
-                            "type": "joint_update",
-                            "angles_deg": [
-                                math.sin(t) * 30,  # 关节1
-                                math.sin(t * 0.8) * 45,  # 关节2
-                                math.cos(t * 0.6) * 30,  # 关节3
-                                math.sin(t * 0.4) * 20,  # 关节4
-                                math.cos(t * 0.3) * 25,  # 关节5
-                                math.sin(t * 0.2) * 15   # 关节6
-                            ],
-                            "angles_rad": [0, 0, 0, 0, 0, 0],
-                            "ee_pos": [0, 0, 0],
-                            "target_pos": mock_target,
-                            "distance": 0.1,
-                            "step": mock_step_count,
-                            "done": mock_step_count >= 500,
-                            "reason": "mock"
-                        }
-                        await websocket.send_json(result)
-                        
-                        if mock_step_count >= 500:
-                            is_running = False
-                            await websocket.send_json({
-                                "type": "completed",
-                                "steps": mock_step_count,
-                                "final_distance": 0.1
-                            })
-                        
-                        await asyncio.sleep(0.03)  # ~30 FPS
-                    else:
-                        result = mujoco_controller.step()
-                        result["type"] = "joint_update"
-                        await websocket.send_json(result)
-                        
-                        # 检查是否完成
-                        if result["done"]:
-                            is_running = False
-                            await websocket.send_json({
-                                "type": "completed",
-                                "steps": result["step"],
-                                "final_distance": result["distance"]
-                            })
-                            logger.info(f"目标达成! 步数: {result['step']}, 距离: {result['distance']:.4f}")
-                        
-                except Exception as e:
-                    logger.error(f"仿真步骤失败: {e}")
-                    is_running = False
-                    await websocket.send_json({"type": "error", "message": str(e)})
+                await _send_json(websocket, {"type": "reset"})
                     
     except WebSocketDisconnect:
         logger.info("MuJoCo WebSocket 连接断开")
     except Exception as e:
         logger.error(f"MuJoCo WebSocket 异常: {e}")
+    finally:
+        sim_task.cancel()
 
 
 # ========== 简单逆运动学控制器 ==========
@@ -2041,40 +2975,17 @@ async def list_presets():
     }
 
 
-@app.post("/api/llm/generate_action")
-async def generate_action_sequence(request: Request):
-    """
-    使用 Gemini LLM 生成机械臂动作序列
-    
-    请求体示例:
-    {
-        "command": "跳个太空舞"
-    }
-    
-    返回示例:
-    {
-        "success": true,
-        "name": "太空舞",
-        "keyframes": [
-            {"angles": [0, -30, 30, 0, 0, 0], "duration": 500},
-            {"angles": [30, -30, 30, 30, 0, 30], "duration": 400},
-            ...
-        ]
-    }
-    """
-    try:
-        data = await request.json()
-        user_command = data.get("command", "")
-        
-        if not user_command:
-            return {"success": False, "error": "缺少 command 参数"}
-        
-        logger.info(f"[LLM] 收到动作生成请求: {user_command}")
-        
-        # 构建 Prompt
-        prompt = f"""你是一个机械臂动作编排专家。请根据用户的指令生成一个完整的动作序列。
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/"
 
-用户指令: "{user_command}"
+# 动作生成共用一个 HTTP 客户端，连接池跨请求复用（免去每次 DNS + TCP/TLS 握手）
+_gemini_client = httpx.AsyncClient(
+    proxy=CONFIG.get("HTTP_PROXY"),
+    timeout=httpx.Timeout(30.0, connect=10.0),
+    limits=httpx.Limits(max_keepalive_connections=8, max_connections=16)
+)
+
+# 动作生成提示词的固定部分：模块级常量，各请求的前缀逐字节一致，便于服务端前缀缓存
+ACTION_PROMPT_PREFIX = """你是一个机械臂动作编排专家。请根据用户的指令生成一个完整的动作序列。
 
 机械臂参数:
 - 6个关节 (joint1-joint6)
@@ -2100,16 +3011,69 @@ async def generate_action_sequence(request: Request):
 - **只返回JSON，不要任何额外文字**
 
 示例输出格式:
-{{
+{
   "name": "挥手",
   "keyframes": [
-    {{"angles": [0, -30, 45, 0, -15, 0], "duration": 1000}},
-    {{"angles": [15, -30, 45, 0, -15, 30], "duration": 500}},
-    {{"angles": [0, 0, 0, 0, 0, 0], "duration": 1000}}
+    {"angles": [0, -30, 45, 0, -15, 0], "duration": 1000},
+    {"angles": [15, -30, 45, 0, -15, 30], "duration": 500},
+    {"angles": [0, 0, 0, 0, 0, 0], "duration": 1000}
   ]
-}}
+}
+"""
+# Gemini 结构化输出 schema，与 ACTION_PROMPT_PREFIX 描述的格式一致
+ACTION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "name": {"type": "STRING"},
+        "keyframes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "angles": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+                    "duration": {"type": "INTEGER"},
+                    "gripper": {"type": "BOOLEAN"}
+                },
+                "required": ["angles", "duration"]
+            }
+        }
+    },
+    "required": ["name", "keyframes"]
+}
 
-现在请为用户指令"{user_command}"生成动作序列:"""
+
+@app.post("/api/llm/generate_action")
+async def generate_action_sequence(request: Request):
+    """
+    使用 Gemini LLM 生成机械臂动作序列
+    
+    请求体示例:
+    {
+        "command": "跳个太空舞"
+    }
+    
+    返回示例:
+    {
+        "success": true,
+        "name": "太空舞",
+        "keyframes": [
+            {"angles": [0, -30, 30, 0, 0, 0], "duration": 500},
+            {"angles": [30, -30, 30, 30, 0, 30], "duration": 400},
+            ...
+        ]
+    }
+    """
+    try:
+        data = await request.json()
+        user_command = data.get("command", "")
+        
+        if not user_command:
+            return {"success": False, "error": "缺少 command 参数"}
+        
+        logger.info(f"[LLM] 收到动作生成请求: {user_command}")
+        
+        # 构建 Prompt：固定前缀 + 用户指令
+        prompt = f'{ACTION_PROMPT_PREFIX}\n用户指令: "{user_command}"\n请为该指令生成动作序列:'
 
         if not LLM_ENABLED:
             return {"success": False, "error": "LLM已禁用：未配置 GEMINI_API_KEY"}
@@ -2123,46 +3087,39 @@ async def generate_action_sequence(request: Request):
             }],
             "generationConfig": {
                 "temperature": 0.7,
-                "maxOutputTokens": 1024
+                "maxOutputTokens": 1024,
+                # 按 schema 直接返回 JSON 文本，不再包 markdown 代码块
+                "responseMimeType": "application/json",
+                "responseSchema": ACTION_RESPONSE_SCHEMA
             }
         }
         
-        async with httpx.AsyncClient(proxy=CONFIG.get("HTTP_PROXY")) as client:
-            resp = await client.post(API_URL, json=payload, timeout=30.0)
+        resp = await _gemini_client.post(API_URL, json=payload, timeout=30.0)
+        
+        if resp.status_code == 200:
+            resp_data = resp.json()
+            content = resp_data["candidates"][0]["content"]["parts"][0]["text"].strip()
+            logger.info(f"[LLM] Gemini 响应: {content}")
             
-            if resp.status_code == 200:
-                resp_data = resp.json()
-                content = resp_data["candidates"][0]["content"]["parts"][0]["text"].strip()
-                logger.info(f"[LLM] Gemini 响应: {content}")
-                
-                # 清理 JSON (移除markdown代码块标记)
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.startswith("```"):
-                    content = content[3:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                content = content.strip()
-                
-                # 解析 JSON
-                action_sequence = json.loads(content)
-                
-                return {
-                    "success": True,
-                    "name": action_sequence.get("name", "未命名动作"),
-                    "keyframes": action_sequence.get("keyframes", []),
-                    "raw": content
-                }
-            else:
-                logger.error(f"[LLM] Gemini API 错误: {resp.status_code} - {resp.text}")
-                return {"success": False, "error": f"Gemini API 错误: {resp.status_code}"}
+            # 解析 JSON（结构化输出，无需清理代码块标记）
+            action_sequence = _json_loads(content)
+            
+            result = {
+                "success": True,
+                "name": action_sequence.get("name", "未命名动作"),
+                "keyframes": action_sequence.get("keyframes", []),
+                "raw": content
+            }
+            return result
+        else:
+            logger.error(f"[LLM] Gemini API 错误: {resp.status_code} - {resp.text}")
+            return {"success": False, "error": f"Gemini API 错误: {resp.status_code}"}
                 
     except json.JSONDecodeError as e:
         logger.error(f"[LLM] JSON 解析失败: {e}")
         return {"success": False, "error": "LLM返回格式错误", "raw": content}
     except Exception as e:
         logger.error(f"[LLM] 动作生成失败: {e}")
-        import traceback
         traceback.print_exc()
         return {"success": False, "error": str(e)}
 
@@ -1,13 +1,30 @@
 """
 🧠 对话记忆管理系统
-3层架构：RAM(当前) + JSON(历史) + Vector(语义检索)
+3层架构：RAM(当前) + JSONL(历史) + Vector(语义检索)
 """
 import json
 import os
 import time
 import logging
-from typing import List, Dict, Optional
-from datetime import datetime
+import queue
+import atexit
+import threading
+from collections import deque
+from itertools import islice
+from typing import Deque, Iterator, List, Dict, Optional
+from functools import lru_cache
+
+try:  # orjson 为可选依赖，未安装时回退标准库
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+    def _json_dumps(obj, indent: bool = False) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +32,28 @@ logger = logging.getLogger(__name__)
 # 配置
 # ============================================================
 MEMORY_DIR = "E:/zero-robotic-arm/robot-control-system/ai-service"
-HISTORY_FILE = os.path.join(MEMORY_DIR, "chat_history.json")
+# 历史消息为追加写的 JSONL 日志（每行一条），总结单独存放，只在更新总结时写入
+HISTORY_FILE = os.path.join(MEMORY_DIR, "chat_history.jsonl")
+SUMMARY_FILE = os.path.join(MEMORY_DIR, "chat_history.summary.json")
+LEGACY_HISTORY_FILE = os.path.join(MEMORY_DIR, "chat_history.json")  # 旧版整体 JSON，首次启动时迁移
 MAX_RAM_MESSAGES = 20  # RAM中保留最近20条
-MAX_HISTORY_MESSAGES = 200  # JSON中保留最近200条
+MAX_HISTORY_MESSAGES = 200  # 日志超过200条时轮转为 .old，新日志保留最近 MAX_RAM_MESSAGES 条
 SUMMARY_THRESHOLD = 10  # 每10条消息触发一次总结
+WRITE_QUEUE_SIZE = 1024  # 待写入消息上限，写线程跟不上时丢弃新消息
+WRITE_BATCH_SIZE = 64  # 写线程一次最多合并写入的消息数
+WRITE_INTERVAL = 5.0  # 秒，写线程攒批的最长等待时间
+
+@lru_cache(maxsize=64)
+def _format_second(sec: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+
+
+def _format_ts(ns: int) -> str:
+    """time.time_ns() 时间戳 → 本地时间 ISO 字符串（与 datetime.isoformat() 相同格式）；
+    同一秒内的消息共用一次 strftime"""
+    sec, rem = divmod(ns, 1_000_000_000)
+    return f"{_format_second(sec)}.{rem // 1000:06d}"
+
 
 # ============================================================
 # 内存存储 (当前会话)
@@ -27,87 +62,204 @@ class ConversationMemory:
     """双层记忆系统"""
     
     def __init__(self):
-        self.ram_messages: List[Dict] = []  # 当前会话 (完整)
+        # 当前会话；deque 定长，追加超出上限时自动丢弃最旧的消息
+        self.ram_messages: Deque[Dict] = deque(maxlen=MAX_RAM_MESSAGES)
+        # 与 ram_messages 一一对应的 {"role", "content"} 上下文消息：每条只构造一次，
+        # get_context_for_llm 直接复用，不再每次调用为每条消息新建字典
+        self._context_msgs: Deque[Dict] = deque(maxlen=MAX_RAM_MESSAGES)
+        self._summary_msg: Optional[tuple] = None  # 缓存的 (总结文本, 总结系统消息)
         self.summary: str = ""  # AI总结的历史精华
         self.message_count = 0
+        self._fh = None  # 历史日志的追加写句柄（只在写线程中使用）
+        self._file_lines = 0  # 历史日志当前行数，用于判断轮转
+        self._recent_lines = deque(maxlen=MAX_RAM_MESSAGES)  # 最近写入的行，轮转时作为新日志开头
+        # 磁盘写入交给后台线程：add_message 只入队，不等待文件 I/O
+        self._write_q: "queue.Queue" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
         self._load_history()
+        self._open_log()
     
     def _load_history(self):
         """启动时加载历史记录"""
         try:
+            if os.path.exists(SUMMARY_FILE):
+                with open(SUMMARY_FILE, 'rb') as f:
+                    self.summary = _json_loads(f.read()).get("summary", "")
+            if not os.path.exists(HISTORY_FILE) and os.path.exists(LEGACY_HISTORY_FILE):
+                self._migrate_legacy()
             if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.summary = data.get("summary", "")
-                    # 加载最近几条到RAM
-                    history = data.get("messages", [])[-5:]
-                    self.ram_messages = history
-                    logger.info(f"✅ 加载历史记忆: {len(history)}条, 总结: {len(self.summary)}字")
+                # 顺序读一遍：只保留最后几行，同时统计行数
+                with open(HISTORY_FILE, 'rb') as f:
+                    for line in f:
+                        if line.strip():
+                            self._recent_lines.append(line)
+                            self._file_lines += 1
+                # 加载最近几条到RAM
+                recent = self._recent_lines
+                for line in islice(recent, max(0, len(recent) - 5), None):
+                    self._remember(_json_loads(line))
+                logger.info(f"✅ 加载历史记忆: {len(self.ram_messages)}条, 总结: {len(self.summary)}字")
         except Exception as e:
             logger.warning(f"加载历史记忆失败: {e}")
     
+    def _migrate_legacy(self):
+        """把旧版整体 JSON 历史转换为 JSONL 日志 + 总结文件"""
+        with open(LEGACY_HISTORY_FILE, 'rb') as f:
+            data = _json_loads(f.read())
+        self.summary = data.get("summary", "") or self.summary
+        with open(HISTORY_FILE, 'wb') as f:
+            for msg in data.get("messages", [])[-MAX_HISTORY_MESSAGES:]:
+                f.write(self._encode(msg))
+        if self.summary:
+            self._write_summary()
+        logger.info(f"✅ 已迁移旧版历史记录: {LEGACY_HISTORY_FILE}")
+    
+    @staticmethod
+    def _encode(msg: Dict) -> bytes:
+        ts = msg.get("timestamp")
+        if isinstance(ts, int):
+            # 内存中保存 time_ns 整数，写盘时才格式化（在写线程中执行）
+            msg = {**msg, "timestamp": _format_ts(ts)}
+        return _json_dumps(msg) + b"\n"
+    
+    def _open_log(self):
+        try:
+            self._fh = open(HISTORY_FILE, 'ab')
+        except OSError as e:
+            logger.warning(f"无法打开历史日志，消息只保存在内存中: {e}")
+            self._fh = None
+            return
+        self._writer = threading.Thread(target=self._writer_loop, name="memory-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
     def add_message(self, role: str, content: str):
         """添加消息到记忆"""
         msg = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time_ns()  # 写盘时再格式化为字符串
         }
-        self.ram_messages.append(msg)
+        self._remember(msg)
         self.message_count += 1
         
-        # 限制RAM大小
-        if len(self.ram_messages) > MAX_RAM_MESSAGES:
-            self.ram_messages = self.ram_messages[-MAX_RAM_MESSAGES:]
-        
-        # 异步保存到文件
+        # 追加到历史日志
         self._save_to_file(msg)
     
     def _save_to_file(self, new_msg: Dict):
-        """保存到JSON文件"""
+        """把消息交给写线程追加到 JSONL 日志；不阻塞调用方"""
+        if self._writer is None:
+            return
         try:
-            # 读取现有历史
-            history = []
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    history = data.get("messages", [])
-            
-            # 追加新消息
-            history.append(new_msg)
-            
-            # 限制大小
-            if len(history) > MAX_HISTORY_MESSAGES:
-                history = history[-MAX_HISTORY_MESSAGES:]
-            
-            # 保存
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "summary": self.summary,
-                    "messages": history,
-                    "updated_at": datetime.now().isoformat()
-                }, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            logger.error(f"保存历史失败: {e}")
+            self._write_q.put_nowait(new_msg)
+        except queue.Full:
+            logger.error("保存历史失败: 写入队列已满，丢弃消息")
+    
+    def _writer_loop(self):
+        """
+        后台写线程：攒够 WRITE_BATCH_SIZE 条或等待 WRITE_INTERVAL 秒后一次写入并 fsync。
+        队列中的 threading.Event 表示立即落盘（flush），None 表示退出
+        """
+        while True:
+            item = self._write_q.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + WRITE_INTERVAL
+            while True:
+                if item is None or isinstance(item, threading.Event):
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= WRITE_BATCH_SIZE or remaining <= 0:
+                    break
+                try:
+                    item = self._write_q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"保存历史失败: {e}")
+            for event in waiters:
+                event.set()
+            if item is None:
+                return
+    
+    def _write_batch(self, batch: List[Dict]):
+        lines = [self._encode(msg) for msg in batch]
+        self._fh.writelines(lines)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._recent_lines.extend(lines)
+        self._file_lines += len(lines)
+        if self._file_lines > MAX_HISTORY_MESSAGES:
+            self._rotate()
+    
+    def _rotate(self):
+        """日志超过上限：旧日志改名为 .old，新日志以最近写入的几条消息开头"""
+        self._fh.close()
+        os.replace(HISTORY_FILE, HISTORY_FILE + ".old")
+        self._fh = open(HISTORY_FILE, 'ab')
+        self._fh.writelines(self._recent_lines)
+        self._fh.flush()
+        self._file_lines = len(self._recent_lines)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已入队的消息全部写入磁盘"""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._write_q.put(done)
+        return done.wait(timeout)
+    
+    def _write_summary(self):
+        with open(SUMMARY_FILE, 'wb') as f:
+            f.write(_json_dumps({
+                "summary": self.summary,
+                "summary_updated_at": _format_ts(time.time_ns())
+            }, indent=True))
+    
+    def close(self):
+        """写完队列中剩余的消息后停止写线程并关闭历史日志"""
+        if self._writer is not None:
+            self._write_q.put(None)
+            self._writer.join(timeout=WRITE_INTERVAL + 1.0)
+            self._writer = None
+            atexit.unregister(self.close)
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+    
+    def _remember(self, msg: Dict):
+        # 超过 MAX_RAM_MESSAGES 时两个 deque 同步丢弃最旧的
+        self.ram_messages.append(msg)
+        self._context_msgs.append({"role": msg["role"], "content": msg["content"]})
+    
+    @staticmethod
+    def _tail(messages: Deque[Dict], n: int) -> Iterator[Dict]:
+        """最近 n 条消息（不复制列表）"""
+        return islice(messages, max(0, len(messages) - n), None)
     
     def get_context_for_llm(self) -> List[Dict]:
-        """获取给LLM的上下文（包含总结+最近消息）"""
+        """
+        获取给LLM的上下文（包含总结+最近消息）
+        返回的消息字典在多次调用间共享，调用方不要修改
+        """
         context = []
         
         # 1. 如果有历史总结，作为系统消息注入
         if self.summary:
-            context.append({
-                "role": "system",
-                "content": f"[历史对话总结]: {self.summary}"
-            })
+            if self._summary_msg is None or self._summary_msg[0] != self.summary:
+                self._summary_msg = (self.summary, {
+                    "role": "system",
+                    "content": f"[历史对话总结]: {self.summary}"
+                })
+            context.append(self._summary_msg[1])
         
         # 2. 添加最近的对话
-        for msg in self.ram_messages[-10:]:  # 最近10条
-            context.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        context.extend(self._tail(self._context_msgs, 10))  # 最近10条
         
         return context
     
@@ -120,25 +272,15 @@ class ConversationMemory:
         self.summary = new_summary
         logger.info(f"📝 更新记忆总结: {new_summary[:50]}...")
         
-        # 保存总结到文件
+        # 总结单独保存，不触碰历史日志
         try:
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            else:
-                data = {"messages": []}
-            
-            data["summary"] = new_summary
-            data["summary_updated_at"] = datetime.now().isoformat()
-            
-            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self._write_summary()
         except Exception as e:
             logger.error(f"保存总结失败: {e}")
     
     def get_recent_for_summary(self) -> str:
         """获取最近对话用于生成总结"""
-        recent = self.ram_messages[-15:]  # 最近15条
+        recent = self._tail(self.ram_messages, 15)  # 最近15条
         lines = []
         for msg in recent:
             role = "用户" if msg["role"] == "user" else "Zero"
@@ -147,7 +289,8 @@ class ConversationMemory:
     
     def clear_ram(self):
         """清空RAM（保留总结）"""
-        self.ram_messages = []
+        self.ram_messages.clear()
+        self._context_msgs.clear()
         self.message_count = 0
 
 
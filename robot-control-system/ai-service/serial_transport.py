@@ -8,11 +8,15 @@ handling, framing, and connection lifecycle concerns in one place.
 from __future__ import annotations
 
 import logging
+import os
 import threading
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Iterable, List, Optional, Sequence
 
+import numpy as np
+
 try:  # pragma: no cover - dependency is optional during early development
     import serial  # type: ignore
     from serial import SerialException  # type: ignore
@@ -23,15 +27,28 @@ except ImportError:  # pragma: no cover - handled gracefully in runtime logic
     list_ports = None  # type: ignore
 
 
+# Common spellings are matched as-is so most values skip strip()/lower().
+_TRUE = frozenset(("1", "true", "yes", "on", "True", "TRUE", "Yes", "YES", "On", "ON"))
+_FALSE = frozenset(("0", "false", "no", "off", "False", "FALSE", "No", "NO", "Off", "OFF"))
+
+
 def _bool(value: object, default: bool = False) -> bool:
     if value is None:
         return default
     if isinstance(value, bool):
         return value
+    if isinstance(value, int):
+        # Same as the string path: only 1 and 0 are recognised.
+        return True if value == 1 else False if value == 0 else default
+    if isinstance(value, str):
+        if value in _TRUE:
+            return True
+        if value in _FALSE:
+            return False
     text = str(value).strip().lower()
-    if text in {"1", "true", "yes", "on"}:
+    if text in _TRUE:
         return True
-    if text in {"0", "false", "no", "off"}:
+    if text in _FALSE:
         return False
     return default
 
@@ -76,6 +93,11 @@ class JointLimits:
     JOINT_4: tuple = (-180.0, 180.0)   # Wrist rotation
     JOINT_5: tuple = (-90.0, 90.0)     # Wrist pitch
     JOINT_6: tuple = (-180.0, 180.0)   # End effector rotation
+
+    # Lower/upper bounds as arrays so validate_angles is one vector compare.
+    _LOW, _HIGH = np.array(
+        [JOINT_1, JOINT_2, JOINT_3, JOINT_4, JOINT_5, JOINT_6], dtype=np.float64
+    ).T
     
     @classmethod
     def get_limits(cls) -> List[tuple]:
@@ -102,14 +124,19 @@ class JointLimits:
         if len(angles_deg) != 6:
             return False, f"Expected 6 joint angles, got {len(angles_deg)}"
         
-        limits = cls.get_limits()
-        for idx, (angle, (min_angle, max_angle)) in enumerate(zip(angles_deg, limits), 1):
-            if angle is None:
-                continue
-            if not (min_angle <= angle <= max_angle):
-                return False, f"Joint {idx} angle {angle:.2f}° exceeds limits [{min_angle}, {max_angle}]"
-        
-        return True, "OK"
+        angles = np.array(angles_deg, dtype=np.float64)  # None -> nan
+        # Written as "not within" so NaN counts as out of range.
+        out_of_range = ~((angles >= cls._LOW) & (angles <= cls._HIGH))
+        if None in angles_deg:
+            # None entries mean "leave this joint alone" and are not checked.
+            out_of_range &= np.array([angle is not None for angle in angles_deg])
+        if not out_of_range.any():
+            return True, "OK"
+        idx = int(out_of_range.argmax())
+        return False, (
+            f"Joint {idx + 1} angle {angles[idx]:.2f}° exceeds limits "
+            f"[{cls._LOW[idx]}, {cls._HIGH[idx]}]"
+        )
 
 
 class SerialTransport:
@@ -125,6 +152,11 @@ class SerialTransport:
         self.logger = logger or logging.getLogger(__name__)
         self._serial: Optional[serial.Serial] = None  # type: ignore[attr-defined]
         self._lock = threading.Lock()
+        # Raw fd of the open port (POSIX only) for the lock-free ESTOP path.
+        self._fd: Optional[int] = None
+        # Set by send_emergency_stop before anything reaches the wire; while
+        # set, ordinary commands are refused until send_reset_controller.
+        self._estopped = False
         self._mock_mode = not config.enabled or serial is None
         if serial is None and config.enabled:
             self.logger.warning("pyserial 未安装，串口将回退到模拟模式")
@@ -134,6 +166,22 @@ class SerialTransport:
                 config.enabled,
                 serial is not None,
             )
+        # Fixed commands are encoded once here; ESTOP in particular should do
+        # no string work between the trigger and the wire.
+        newline = config.newline
+        self._handshake_enable_bytes = (
+            (config.handshake_command + newline).encode("utf-8")
+            if config.handshake_command
+            else None
+        )
+        self._handshake_disable_bytes = ("remote_disable" + newline).encode("utf-8")
+        self._estop_bytes = ("ESTOP" + newline).encode("utf-8")
+        # The unlocked ESTOP may land in the middle of another command's line,
+        # so it starts with a newline of its own to terminate that fragment.
+        self._estop_fast_bytes = newline.encode("utf-8") + self._estop_bytes
+        self._reset_bytes = ("RESET" + newline).encode("utf-8")
+        self._pump_on_bytes = ("PUMP_ON" + newline).encode("utf-8")
+        self._pump_off_bytes = ("PUMP_OFF" + newline).encode("utf-8")
         if auto_connect and not self._mock_mode:
             self.connect()
 
@@ -158,9 +206,13 @@ class SerialTransport:
                     self.config.port,
                     self.config.baudrate,
                 )
-                if self.config.handshake_command:
+                try:
+                    self._fd = self._serial.fileno()
+                except (AttributeError, OSError, ValueError):
+                    self._fd = None  # e.g. Windows: no fd, ESTOP takes the lock
+                if self._handshake_enable_bytes:
                     # 发送握手命令，但不递归调用 send_command。
-                    self._write_line(self.config.handshake_command)
+                    self._write_bytes(self._handshake_enable_bytes, force=True)
                 return True
             except SerialException as exc:  # type: ignore[misc]
                 self.logger.error("串口打开失败: %s", exc)
@@ -169,10 +221,11 @@ class SerialTransport:
 
     def close(self) -> None:
         with self._lock:
+            self._fd = None
             if self._serial and self._serial.is_open:
                 try:
-                    if self.config.handshake_command:
-                        self._write_line("remote_disable")
+                    if self._handshake_enable_bytes:
+                        self._write_bytes(self._handshake_disable_bytes, force=True)
                 finally:
                     self._serial.close()
                     self.logger.info("串口已关闭")
@@ -185,16 +238,21 @@ class SerialTransport:
     def mock_mode(self) -> bool:
         return self._mock_mode
 
+    @property
+    def estopped(self) -> bool:
+        """True after send_emergency_stop; all other commands are refused
+        until send_reset_controller() succeeds."""
+        return self._estopped
+
     def send_command(self, command: str) -> bool:
         """Send a raw command string to the controller."""
         command = command.rstrip("\r\n") + self.config.newline
         if self._mock_mode:
+            if self._refused_by_estop(command):
+                return False
             self.logger.debug("[MOCK] -> %s", command.strip())
             return True
-        if not self.connect():
-            return False
-        with self._lock:
-            return self._write_line(command)
+        return self._send_bytes(command.encode("utf-8"))
 
     def send_joint_angles(
         self,
@@ -228,12 +286,23 @@ class SerialTransport:
                 self.logger.error(f"Joint limit validation failed: {error_msg}")
                 return False
         
-        success = True
+        # All joints go out as one buffer: one lock, one write, one flush
+        # (refused as a whole while an emergency stop is latched).
+        newline = self.config.newline
+        buf = bytearray()
         for idx, angle in enumerate(angles_deg, start=1):
             if angle is None:
                 continue
-            cmd = f"{mode}_rotate {idx} {angle:.2f} 0 0 0 0"
-            success &= self.send_command(cmd)
+            buf += f"{mode}_rotate {idx} {angle:.2f} 0 0 0 0{newline}".encode("utf-8")
+        if not buf:
+            return True
+        if self._mock_mode:
+            if self._refused_by_estop(bytes(buf)):
+                return False
+            self.logger.debug("[MOCK] -> %s", buf.decode("utf-8").strip())
+            success = True
+        else:
+            success = self._send_bytes(bytes(buf))
         if success and delay > 0:
             self.logger.debug("串口操作建议延时 %.3fs", delay)
         return success
@@ -271,8 +340,6 @@ class SerialTransport:
             STATUS,j1,j2,j3,j4,j5,j6,error_code
             示例: STATUS,0.5,10.2,-5.3,0.0,45.6,-30.1,0
         """
-        import time
-        
         if self._mock_mode:
             # Mock 模式返回模拟数据（全零角度，无错误）
             return {
@@ -286,13 +353,15 @@ class SerialTransport:
         if not line:
             return None
         
-        # 解析协议
+        # 解析协议：先按前缀快速排除非状态报文，再只切分需要的 8 个字段
+        if line[:7].upper() != 'STATUS,':
+            return None
         try:
-            parts = line.split(',')
-            if parts[0].upper() == 'STATUS' and len(parts) >= 8:
+            parts = line.split(',', 8)
+            if len(parts) >= 8:
                 return {
-                    'angles_deg': [float(parts[i]) for i in range(1, 7)],
-                    'error_code': int(parts[7]) if len(parts) > 7 else 0,
+                    'angles_deg': list(map(float, parts[1:7])),
+                    'error_code': int(parts[7]),
                     'timestamp': time.time(),
                     'is_mock': False
                 }
@@ -322,12 +391,13 @@ class SerialTransport:
         TODO: Replace with actual hardware protocol when available
         """
         if self._mock_mode:
+            if self._refused_by_estop("[MOCK] pump_control"):
+                return False
             self.logger.info(f"[MOCK] 吸泵控制: {'开启' if state else '关闭'}")
             return True
         
         # Placeholder command format - adjust based on actual hardware
-        command = "PUMP_ON" if state else "PUMP_OFF"
-        return self.send_command(command)
+        return self._send_bytes(self._pump_on_bytes if state else self._pump_off_bytes)
     
     def send_pump_pwm(self, duty_cycle: int) -> bool:
         """
@@ -345,6 +415,8 @@ class SerialTransport:
         TODO: Replace with actual hardware protocol when available
         """
         if self._mock_mode:
+            if self._refused_by_estop("[MOCK] pump_pwm"):
+                return False
             self.logger.info(f"[MOCK] 吸泵强度: {duty_cycle}")
             return True
         
@@ -372,6 +444,8 @@ class SerialTransport:
         TODO: Replace with actual hardware protocol when available
         """
         if self._mock_mode:
+            if self._refused_by_estop("[MOCK] led_control"):
+                return False
             color_str = f" ({color})" if color else ""
             self.logger.info(f"[MOCK] LED控制: {'开启' if state else '关闭'}{color_str}")
             return True
@@ -399,6 +473,8 @@ class SerialTransport:
         TODO: Replace with actual hardware protocol when available
         """
         if self._mock_mode:
+            if self._refused_by_estop("[MOCK] servo_control"):
+                return False
             self.logger.info(f"[MOCK] 舵机控制: ID={servo_id}, 角度={angle}°")
             return True
         
@@ -419,15 +495,34 @@ class SerialTransport:
         Command Format (to be confirmed):
             "ESTOP\n" or "M112\n" (G-code emergency stop)
         
-        CRITICAL: This should be the highest priority command
+        CRITICAL: This should be the highest priority command.
+        Afterwards every other command is refused (``estopped`` is True)
+        until ``send_reset_controller()`` succeeds.
         TODO: Replace with actual hardware protocol when available
         """
+        # Stop other writers first: a batch in progress drops its remaining lines.
+        self._estopped = True
         if self._mock_mode:
             self.logger.warning("[MOCK] ⚠️ 紧急停止触发")
             return True
         
-        # Emergency stop should bypass normal queue and send immediately
-        command = "ESTOP"
+        # Emergency stop should bypass normal queue and send immediately.
+        # Where the port has an fd, skip the lock entirely: a blocking
+        # readline or a long write may be holding it.
+        fd = self._fd
+        serial_port = self._serial
+        if fd is not None and serial_port is not None:
+            # Discard pending output first; flushing after the write could
+            # drop the ESTOP itself.
+            try:
+                serial_port.reset_output_buffer()
+            except (SerialException, OSError):
+                pass
+            try:
+                return os.write(fd, self._estop_fast_bytes) > 0
+            except OSError as exc:
+                self.logger.error("紧急停止快速写入失败，改走加锁路径: %s", exc)
+
         with self._lock:
             if self._serial and self._serial.is_open:
                 # Flush output buffer first to ensure ESTOP is sent immediately
@@ -435,7 +530,7 @@ class SerialTransport:
                     self._serial.reset_output_buffer()
                 except SerialException:
                     pass
-                return self._write_line(command)
+                return self._write_bytes(self._estop_bytes, force=True)
         return False
     
     def send_reset_controller(self) -> bool:
@@ -452,10 +547,13 @@ class SerialTransport:
         """
         if self._mock_mode:
             self.logger.info("[MOCK] 控制器复位")
+            self._estopped = False
             return True
         
-        command = "RESET"
-        return self.send_command(command)
+        if not self._send_bytes(self._reset_bytes, force=True):
+            return False
+        self._estopped = False
+        return True
 
     def read_line(self) -> Optional[str]:
         """Read a line from the serial port (non-blocking)."""
@@ -519,15 +617,35 @@ class SerialTransport:
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    def _write_line(self, command: str) -> bool:
+    def _refused_by_estop(self, command) -> bool:
+        if self._estopped:
+            self.logger.warning("急停已触发，拒绝命令 (需先 send_reset_controller): %r", command)
+            return True
+        return False
+
+    def _send_bytes(self, data: bytes, force: bool = False) -> bool:
+        """Open the port if needed and write a framed buffer under the lock."""
+        if not self.connect():
+            return False
+        with self._lock:
+            return self._write_bytes(data, force)
+
+    def _write_bytes(self, data: bytes, force: bool = False) -> bool:
+        """Write an already framed buffer and flush it. Caller holds ``_lock``.
+
+        Unless ``force`` is set (ESTOP, RESET, handshake), nothing is written
+        after an emergency stop. Bytes already handed to the OS when ESTOP
+        fires are dropped by its ``reset_output_buffer``.
+        """
         if not self._serial:
             return False
-        data = command if isinstance(command, bytes) else command.encode("utf-8")
+        if not force and self._refused_by_estop(data):
+            return False
         try:
             written = self._serial.write(data)
             self._serial.flush()
             if written <= 0:
-                self.logger.warning("串口写入失败: %s", command)
+                self.logger.warning("串口写入失败: %r", data)
                 return False
             return True
         except SerialException as exc:  # type: ignore[misc]
@@ -8,14 +8,9 @@ from advanced_ik import AdvancedIKController
 
 logger = logging.getLogger(__name__)
 
-class RobotSkills:
-    def __init__(self, ik_controller=None):
-        self.ik_controller = ik_controller or AdvancedIKController()
-        logger.info("✅ RobotSkills 系统已初始化")
-
-    def get_skill_descriptions(self):
-        """返回供 LLM System Prompt 使用的技能描述"""
-        return """
+# 技能描述是静态文本，导入时生成一次；各请求拿到的是同一个字符串对象，
+# 下游按它缓存的系统提示词（llm_router._work_system_prompt）也就只拼接一次
+SKILL_DESCRIPTIONS = """
 ## 🔧 可用工具 (Tools):
 你拥有以下 Python 函数来控制机械臂。请在 JSON 的 "skill" 字段中指定要调用的函数名，并在 "args" 中传入参数。
 
@@ -50,6 +45,16 @@ class RobotSkills:
    - 示例: "挥手" -> {"skill": "perform_action", "args": {"action_name": "wave"}}
 """
 
+
+class RobotSkills:
+    def __init__(self, ik_controller=None):
+        self.ik_controller = ik_controller or AdvancedIKController()
+        logger.info("✅ RobotSkills 系统已初始化")
+
+    def get_skill_descriptions(self):
+        """返回供 LLM System Prompt 使用的技能描述"""
+        return SKILL_DESCRIPTIONS
+
     def execute(self, skill_name, **kwargs):
         """
         统一执行入口
@@ -0,0 +1,142 @@
+import unittest
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advanced_ik import AdvancedIKController
+import analytical_ik
+import fast_ik
+
+
+class TestAdvancedIK(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ik = AdvancedIKController()
+
+    def test_warm_start_reuses_last_solution(self):
+        """Nearby targets start from the previous solution"""
+        first = self.ik.calculate_ik(0.0, 0.25, 0.3)
+        self.assertTrue(first['success'])
+        self.assertIsNotNone(self.ik._last_solution)
+        np.testing.assert_allclose(self.ik._last_target, [0.0, 0.25, 0.3])
+
+        second = self.ik.calculate_ik(0.01, 0.25, 0.3)
+        self.assertTrue(second['success'])
+        np.testing.assert_allclose(self.ik._last_target, [0.01, 0.25, 0.3])
+
+    def test_explicit_initial_position(self):
+        """Callers can override the initial guess"""
+        guess = [0.0] * len(self.ik.chain.links)
+        result = self.ik.calculate_ik(0.0, 0.20, 0.20, initial_position=guess)
+        self.assertTrue(result['success'])
+
+    def test_fast_fk_matches_chain(self):
+        """fast_ik FK agrees with the manual ikpy chain"""
+        q = np.array([0.3, -0.5, 1.2, 0.4, -0.7, 0.9])
+        full = np.concatenate([[0.0], q, [0.0]])
+        expected = self.ik._create_manual_chain().forward_kinematics(full)
+        actual = fast_ik.fk_6dof(q, fast_ik.JOINT_ORIGINS, fast_ik.JOINT_AXES)
+        np.testing.assert_allclose(actual, expected, atol=1e-9)
+
+    def test_fast_solver_reaches_presets(self):
+        """DLS kernel converges for every preset from the default seed"""
+        for name, target in self.ik.presets.items():
+            q, error, _ = fast_ik.solve_dls(
+                self.ik._fast_seed, np.array(target),
+                fast_ik.JOINT_ORIGINS, fast_ik.JOINT_AXES,
+                self.ik._limits_lo, self.ik._limits_hi,
+                30, 1e-4, 1e-3,
+            )
+            self.assertLess(error, 1e-4, name)
+
+    def test_unreachable_target_short_circuits(self):
+        result = self.ik.calculate_ik(0.0, 2.0, 0.0)
+        self.assertFalse(result['success'])
+        if self.ik._manual_chain:
+            self.assertAlmostEqual(result['shoulder_distance'], np.hypot(2.0, 0.166))
+
+    def test_reach_check_only_applies_to_manual_chain(self):
+        """URDF chains have their own link lengths, so the solver decides"""
+        ik = AdvancedIKController(use_fast=False)
+        ik._manual_chain = False
+        result = ik.calculate_ik(0.0, 2.0, 0.0)
+        self.assertNotIn('shoulder_distance', result)
+
+    def test_clamp_to_recommended_zone(self):
+        """clamp=True pulls far targets back into the recommended zone"""
+        result = self.ik.calculate_ik(0.0, 2.0, 0.3, clamp=True)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['target'], {"x": 0.0, "y": 0.40, "z": 0.3})
+
+    def test_voice_command_priority(self):
+        """Keyword groups keep their original priority order"""
+        self.assertEqual(self.ik.parse_voice_command("向右再向左")['preset'], 'left')
+        self.assertEqual(self.ik.parse_voice_command("回到中间")['preset'], 'center')
+        self.assertEqual(self.ik.parse_voice_command("复位")['preset'], 'home')
+        self.assertEqual(self.ik.parse_voice_command("把它拿上来")['preset'], 'high')
+        # 关键词重叠时与原 if/elif 链一致："pickup" 含 "up"，"backup" 含 "back" 和 "up"
+        self.assertEqual(self.ik.parse_voice_command("pickup")['preset'], 'high')
+        self.assertEqual(self.ik.parse_voice_command("backup")['preset'], 'high')
+
+    def test_voice_command_unknown(self):
+        result = self.ik.parse_voice_command("你好")
+        self.assertFalse(result['success'])
+        self.assertIn('available_commands', result)
+
+    def test_preset_served_from_cache(self):
+        """Presets are solved once at init and copied on each request"""
+        first = self.ik.get_preset('left')
+        self.assertTrue(first['success'])
+        self.assertEqual(first['preset'], 'left')
+        first['angles']['joint1'] = 999
+        second = self.ik.get_preset('left')
+        self.assertNotEqual(second['angles']['joint1'], 999)
+
+    def test_unknown_preset(self):
+        result = self.ik.get_preset('nowhere')
+        self.assertFalse(result['success'])
+        self.assertIn('home', result['available'])
+
+    def test_batch_matches_targets(self):
+        """Batch solutions reach every target along a short trajectory"""
+        xs = np.linspace(-0.1, 0.1, 5)
+        result = self.ik.calculate_ik_batch(xs, np.full(5, 0.25), np.full(5, 0.25))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['angles_rad'].shape, (5, 6))
+        for q, x in zip(result['angles_rad'], xs):
+            actual = fast_ik.fk_6dof(q, fast_ik.JOINT_ORIGINS, fast_ik.JOINT_AXES)[:3, 3]
+            np.testing.assert_allclose(actual, [x, 0.25, 0.25], atol=1e-3)
+
+    def test_preset_batch(self):
+        result = self.ik.get_preset_batch(['home', 'left'])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['presets'], ['home', 'left'])
+        self.assertFalse(self.ik.get_preset_batch(['home', 'nowhere'])['success'])
+
+    def test_analytical_branches_are_exact(self):
+        """Every closed-form branch reproduces the target through FK"""
+        target = np.array([0.10, 0.30, 0.15])
+        solutions = analytical_ik.solve_position(*target)
+        self.assertGreater(len(solutions), 0)
+        for q in solutions:
+            actual = fast_ik.fk_6dof(q, fast_ik.JOINT_ORIGINS, fast_ik.JOINT_AXES)[:3, 3]
+            np.testing.assert_allclose(actual, target, atol=1e-9)
+
+    def test_analytical_unreachable(self):
+        self.assertEqual(len(analytical_ik.solve_position(0.0, 2.0, 0.0)), 0)
+
+    def test_step_metrics(self):
+        """Per-step kernel matches the NumPy reference on qpos/site_xpos views"""
+        qpos = np.array([0.1, -0.5, 1.2, 0.0, 3.0, -1.0, 0.7, 0.7])
+        site_xpos = np.array([[0.0, 0.0, 0.0], [0.1, 0.2, 0.3]])
+        target = np.array([0.4, -0.2, 0.3])
+        angles_deg, distance = fast_ik.step_metrics(qpos[:6], site_xpos[1], target)
+        np.testing.assert_allclose(angles_deg, np.degrees(qpos[:6]))
+        self.assertAlmostEqual(distance, np.linalg.norm(site_xpos[1] - target))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import asyncio
+import unittest
+from unittest import mock
+
+# Import helpers from main; side effects (FastAPI app init) are acceptable for tests
+import main
+
+
+class _FailingTorch:
+    @staticmethod
+    def stack(images):
+        raise RuntimeError("CUDA out of memory")
+
+
+class TestInferenceWorker(unittest.TestCase):
+    def test_batch_failure_is_reported_to_every_request(self):
+        """A failure while assembling the batch fails the requests instead of hanging them"""
+        async def run():
+            with mock.patch.multiple(main, _torch=_FailingTorch, _inference_task=None,
+                                     _inference_queue=asyncio.Queue()):
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.gather(main._detect_image(object()), main._detect_image(object()),
+                                       return_exceptions=True),
+                        timeout=5)
+                finally:
+                    main._inference_task.cancel()
+
+        results = asyncio.run(run())
+        self.assertEqual([type(r) for r in results], [RuntimeError, RuntimeError])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+# Import helpers from main; side effects (FastAPI app init) are acceptable for tests
+import main
+
+
+class _RecordingTransport:
+    mock_mode = False
+
+    def __init__(self):
+        self.sent = []
+
+    def send_joint_angles(self, angles_deg, validate_limits=True):
+        self.sent.append(list(angles_deg))
+        return True
+
+
+class TestDispatchAngles(unittest.TestCase):
+    def setUp(self):
+        self.transport = _RecordingTransport()
+        patcher = mock.patch.multiple(main, control_mode="physical", serial_transport=self.transport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_valid_angles_reach_serial(self):
+        result = main.dispatch_angles([0, 10, 0, 0, 0, 0], source="test")
+        self.assertTrue(result["serial_sent"])
+        self.assertEqual(self.transport.sent, [[0, 10, 0, 0, 0, 0]])
+
+    def test_out_of_range_and_nan_angles_are_not_sent(self):
+        for angles in ([0, 95, 0, 0, 0, 0], [0, float("nan"), 0, 0, 0, 0]):
+            result = main.dispatch_angles(angles, source="test")
+            self.assertTrue(result["validation_failed"], angles)
+        self.assertEqual(self.transport.sent, [])
+
+
+
+class TestSolveIKQuantized(unittest.TestCase):
+    def test_non_finite_targets_fail_without_raising(self):
+        for target in ((float("nan"), 0, 0), (0, float("inf"), 0), ("0.1", 0, 0), (True, 0, 0)):
+            result = main._solve_ik_quantized(*target)
+            self.assertFalse(result["success"], target)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import unittest
+import sys
+import os
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_router import LLMRouter, ResponseCache, parse_llm_json
+
+
+class TestLLMRouter(unittest.TestCase):
+    def setUp(self):
+        # 不配置任何模型，只测试本地快速通道
+        self.router = LLMRouter({})
+
+    def tearDown(self):
+        asyncio.run(self.router.aclose())
+
+    def test_keyword_intent(self):
+        """Keyword fast path classifies without calling the LLM"""
+        self.assertEqual(asyncio.run(self.router.classify_intent("复位")), "work")
+        self.assertEqual(asyncio.run(self.router.classify_intent("拍照")), "vision")
+
+    def test_vision_keywords_take_priority(self):
+        """Vision wins even when a work keyword appears first"""
+        self.assertEqual(asyncio.run(self.router.classify_intent("拿起来看看")), "vision")
+
+    def test_stream_parses_sse_deltas(self):
+        """SSE chunks are yielded as content deltas until [DONE]"""
+        body = (
+            'data: {"choices": [{"delta": {"content": "你"}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "好"}}]}\n\n'
+            'data: [DONE]\n\n'
+        )
+
+        def handler(request):
+            return httpx.Response(200, text=body)
+
+        async def collect():
+            await self.router._client.aclose()
+            self.router._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return [t async for t in self.router._call_llm_stream("m", [])]
+
+        self.assertEqual(asyncio.run(collect()), ["你", "好"])
+
+    def test_chat_stream_quick_response(self):
+        async def collect():
+            return [t async for t in self.router.handle_chat_stream("谢谢")]
+
+        self.assertEqual(asyncio.run(collect()), [LLMRouter.QUICK_RESPONSES["谢谢"]])
+
+    def test_fast_work_command(self):
+        """Fast commands match case-insensitively and never leak injected args"""
+        angles = [1, 2, 3, 4, 5, 6]
+        result = asyncio.run(self.router.handle_work("please WAVE", "", current_angles=angles))
+        self.assertTrue(result["success"])
+        self.assertEqual(result["args"], {"action_name": "wave", "current_angles": angles})
+        self.assertNotIn("current_angles", LLMRouter.FAST_COMMANDS["wave"]["args"])
+
+    def test_fast_work_command_priority(self):
+        """Earlier table entries win when several commands appear"""
+        result = asyncio.run(self.router.handle_work("先挥手再点头", ""))
+        self.assertEqual(result["args"]["action_name"], "nod")
+
+    def test_fast_work_ignores_substrings_and_questions(self):
+        """Chat that merely mentions a command word never drives the arm"""
+        for text in ("what is a microwave?", "tell me about node.js", "preset 是什么意思",
+                     "你会跳舞吗？", "复位是什么意思", "how do you wave"):
+            self.assertIsNone(self.router.try_fast_work(text), text)
+        self.assertEqual(self.router.try_fast_work("wave!")["args"]["action_name"], "wave")
+        self.assertEqual(self.router.try_fast_work("跳舞")["args"]["action_name"], "dance")
+
+    def test_fast_joint_pattern(self):
+        """Joint commands with an angle are parsed locally"""
+        result = self.router.try_fast_work("基座转到-90度")
+        self.assertEqual(result["skill"], "control_joint")
+        self.assertEqual(result["args"], {"joint_index": 1, "angle": -90.0})
+        result = self.router.try_fast_work("基座转到90度，大臂30度", [0] * 6)
+        self.assertEqual(result["skill"], "control_multiple_joints")
+        self.assertEqual(result["args"]["target_angles_dict"], {"1": 90.0, "2": 30.0})
+        self.assertEqual(result["args"]["current_angles"], [0] * 6)
+
+    def test_fast_joint_pattern_requires_command_form(self):
+        """An angle mentioned in passing is not a joint command"""
+        self.assertIsNone(self.router.try_fast_work("小臂30度是什么意思?"))
+        self.assertIsNone(self.router.try_fast_work("小臂30度比较合适"))
+        self.assertIsNone(self.router.try_fast_work("基座转到90度可以吗"))
+        self.assertEqual(self.router.try_fast_work("关节2 30度")["args"], {"joint_index": 2, "angle": 30.0})
+        self.assertEqual(self.router.try_fast_work("请把小臂调到30度")["args"], {"joint_index": 3, "angle": 30.0})
+
+    def test_fast_move_pattern(self):
+        result = self.router.try_fast_work("移动到坐标 (0.2, 0.1，0.3)")
+        self.assertEqual(result["skill"], "move_to")
+        self.assertEqual(result["args"], {"x": 0.2, "y": 0.1, "z": 0.3})
+        self.assertIsNone(self.router.try_fast_work("向左一点"))
+
+    def test_work_llm_json_response(self):
+        """Fenced JSON from the decision model is parsed into a work result"""
+        async def fake_call(**kwargs):
+            return '```json\n{"mode": "work", "response": "好的", "skill": "move_to", "args": {"x": 0.1}}\n```'
+
+        self.router._call_llm = fake_call
+        result = asyncio.run(self.router.handle_work("移动到 0.1", "", current_angles=[0] * 6))
+        self.assertTrue(result["success"])
+        self.assertEqual(result["skill"], "move_to")
+        self.assertEqual(result["args"], {"x": 0.1, "current_angles": [0] * 6})
+
+    def test_work_llm_result_is_cached(self):
+        """Repeated commands reuse the parsed decision; angles are injected per call"""
+        calls = []
+
+        async def fake_call(**kwargs):
+            calls.append(kwargs)
+            return '{"mode": "work", "response": "好的", "skill": "move_to", "args": {"x": 0.1}}'
+
+        self.router._call_llm = fake_call
+        asyncio.run(self.router.handle_work("移动到 0.1", "", current_angles=[0] * 6))
+        result = asyncio.run(self.router.handle_work("移动到 0.1！", "", current_angles=[1] * 6))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["response_format"], {"type": "json_object"})
+        self.assertEqual(calls[0]["temperature"], 0.0)
+        self.assertEqual(result["args"], {"x": 0.1, "current_angles": [1] * 6})
+        # 技能描述变化后不复用旧结果
+        asyncio.run(self.router.handle_work("移动到 0.1", "new skills"))
+        self.assertEqual(len(calls), 2)
+
+    def test_cache_key_keeps_signs_and_decimals(self):
+        normalize = ResponseCache.normalize
+        self.assertEqual(normalize("你好！"), normalize("你好"))
+        self.assertEqual(normalize("  Move  To 0.2 "), normalize("move to 0.2。"))
+        self.assertNotEqual(normalize("基座转到-90度"), normalize("基座转到90度"))
+        self.assertNotEqual(normalize("0.2, 0.1, 0.3"), normalize("02 01 03"))
+
+    def test_parse_llm_json_strips_fences(self):
+        self.assertEqual(parse_llm_json('```json\n{"a": 1}\n```'), {"a": 1})
+        self.assertEqual(parse_llm_json('```\n{"a": "x```y"}```'), {"a": "x```y"})
+        self.assertEqual(parse_llm_json('  {"a": [1, 2]} '), {"a": [1, 2]})
+        with self.assertRaises(json.JSONDecodeError):
+            parse_llm_json("```json\nnot json\n```")
+
+    def test_work_llm_invalid_json(self):
+        async def fake_call(**kwargs):
+            return "not json"
+
+        self.router._call_llm = fake_call
+        result = asyncio.run(self.router.handle_work("移动到 0.1", ""))
+        self.assertFalse(result["success"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import memory
+
+
+class TestConversationMemory(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        d = self._tmp.name
+        self.history = os.path.join(d, "chat_history.jsonl")
+        self.summary = os.path.join(d, "chat_history.summary.json")
+        self.legacy = os.path.join(d, "chat_history.json")
+        self._patch = mock.patch.multiple(
+            memory, HISTORY_FILE=self.history, SUMMARY_FILE=self.summary,
+            LEGACY_HISTORY_FILE=self.legacy)
+        self._patch.start()
+        self._memories = []
+
+    def tearDown(self):
+        for m in self._memories:
+            m.close()
+        self._patch.stop()
+        self._tmp.cleanup()
+
+    def _new(self):
+        m = memory.ConversationMemory()
+        self._memories.append(m)
+        return m
+
+    def _lines(self):
+        with open(self.history, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_messages_are_appended_and_reloaded(self):
+        m = self._new()
+        for i in range(7):
+            m.add_message("user", f"消息{i}")
+        self.assertTrue(m.flush(timeout=5))
+        self.assertEqual([msg["content"] for msg in self._lines()], [f"消息{i}" for i in range(7)])
+        # 磁盘上的时间戳仍是 ISO 字符串
+        datetime.fromisoformat(self._lines()[0]["timestamp"])
+
+        reloaded = self._new()
+        self.assertEqual([msg["content"] for msg in reloaded.ram_messages],
+                         [f"消息{i}" for i in range(2, 7)])
+
+    def test_log_rotates_past_limit(self):
+        with mock.patch.object(memory, "MAX_HISTORY_MESSAGES", 10), \
+                mock.patch.object(memory, "MAX_RAM_MESSAGES", 3):
+            m = self._new()
+            for i in range(11):
+                m.add_message("user", str(i))
+            m.close()
+        self.assertTrue(os.path.exists(self.history + ".old"))
+        self.assertEqual([msg["content"] for msg in self._lines()], ["8", "9", "10"])
+
+    def test_summary_is_stored_separately(self):
+        m = self._new()
+        m.add_message("user", "你好")
+        m.update_summary("用户打了招呼")
+        m.flush(timeout=5)
+        self.assertEqual(len(self._lines()), 1)
+        self.assertEqual(self._new().summary, "用户打了招呼")
+
+    def test_context_for_llm(self):
+        m = self._new()
+        m.update_summary("总结")
+        for i in range(12):
+            m.add_message("user" if i % 2 else "assistant", str(i))
+        context = m.get_context_for_llm()
+        self.assertEqual(context[0], {"role": "system", "content": "[历史对话总结]: 总结"})
+        self.assertEqual([msg["content"] for msg in context[1:]], [str(i) for i in range(2, 12)])
+        self.assertEqual(context[-1], {"role": "user", "content": "11"})
+
+    def test_legacy_history_is_migrated(self):
+        with open(self.legacy, "w", encoding="utf-8") as f:
+            json.dump({"summary": "旧总结", "messages": [
+                {"role": "user", "content": "a", "timestamp": "t"},
+                {"role": "assistant", "content": "b", "timestamp": "t"},
+            ]}, f)
+        m = self._new()
+        self.assertEqual(m.summary, "旧总结")
+        self.assertEqual([msg["content"] for msg in m.ram_messages], ["a", "b"])
+        self.assertEqual(len(self._lines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
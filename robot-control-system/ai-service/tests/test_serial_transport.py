@@ -0,0 +1,161 @@
+import unittest
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serial_transport import _bool, JointLimits, SerialConfig, SerialTransport
+
+
+class _FakeSerial:
+    is_open = True
+
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        self.flushes += 1
+
+    def reset_output_buffer(self):
+        pass
+
+
+class TestBool(unittest.TestCase):
+    def test_values(self):
+        for value in (True, 1, "1", "true", "ON", " Yes ", "tRuE"):
+            self.assertIs(_bool(value), True, value)
+        for value in (False, 0, "0", "false", "OFF", " no ", "oFf"):
+            self.assertIs(_bool(value, True), False, value)
+        for value in (None, 2, "", "maybe", 1.5):
+            self.assertIs(_bool(value, True), True, value)
+            self.assertIs(_bool(value), False, value)
+
+
+class TestJointLimits(unittest.TestCase):
+    def test_validate_angles(self):
+        cases = [
+            ([0, 0, 0, 0, 0, 0], (True, "OK")),
+            ([0, 95, 0, 0, 0, 0], (False, "Joint 2 angle 95.00° exceeds limits [-90.0, 90.0]")),
+            ([200, 95, 0, 0, 0, 0], (False, "Joint 1 angle 200.00° exceeds limits [-180.0, 180.0]")),
+            ([0, 0, -135, 0, 90.0, 180], (True, "OK")),
+            ([0, 0, 0, 0, 0, -180.01], (False, "Joint 6 angle -180.01° exceeds limits [-180.0, 180.0]")),
+            ([0, 0, 0], (False, "Expected 6 joint angles, got 3")),
+        ]
+        for angles, expected in cases:
+            self.assertEqual(JointLimits.validate_angles(angles), expected)
+
+    def test_none_entries_are_skipped(self):
+        self.assertEqual(JointLimits.validate_angles([None, 0, 0, 0, None, 0]), (True, "OK"))
+
+    def test_nan_is_rejected(self):
+        ok, msg = JointLimits.validate_angles([0, float("nan"), 0, 0, 0, 0])
+        self.assertFalse(ok)
+        self.assertEqual(msg, "Joint 2 angle nan° exceeds limits [-90.0, 90.0]")
+
+
+class TestSerialTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = SerialTransport(SerialConfig(enabled=False), auto_connect=False)
+        # 绕过模拟模式，直接写入假串口
+        self.transport._mock_mode = False
+        self.fake = _FakeSerial()
+        self.transport._serial = self.fake
+
+    def test_joint_angles_are_sent_as_one_write(self):
+        self.assertTrue(self.transport.send_joint_angles([10, None, -5.5, 0, 0, 1]))
+        self.assertEqual(len(self.fake.writes), 1)  # 一次 write 调用
+        self.assertEqual(self.fake.writes, [
+            b"abs_rotate 1 10.00 0 0 0 0\n"
+            b"abs_rotate 3 -5.50 0 0 0 0\n"
+            b"abs_rotate 4 0.00 0 0 0 0\n"
+            b"abs_rotate 5 0.00 0 0 0 0\n"
+            b"abs_rotate 6 1.00 0 0 0 0\n"
+        ])
+        self.assertEqual(self.fake.flushes, 1)
+
+    def test_fixed_commands_are_newline_terminated(self):
+        self.assertTrue(self.transport.send_emergency_stop())
+        self.assertTrue(self.transport.send_reset_controller())
+        self.assertTrue(self.transport.send_pump_control(True))
+        self.assertTrue(self.transport.send_pump_control(False))
+        self.assertEqual(self.fake.writes, [b"ESTOP\n", b"RESET\n", b"PUMP_ON\n", b"PUMP_OFF\n"])
+
+    def test_emergency_stop_writes_fd_without_lock(self):
+        r, w = os.pipe()
+        self.addCleanup(os.close, r)
+        self.addCleanup(os.close, w)
+        self.transport._fd = w
+        with self.transport._lock:  # 模拟其他线程正占用锁
+            self.assertTrue(self.transport.send_emergency_stop())
+        self.assertEqual(os.read(r, 64), b"\nESTOP\n")
+        self.assertEqual(self.fake.writes, [])
+
+    def test_emergency_stop_latches_until_reset(self):
+        r, w = os.pipe()
+        self.addCleanup(os.close, r)
+        self.addCleanup(os.close, w)
+        self.transport._fd = w
+        in_write, release = threading.Event(), threading.Event()
+        write = self.fake.write
+
+        def blocking_write(data):
+            # 写入阻塞，写线程一直持有锁
+            in_write.set()
+            release.wait(5)
+            return write(data)
+
+        self.fake.write = blocking_write
+        writer = threading.Thread(target=self.transport.send_joint_angles, args=([1, 2, 3, 4, 5, 6],))
+        writer.start()
+        self.assertTrue(in_write.wait(5))
+        # 急停不等锁，直接写到 fd
+        self.assertTrue(self.transport.send_emergency_stop())
+        self.assertEqual(os.read(r, 64), b"\nESTOP\n")
+        release.set()
+        writer.join(5)
+        self.fake.write = write
+        sent = len(self.fake.writes)
+
+        # 复位前拒绝新命令，复位后恢复
+        self.assertTrue(self.transport.estopped)
+        self.assertFalse(self.transport.send_joint_angles([0, 0, 0, 0, 0, 0]))
+        self.assertFalse(self.transport.send_command("abs_rotate 1 0 0 0 0 0"))
+        self.assertEqual(len(self.fake.writes), sent)
+        self.assertTrue(self.transport.send_reset_controller())
+        self.assertFalse(self.transport.estopped)
+        self.assertTrue(self.transport.send_command("abs_rotate 1 0 0 0 0 0"))
+        self.assertEqual(self.fake.writes[sent:], [b"RESET\n", b"abs_rotate 1 0 0 0 0 0\n"])
+
+    def test_mock_mode_honours_estop_latch(self):
+        transport = SerialTransport(SerialConfig(enabled=False), auto_connect=False)
+        self.assertTrue(transport.send_emergency_stop())
+        self.assertFalse(transport.send_command("abs_rotate 1 0 0 0 0 0"))
+        self.assertFalse(transport.send_joint_angles([0, 0, 0, 0, 0, 0]))
+        self.assertFalse(transport.send_pump_control(True))
+        self.assertTrue(transport.send_reset_controller())
+        self.assertTrue(transport.send_joint_angles([0, 0, 0, 0, 0, 0]))
+
+    def test_read_status_parses_csv_frame(self):
+        lines = iter(["STATUS,0.5,10.2,-5.3,0.0,45.6,-30.1,3,extra", "OK", "status,1,2,3", "STATUS,a,0,0,0,0,0,0"])
+        self.transport.read_line = lambda: next(lines)
+        status = self.transport.read_status()
+        self.assertEqual(status["angles_deg"], [0.5, 10.2, -5.3, 0.0, 45.6, -30.1])
+        self.assertEqual(status["error_code"], 3)
+        self.assertFalse(status["is_mock"])
+        self.assertIsNone(self.transport.read_status())
+        self.assertIsNone(self.transport.read_status())
+        self.assertIsNone(self.transport.read_status())
+
+    def test_out_of_range_angles_are_not_sent(self):
+        self.assertFalse(self.transport.send_joint_angles([0, 95, 0, 0, 0, 0]))
+        self.assertEqual(self.fake.writes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
+import asyncio
+import json
 import math
 import unittest
 
 # Import parser from main; side effects (FastAPI app init) are acceptable for tests
+import main
 from main import _parse_serial_line
 
 
@@ -41,5 +44,42 @@ class TestTelemetryParser(unittest.TestCase):
         self.assertIsNone(_parse_serial_line("\n"))
 
 
+class _FakeSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_text(self, message):
+        if self.fail:
+            raise RuntimeError("closed")
+        self.sent.append(message)
+
+
+class TestTelemetryBroadcast(unittest.TestCase):
+    def setUp(self):
+        main._last_broadcast_key = None
+
+    def tearDown(self):
+        main.telemetry_clients.clear()
+
+    def test_broadcast_drops_failed_clients(self):
+        good = [_FakeSocket() for _ in range(main.TELEMETRY_BROADCAST_BATCH + 5)]
+        bad = _FakeSocket(fail=True)
+        main.telemetry_clients.update(good + [bad])
+        asyncio.run(main._broadcast_telemetry({"error_code": 0}))
+        self.assertEqual(main.telemetry_clients, set(good))
+        for client in good:
+            self.assertEqual(json.loads(client.sent[0]), {"type": "telemetry", "data": {"error_code": 0}})
+
+    def test_unchanged_payload_is_skipped(self):
+        client = _FakeSocket()
+        main.telemetry_clients.add(client)
+        asyncio.run(main._broadcast_telemetry({"angles_deg": [1.0], "timestamp": 1}))
+        asyncio.run(main._broadcast_telemetry({"angles_deg": [1.0], "timestamp": 2}))
+        self.assertEqual(len(client.sent), 1)
+        asyncio.run(main._broadcast_telemetry({"angles_deg": [2.0], "timestamp": 3}))
+        self.assertEqual(len(client.sent), 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,48 @@
+import io
+import unittest
+import wave
+
+import numpy as np
+
+# Import helpers from main; side effects (FastAPI app init) are acceptable for tests
+from main import _parse_wav
+
+
+def _wav(frames: bytes, width: int, channels: int, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    return buf.getvalue()
+
+
+class TestParseWav(unittest.TestCase):
+    def _samples(self, contents: bytes):
+        frames, rate, width = _parse_wav(contents)
+        self.assertEqual((rate, width), (16000, 2))
+        return np.frombuffer(frames, np.int16).tolist()
+
+    def test_16bit_mono_passes_through(self):
+        pcm = np.array([0, 1000, -1000, 32767, -32768], np.int16)
+        self.assertEqual(self._samples(_wav(pcm.tobytes(), 2, 1)), pcm.tolist())
+
+    def test_8bit_unsigned_is_converted_to_signed(self):
+        self.assertEqual(self._samples(_wav(bytes([128, 255, 0]), 1, 1)), [0, 127 << 8, -32768])
+
+    def test_24bit_stereo_is_mixed_to_mono(self):
+        # 左右声道: (0x123456, 0x123456), (-256, -256)
+        frames = bytes([0x56, 0x34, 0x12] * 2 + [0x00, 0xFF, 0xFF] * 2)
+        self.assertEqual(self._samples(_wav(frames, 3, 2)), [0x1234, -1])
+
+    def test_32bit_stereo_is_mixed_to_mono(self):
+        pcm = np.array([1000 << 16, 3000 << 16, -(2000 << 16), 0], "<i4")
+        self.assertEqual(self._samples(_wav(pcm.tobytes(), 4, 2)), [2000, -1000])
+
+    def test_invalid_wav_returns_none(self):
+        self.assertIsNone(_parse_wav(b"not a wav"))
+
+
+if __name__ == '__main__':
+    unittest.main()